@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Post, Group, Comment
+from .models import Post, Group, Comment, Job
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -11,4 +11,12 @@ class PostAdmin(admin.ModelAdmin):
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
-admin.site.register(Comment)
\ No newline at end of file
+admin.site.register(Comment)
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("name", "status", "attempts", "run_at", "locked_by",)
+    list_filter = ("status", "name",)
+
+
+admin.site.register(Job, JobAdmin)
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        # Обработчики сигналов: счётчики комментариев и записей
+        from . import signals  # noqa
@@ -0,0 +1,238 @@
+"""Общие помощники бенчмарков: наполнение базы, замеры, планы запросов"""
+import gc
+import math
+import random
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Post, Group, Comment, User
+
+POST_COLUMNS = ("text", "pub_date", "updated", "author_id", "group_id",
+                "image", "comment_count")
+COMMENT_COLUMNS = ("post_id", "author_id", "text", "created", "path",
+                   "depth", "reply_count")
+
+# Абсолютный запас к допуску: на быстрых страницах доли миллисекунды
+# дают десятки процентов разброса
+MIN_MARGIN = {"p95_ms": 5, "peak_kb": 256}
+
+
+def _insert(model, columns, rows):
+    """Вставка пачки строк одним executemany, минуя сигналы модели"""
+    table = connection.ops.quote_name(model._meta.db_table)
+    names = ", ".join(connection.ops.quote_name(column) for column in columns)
+    marks = ", ".join(["%s"] * len(columns))
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {table} ({names}) VALUES ({marks})", rows)
+
+
+def _batches(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def seed(users=100, groups=10, posts=1000, comments=0, batch_size=10000,
+         seed_value=0):
+    """Наполнить базу пользователями, группами, постами и комментариями.
+
+    Даты публикации идут по минутам назад от текущего момента, авторы,
+    группы и посты для комментариев выбираются случайно. Счётчики и
+    пути комментариев восстанавливает команда rebuild_counters.
+    """
+    rnd = random.Random(seed_value)
+    now = timezone.now()
+    adapt = connection.ops.adapt_datetimefield_value
+    with transaction.atomic():
+        offset = User.objects.count()
+        User.objects.bulk_create(
+            User(username=f"bench_{offset + i}") for i in range(users))
+        user_ids = list(User.objects.filter(
+            username__startswith="bench_").values_list("id", flat=True))
+        offset = Group.objects.count()
+        Group.objects.bulk_create(
+            Group(title=f"Группа {offset + i}", slug=f"bench-{offset + i}",
+                  description="Группа для бенчмарка")
+            for i in range(groups))
+        group_ids = list(Group.objects.filter(
+            slug__startswith="bench-").values_list("id", flat=True))
+
+        def post_rows():
+            for number in range(posts):
+                pub_date = adapt(now - timedelta(minutes=posts - number))
+                group_id = None
+                if group_ids and rnd.random() < 0.7:
+                    group_id = rnd.choice(group_ids)
+                yield (f"Пост {number} для бенчмарка", pub_date, pub_date,
+                       rnd.choice(user_ids), group_id, "", 0)
+
+        for batch in _batches(post_rows(), batch_size):
+            _insert(Post, POST_COLUMNS, batch)
+
+        if comments:
+            post_ids = list(Post.objects.values_list("id", flat=True))
+
+            def comment_rows():
+                for number in range(comments):
+                    yield (rnd.choice(post_ids), rnd.choice(user_ids),
+                           f"Комментарий {number}",
+                           adapt(now - timedelta(seconds=comments - number)),
+                           "", 0, 0)
+
+            for batch in _batches(comment_rows(), batch_size):
+                _insert(Comment, COMMENT_COLUMNS, batch)
+
+        call_command("rebuild_counters", stdout=StringIO())
+    return user_ids, group_ids
+
+
+@contextmanager
+def file_database(path, **overrides):
+    """Рабочая база на время блока - новый файл path после миграций.
+
+    overrides - другие ключи настроек базы: CONN_MAX_AGE, OPTIONS.
+    """
+    settings_dict = connections.databases["default"]
+    saved = {key: settings_dict.get(key) for key in ("NAME", *overrides)}
+    connection.close()
+    settings_dict.update(NAME=path, **overrides)
+    try:
+        call_command("migrate", verbosity=0)
+        yield
+    finally:
+        connection.close()
+        settings_dict.update(saved)
+
+
+def explain(queryset):
+    """План запроса (EXPLAIN QUERY PLAN для SQLite)"""
+    return queryset.explain()
+
+
+def percentile(values, fraction):
+    """Процентиль по ближайшему рангу: p50 - 0.5, p95 - 0.95"""
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+
+def view_scenarios(user_ids, group_ids, seed_value=0):
+    """Запросы каждого сценария: (метод, url, данные), фиксированный порядок"""
+    rnd = random.Random(seed_value)
+    users = dict(User.objects.filter(pk__in=user_ids)
+                 .values_list("pk", "username"))
+    slugs = list(Group.objects.filter(pk__in=group_ids)
+                 .values_list("slug", flat=True))
+    posts = list(Post.objects.order_by("-pub_date", "-id")
+                 .values_list("pk", "author__username")[:1000])
+
+    def index():
+        page = rnd.randint(1, 5)
+        return "get", reverse("index") + f"?page={page}", None
+
+    def group_posts():
+        return "get", reverse("group_posts", args=[rnd.choice(slugs)]), None
+
+    def profile():
+        username = users[rnd.choice(user_ids)]
+        return "get", reverse("profile", args=[username]), None
+
+    def post_view():
+        pk, username = rnd.choice(posts)
+        return "get", reverse("post", args=[username, pk]), None
+
+    def add_comment():
+        pk, username = rnd.choice(posts)
+        return ("post", reverse("add_comment", args=[username, pk]),
+                {"text": "Комментарий бенчмарка"})
+
+    return {
+        "index": index,
+        "group_posts": group_posts,
+        "profile": profile,
+        "post_view": post_view,
+        "add_comment": add_comment,
+    }
+
+
+def measure_views(user_ids, group_ids, requests=50, memory_requests=10,
+                  seed_value=0):
+    """Замер сценариев через тестовый клиент.
+
+    Перед сценарием кэш очищается, поэтому последовательность
+    промахов и попаданий и число запросов воспроизводимы. Память
+    меряется отдельным проходом: tracemalloc замедляет запросы.
+    """
+    client = Client()
+    client.force_login(User.objects.get(pk=user_ids[0]))
+    results = {}
+    for name, make_request in view_scenarios(
+            user_ids, group_ids, seed_value).items():
+        cache.clear()
+        latencies = []
+        queries = []
+        for _ in range(requests):
+            method, url, data = make_request()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = getattr(client, method)(url, data)
+                latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{name}: {url} -> {response.status_code}")
+            queries.append(len(captured))
+
+        gc.collect()
+        tracemalloc.start()
+        for _ in range(memory_requests):
+            method, url, data = make_request()
+            getattr(client, method)(url, data)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        results[name] = {
+            "p50_ms": round(percentile(latencies, 0.5), 2),
+            "p95_ms": round(percentile(latencies, 0.95), 2),
+            "queries": max(queries),
+            "peak_kb": round(peak / 1024),
+        }
+    return results
+
+
+def compare(results, baseline, tolerance=0.5):
+    """Регрессии относительно базовой линии, список строк.
+
+    Число запросов детерминировано и сравнивается точно, время и
+    память - с допуском tolerance: их разброс зависит от машины.
+    """
+    regressions = []
+    for name, current in results.items():
+        stored = baseline.get(name)
+        if stored is None:
+            continue
+        if current["queries"] > stored["queries"]:
+            regressions.append("{}: запросов {} > {}".format(
+                name, current["queries"], stored["queries"]))
+        for metric in ("p95_ms", "peak_kb"):
+            limit = max(stored[metric] * (1 + tolerance),
+                        stored[metric] + MIN_MARGIN[metric])
+            if current[metric] > limit:
+                regressions.append("{}: {} {} > {:.2f}".format(
+                    name, metric, current[metric], limit))
+    return regressions
@@ -0,0 +1,75 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache import cache
+
+FEED_GENERATION_KEY = "posts:feed_generation"
+PAGE_TAG_KEY = "posts:page_tag:{}"
+# Тег есть у каждой страницы в кэше: сброс всего после массовых операций
+ALL_PAGES = "all"
+
+_deferred = threading.local()
+
+
+def get_feed_generation():
+    """Текущее поколение ленты, входит в ключи её кэша"""
+    cache.add(FEED_GENERATION_KEY, 1, None)
+    return cache.get(FEED_GENERATION_KEY, 1)
+
+
+def bump_feed_generation():
+    """Сбросить кэш ленты: старые ключи больше не запрашиваются"""
+    if getattr(_deferred, "tags", None) is not None:
+        _deferred.feed = True
+        return
+    try:
+        cache.incr(FEED_GENERATION_KEY)
+    except ValueError:
+        cache.set(FEED_GENERATION_KEY, 2, None)
+    invalidate_tags("feed")
+
+
+def tag_versions(tags, missing=None):
+    """Версии тегов страниц; отсутствующие заводятся с версией missing.
+
+    Версия - время сброса в наносекундах, а не счётчик: после
+    вытеснения ключа новая версия не совпадёт ни с одной сохранённой.
+    """
+    keys = {PAGE_TAG_KEY.format(tag): tag for tag in tags}
+    versions = cache.get_many(keys)
+    for key in keys.keys() - versions.keys():
+        cache.add(key, missing or time.time_ns(), None)
+        versions[key] = cache.get(key)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def invalidate_tags(*tags):
+    """Сбросить страницы с любым из тегов: author:1, group:2, post:3"""
+    if getattr(_deferred, "tags", None) is not None:
+        _deferred.tags.update(tags)
+        return
+    version = time.time_ns()
+    cache.set_many({PAGE_TAG_KEY.format(tag): version for tag in tags}, None)
+
+
+@contextmanager
+def deferred_invalidation():
+    """Сбросы кэша в блоке копятся и выполняются один раз на выходе.
+
+    Для пачек записей: вместо сброса тегов и поколения ленты на каждую
+    строку - одна запись в кэш на всю пачку.
+    """
+    if getattr(_deferred, "tags", None) is not None:
+        yield
+        return
+    _deferred.tags, _deferred.feed = set(), False
+    try:
+        yield
+    finally:
+        tags, feed = _deferred.tags, _deferred.feed
+        _deferred.tags = None
+        if feed:
+            bump_feed_generation()
+        if tags:
+            invalidate_tags(*tags)
@@ -0,0 +1,126 @@
+"""Комментарии к посту страницами по ключу (created, id) и ветки ответов.
+
+Страница - одна выборка по индексу (post, depth, -created, -id) с
+автором через JOIN, без COUNT(*) и OFFSET: время ответа не зависит от
+числа комментариев у поста. Ветка ответов - диапазон по индексу
+(path, depth) с курсором по path.
+"""
+from django.conf import settings
+from django.db.models import CharField, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Concat, LPad
+from django.utils.dateparse import parse_datetime
+
+from .models import Comment
+from .paginator import (ForwardPage, InvalidCursor, after, decode_token,
+                        encode_token)
+
+
+def comments_per_page():
+    return getattr(settings, "COMMENTS_PER_PAGE", 20)
+
+
+def thread_depth():
+    return getattr(settings, "COMMENT_THREAD_DEPTH", 3)
+
+
+def encode_comment_cursor(comment):
+    return encode_token([comment.created.isoformat(), comment.pk])
+
+
+def decode_comment_cursor(cursor):
+    """Разбор токена курсора, InvalidCursor при любой ошибке"""
+    try:
+        created, pk = decode_token(cursor)
+        created = parse_datetime(created)
+        pk = int(pk)
+    except (TypeError, ValueError):
+        raise InvalidCursor(cursor)
+    if created is None:
+        raise InvalidCursor(cursor)
+    return created, pk
+
+
+def comments_for(post_id):
+    """Комментарии верхнего уровня с авторами, новые сверху"""
+    return (Comment.objects.filter(post_id=post_id, depth=0)
+            .select_related("author")
+            .order_by("-created", "-id"))
+
+
+def comment_page(post_id, cursor=None, per_page=None):
+    """Страница комментариев; курсор - от прошлой страницы"""
+    per_page = per_page or comments_per_page()
+    comments = comments_for(post_id)
+    if cursor:
+        comments = comments.filter(
+            after(*decode_comment_cursor(cursor), date_field="created"))
+    items = list(comments[:per_page + 1])
+    next_cursor = None
+    if len(items) > per_page:
+        next_cursor = encode_comment_cursor(items[per_page - 1])
+    return ForwardPage(items[:per_page], next_cursor, bool(cursor))
+
+
+def subtree(comment):
+    """Все ответы в ветке комментария.
+
+    Пути потомков начинаются с path, а "/" < "0": все они меньше, чем
+    path с "0" вместо последнего "/". Получается диапазон по индексу.
+    """
+    return Comment.objects.filter(path__gt=comment.path,
+                                  path__lt=comment.path[:-1] + "0")
+
+
+def thread_page(root, cursor=None, per_page=None, max_depth=None):
+    """Страница ветки ответов в порядке обхода в глубину.
+
+    Ответы глубже max_depth уровней от root не выбираются, у ответа на
+    последнем уровне их число в reply_count. level - уровень от root.
+    """
+    per_page = per_page or comments_per_page()
+    max_depth = max_depth or thread_depth()
+    replies = (subtree(root)
+               .filter(depth__lte=root.depth + max_depth)
+               .select_related("author")
+               .order_by("path"))
+    if cursor:
+        try:
+            path, = decode_token(cursor)
+        except ValueError:
+            raise InvalidCursor(cursor)
+        if not isinstance(path, str):
+            raise InvalidCursor(cursor)
+        replies = replies.filter(path__gt=path)
+    items = list(replies[:per_page + 1])
+    for item in items:
+        item.level = item.depth - root.depth
+        item.last_level = item.level == max_depth
+    next_cursor = None
+    if len(items) > per_page:
+        next_cursor = encode_token([items[per_page - 1].path])
+    return ForwardPage(items[:per_page], next_cursor, bool(cursor))
+
+
+def fill_paths():
+    """Пути комментариев, вставленных в обход save(): импорт, бенчмарк.
+
+    Сначала корни, затем ответы по уровню за запрос: путь родителя и
+    свой id. Ответ глубже MAX_DEPTH перевешивается на деда, как в save().
+    """
+    segment = Concat(
+        LPad(Cast("id", CharField()), Comment.PATH_DIGITS, Value("0")),
+        Value("/"))
+    filled = Comment.objects.filter(path="", parent__isnull=True).update(
+        path=segment, depth=0)
+    parents = Comment.objects.filter(pk=OuterRef("parent_id"))
+    while True:
+        Comment.objects.filter(
+            path="", parent__path__gt="",
+            parent__depth__gte=Comment.MAX_DEPTH).update(
+            parent=Subquery(parents.values("parent_id")))
+        level = Comment.objects.filter(path="", parent__path__gt="").update(
+            path=Concat(Subquery(parents.values("path")), segment),
+            depth=Subquery(parents.values("depth")) + 1)
+        if not level:
+            return filled
+        filled += level
@@ -0,0 +1,102 @@
+"""Валидаторы условных GET: ETag и Last-Modified до тяжёлой работы вида.
+
+Каждый валидатор - один запрос по ключу без агрегатов: даты и
+счётчики хранятся в строках поста, профиля и сводки группы, их ведут
+сигналы. ETag включает пользователя: у автора на странице ссылки
+правки, в шапке - его имя. Для вошедших в ETag и секрет CSRF: вход
+его меняет, и форма комментария со старым токеном не уйдёт в 304.
+Last-Modified отдаётся только анонимам, для них страница одинакова.
+Удаление, счётчики подписок и название группы поста видны только в
+ETag: по одной дате If-Modified-Since их не заметить.
+"""
+import hashlib
+
+from django.db.models import Exists, F, OuterRef
+from django.views.decorators.http import condition
+
+from .models import Post, Group, Follow, User
+
+
+def _etag(request, *parts):
+    user = request.user
+    if user.is_authenticated:
+        # Секрет из куки, его кладёт в META CsrfViewMiddleware
+        parts += (user.pk, request.META.get("CSRF_COOKIE"))
+    else:
+        parts += (0,)
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def _latest(*dates):
+    dates = [date for date in dates if date is not None]
+    return max(dates) if dates else None
+
+
+def post_state(request, username, post_id, **kwargs):
+    """Время правки поста, последнего комментария, счётчики автора и группа.
+
+    Им же проверяются страницы комментариев и веток (comment_id).
+    """
+    return (Post.objects.filter(pk=post_id, author__username=username)
+            .values("updated", "comment_count", "author__profile__post_count",
+                    "author__profile__follower_count",
+                    "author__profile__following_count",
+                    "group__slug", "group__title",
+                    last_comment=F("last_comment_at"))
+            .order_by()
+            .first())
+
+
+def profile_state(request, username):
+    """Счётчики профиля и время изменения записей автора"""
+    following = Follow.objects.filter(
+        user_id=request.user.pk, author=OuterRef("pk"))
+    return (User.objects.filter(username=username)
+            .values("profile__post_count", "profile__follower_count",
+                    "profile__following_count",
+                    updated=F("profile__changed"))
+            .annotate(following=Exists(following))
+            .order_by()
+            .first())
+
+
+def group_state(request, slug):
+    """Описание группы и её сводка из шапки: без агрегата по постам.
+
+    refreshed не входит: пересчёт без изменений не сбрасывает ETag.
+    """
+    return (Group.objects.filter(slug=slug)
+            .values("title", "description", "stats__author_count",
+                    "stats__last_post_at")
+            .annotate(updated=F("stats__changed"),
+                      posts=F("stats__post_count"))
+            .order_by()
+            .first())
+
+
+def validators(state_func):
+    """Пара функций для condition(); состояние считается раз на запрос"""
+
+    def state(request, *args, **kwargs):
+        if not hasattr(request, "_page_state"):
+            request._page_state = state_func(request, *args, **kwargs)
+        return request._page_state
+
+    def etag(request, *args, **kwargs):
+        current = state(request, *args, **kwargs)
+        if current is None:
+            return None
+        return _etag(request, state_func.__name__, sorted(current.items()))
+
+    def last_modified(request, *args, **kwargs):
+        current = state(request, *args, **kwargs)
+        if current is None or request.user.is_authenticated:
+            return None
+        return _latest(current.get("updated"), current.get("last_comment"))
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+post_condition = validators(post_state)
+profile_condition = validators(profile_state)
+group_condition = validators(group_state)
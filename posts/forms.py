@@ -2,6 +2,7 @@ from django import forms
 from django.forms import ModelForm
 
 from .models import Post, Comment
+from .uploads import BoundedImageField
 
 
 # Максим, здравствуйте. очень не привычно, прятать различные варианты в гит. Но, опыт, необычный и позновательный, спасибо.
@@ -9,6 +10,7 @@ class PostForm(ModelForm):
     class Meta:
         model = Post
         fields = ["group", "text", 'image']
+        field_classes = {"image": BoundedImageField}
         widgets = {
             "text": forms.Textarea()
         }
@@ -0,0 +1,84 @@
+"""Сводки групп: каталог, шапка и ETag группы без агрегатов по posts_post.
+
+post_count и время изменения меняют сигналы постов на каждую запись,
+как счётчики в профиле. Число активных авторов и время последней
+записи периодически пересчитывает задача posts.tasks.refresh_group_stats,
+заодно исправляя и post_count.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+
+from .cache import invalidate_tags
+from .models import Group, GroupStats, Post
+
+FIELDS = ("post_count", "author_count", "last_post_at")
+
+
+def active_days():
+    return getattr(settings, "GROUP_ACTIVE_DAYS", 30)
+
+
+def post_changed(group_id, delta=0, pub_date=None):
+    """Запись группы добавлена (delta=1), удалена (-1) или изменена (0).
+
+    Недостающая сводка заводится по постам группы.
+    """
+    now = timezone.now()
+    updated = GroupStats.objects.filter(group_id=group_id).update(
+        post_count=F("post_count") + delta, changed=now)
+    if not updated:
+        GroupStats.objects.get_or_create(
+            group_id=group_id,
+            defaults={"post_count": Post.objects.filter(
+                group_id=group_id).count(), "changed": now})
+    if pub_date is not None:
+        GroupStats.objects.filter(
+            Q(last_post_at__isnull=True) | Q(last_post_at__lt=pub_date),
+            group_id=group_id).update(last_post_at=pub_date)
+
+
+def refresh_group_stats(now=None):
+    """Пересчитать сводки всех групп; вернуть число изменившихся.
+
+    Две группировки по постам в одной транзакции: на SQLite она
+    открывается BEGIN IMMEDIATE, и счётчики из сигналов не теряются.
+    """
+    now = now or timezone.now()
+    since = now - timedelta(days=active_days())
+    with transaction.atomic():
+        totals = {
+            row["group"]: (row["posts"], row["last"])
+            for row in Post.objects.filter(group__isnull=False)
+            .order_by().values("group")
+            .annotate(posts=Count("id"), last=Max("pub_date"))}
+        authors = dict(
+            Post.objects.filter(group__isnull=False, pub_date__gte=since)
+            .order_by().values("group")
+            .annotate(authors=Count("author", distinct=True))
+            .values_list("group", "authors"))
+        existing = {stats.group_id: stats
+                    for stats in GroupStats.objects.all()}
+        created, updated, changed = [], [], []
+        for group_id in Group.objects.values_list("id", flat=True):
+            posts, last = totals.get(group_id, (0, None))
+            values = (posts, authors.get(group_id, 0), last)
+            stats = existing.get(group_id)
+            if stats is None:
+                stats = GroupStats(group_id=group_id)
+                created.append(stats)
+            else:
+                updated.append(stats)
+            if tuple(getattr(stats, field) for field in FIELDS) != values:
+                changed.append(group_id)
+            for field, value in zip(FIELDS, values):
+                setattr(stats, field, value)
+            stats.refreshed = now
+        GroupStats.objects.bulk_create(created)
+        GroupStats.objects.bulk_update(updated, FIELDS + ("refreshed",))
+    if changed:
+        invalidate_tags("groups", *(f"group:{pk}" for pk in changed))
+    return len(changed)
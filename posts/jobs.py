@@ -0,0 +1,190 @@
+"""Фоновые задачи без внешнего брокера: очередь - таблица Job.
+
+Функция с декоратором @task получает метод delay(): вызов записывается
+строкой Job в текущей транзакции и выполнится, только если она
+зафиксирована. manage.py run_workers забирает готовые задачи пачками
+(одна транзакция на захват, на SQLite - BEGIN IMMEDIATE), выполняет и
+удаляет. Упавшая задача возвращается в очередь с экспоненциальной
+задержкой, после max_attempts попыток остаётся со статусом failed.
+Задача, чей исполнитель умер, через JOBS_LOCK_TIMEOUT снова в очереди.
+
+Задача с every=секунды периодическая: после каждого выполнения ставит
+следующий запуск, первый ставит run_workers при старте.
+
+Аргументы задач - только JSON: передаются id, а не объекты моделей.
+"""
+import importlib
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+# Имя периодической задачи -> интервал в секундах
+PERIODIC = {}
+
+
+def setting(name, default):
+    return getattr(settings, name, default)
+
+
+def task(func=None, max_attempts=5, every=None):
+    """Декоратор задачи: func.delay(*args, **kwargs) ставит её в очередь.
+
+    С JOBS_EAGER задача выполняется сразу в вызывающем потоке.
+    """
+    if func is None:
+        return lambda func: task(func, max_attempts, every)
+    name = f"{func.__module__}.{func.__qualname__}"
+    TASKS[name] = func
+    if every:
+        PERIODIC[name] = every
+
+    @wraps(func)
+    def delay(*args, run_at=None, **kwargs):
+        if setting("JOBS_EAGER", False):
+            return func(*args, **kwargs)
+        return Job.objects.create(
+            name=name,
+            payload=json.dumps({"args": args, "kwargs": kwargs}),
+            max_attempts=max_attempts,
+            run_at=run_at or timezone.now())
+
+    func.delay = delay
+    func.task_name = name
+    return func
+
+
+def resolve(name):
+    """Функция задачи по имени; модуль импортируется при первом вызове"""
+    if name not in TASKS:
+        importlib.import_module(name.rsplit(".", 1)[0])
+    return TASKS[name]
+
+
+def retry_delay(attempts):
+    """Пауза перед следующей попыткой: растёт вдвое, со случайной добавкой"""
+    base = setting("JOBS_RETRY_DELAY", 10)
+    delay = min(base * 2 ** (attempts - 1),
+                setting("JOBS_RETRY_MAX_DELAY", 3600))
+    return timedelta(seconds=delay * (1 + random.random() / 4))
+
+
+def worker_id():
+    return "{}:{}:{}".format(socket.gethostname(), os.getpid(),
+                             threading.current_thread().name)
+
+
+def schedule_periodic(name=None, run_at=None):
+    """Поставить периодические задачи, которых нет в очереди"""
+    names = [name] if name else list(PERIODIC)
+    planned = set(Job.objects.filter(
+        name__in=names, status__in=(Job.QUEUED, Job.RUNNING))
+        .values_list("name", flat=True))
+    Job.objects.bulk_create(
+        Job(name=name, max_attempts=1, run_at=run_at or timezone.now())
+        for name in names if name not in planned)
+
+
+def requeue_stale():
+    """Вернуть в очередь задачи исполнителей, не ответивших вовремя"""
+    expired = timezone.now() - timedelta(
+        seconds=setting("JOBS_LOCK_TIMEOUT", 600))
+    return Job.objects.filter(
+        status=Job.RUNNING, locked_at__lt=expired).update(
+        status=Job.QUEUED, locked_by="", locked_at=None)
+
+
+def claim(worker, limit=1):
+    """Забрать до limit готовых задач; другой исполнитель их не получит"""
+    now = timezone.now()
+    with transaction.atomic():
+        # Вне SQLite строки блокируются, занятые пропускаются
+        ids = list(Job.objects.select_for_update(skip_locked=True)
+                   .filter(status=Job.QUEUED, run_at__lte=now)
+                   .order_by("run_at", "id")
+                   .values_list("id", flat=True)[:limit])
+        if not ids:
+            return []
+        Job.objects.filter(id__in=ids, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_by=worker, locked_at=now,
+            attempts=F("attempts") + 1)
+    return list(Job.objects.filter(id__in=ids, locked_by=worker,
+                                   status=Job.RUNNING).order_by("run_at"))
+
+
+def execute(job):
+    """Выполнить задачу: удалить при успехе, иначе повтор или failed"""
+    # Задачу, отданную другому после JOBS_LOCK_TIMEOUT, не трогаем
+    owned = Job.objects.filter(pk=job.pk, locked_by=job.locked_by)
+    try:
+        payload = json.loads(job.payload)
+        resolve(job.name)(*payload.get("args", []),
+                          **payload.get("kwargs", {}))
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            logger.error("Задача %s не выполнена: %s", job, error)
+            owned.update(status=Job.FAILED, locked_by="", last_error=error)
+            reschedule(job)
+        else:
+            owned.update(status=Job.QUEUED, locked_by="", locked_at=None,
+                         last_error=error,
+                         run_at=timezone.now() + retry_delay(job.attempts))
+        return False
+    owned.delete()
+    reschedule(job)
+    return True
+
+
+def reschedule(job):
+    """Следующий запуск периодической задачи через её интервал"""
+    every = PERIODIC.get(job.name)
+    if every:
+        schedule_periodic(job.name,
+                          timezone.now() + timedelta(seconds=every))
+
+
+def run_pending(limit=None):
+    """Выполнить готовые задачи в текущем потоке; вернуть их число"""
+    worker = worker_id()
+    done = 0
+    while limit is None or done < limit:
+        jobs = claim(worker)
+        if not jobs:
+            break
+        for job in jobs:
+            execute(job)
+            done += 1
+    return done
+
+
+def work(stop, poll=1.0, batch=1):
+    """Цикл исполнителя до события stop; пустая очередь - ждать poll"""
+    worker = worker_id()
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            jobs = claim(worker, batch)
+            for job in jobs:
+                execute(job)
+            if not jobs:
+                # Простой - время проверить задачи упавших исполнителей
+                requeue_stale()
+                stop.wait(poll)
+    finally:
+        connection.close()
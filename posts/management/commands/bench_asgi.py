@@ -0,0 +1,154 @@
+import asyncio
+import io
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+from django.urls import reverse
+
+from posts.bench import percentile, seed
+from posts.models import Post, Group, User
+from yatube.asgi import WSGIBridge
+
+
+class Command(BaseCommand):
+    help = ("Сравнить WSGI (поток на соединение) и ASGI-мост на медленных "
+            "клиентах: запросов в секунду и задержки")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=400)
+        parser.add_argument("--concurrency", type=int, default=100,
+                            help="Одновременных клиентов")
+        parser.add_argument("--threads", type=int, default=8,
+                            help="Рабочих потоков в обоих режимах")
+        parser.add_argument("--client-delay", type=float, default=0.05,
+                            help="Отправка запроса и приём ответа, с")
+        parser.add_argument("--posts", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True)
+        try:
+            self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run(self, options):
+        user_ids, group_ids = seed(users=50, groups=5,
+                                   posts=options["posts"], comments=1000)
+        client = Client()
+        client.force_login(User.objects.get(pk=user_ids[0]))
+        # С сессией страницы рендерятся, кэш страниц гостей не участвует
+        cookie = "sessionid=" + client.cookies["sessionid"].value
+        paths = self.paths(user_ids, group_ids, options["requests"])
+
+        for name, serve in (("WSGI", self.serve_wsgi),
+                            ("ASGI", self.serve_asgi)):
+            started = time.perf_counter()
+            latencies = serve(paths, cookie, options)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                "{}: {:.1f} запросов/с, p50 {:.0f} мс, p95 {:.0f} мс".format(
+                    name, len(paths) / elapsed,
+                    percentile(latencies, 0.5) * 1000,
+                    percentile(latencies, 0.95) * 1000))
+
+    def paths(self, user_ids, group_ids, count):
+        rnd = random.Random(0)
+        users = list(User.objects.filter(pk__in=user_ids)
+                     .values_list("username", flat=True))
+        slugs = list(Group.objects.filter(pk__in=group_ids)
+                     .values_list("slug", flat=True))
+        posts = list(Post.objects.values_list("pk", "author__username")[:500])
+        makers = (
+            lambda: reverse("index") + "?page={}".format(rnd.randint(1, 5)),
+            lambda: reverse("group_posts", args=[rnd.choice(slugs)]),
+            lambda: reverse("profile", args=[rnd.choice(users)]),
+            lambda: reverse("post", args=rnd.choice(posts)[::-1]),
+        )
+        return [makers[number % len(makers)]() for number in range(count)]
+
+    def serve_wsgi(self, paths, cookie, options):
+        """Поток на соединение: медленный клиент держит поток целиком"""
+        handler = WSGIHandler()
+        delay = options["client_delay"]
+        workers = threading.BoundedSemaphore(options["threads"])
+
+        def request(path):
+            started = time.perf_counter()
+            with workers:
+                time.sleep(delay)
+                environ = self.environ(path, cookie)
+                result = handler(environ, lambda status, headers: None)
+                b"".join(result)
+                result.close()
+                time.sleep(delay)
+            return time.perf_counter() - started
+
+        with ThreadPoolExecutor(options["concurrency"]) as clients:
+            return list(clients.map(request, paths))
+
+    def serve_asgi(self, paths, cookie, options):
+        """Мост: ожидание клиента в цикле событий, потоки - только вид"""
+        application = WSGIBridge(WSGIHandler(), options["threads"])
+        delay = options["client_delay"]
+        clients = options["concurrency"]
+
+        async def request(path, semaphore):
+            # Как и в WSGI: отсчёт с момента, когда клиент шлёт запрос
+            async with semaphore:
+                started = time.perf_counter()
+
+                async def receive():
+                    await asyncio.sleep(delay)
+                    return {"type": "http.request", "body": b""}
+
+                async def send(message):
+                    if message["type"] == "http.response.body" and not (
+                            message.get("more_body")):
+                        await asyncio.sleep(delay)
+
+                scope = {
+                    "type": "http", "method": "GET", "path": path,
+                    "query_string": b"", "headers": [
+                        (b"host", b"testserver"),
+                        (b"cookie", cookie.encode())],
+                }
+                if "?" in path:
+                    scope["path"], query = path.split("?", 1)
+                    scope["query_string"] = query.encode()
+                await application(scope, receive, send)
+                return time.perf_counter() - started
+
+        async def main():
+            semaphore = asyncio.Semaphore(clients)
+            return await asyncio.gather(
+                *(request(path, semaphore) for path in paths))
+
+        try:
+            return asyncio.run(main())
+        finally:
+            application.executor.shutdown()
+
+    def environ(self, path, cookie):
+        path, _, query = path.partition("?")
+        return {
+            "REQUEST_METHOD": "GET", "PATH_INFO": path,
+            "QUERY_STRING": query, "SERVER_NAME": "testserver",
+            "SERVER_PORT": "80", "SERVER_PROTOCOL": "HTTP/1.1",
+            "HTTP_HOST": "testserver", "HTTP_COOKIE": cookie,
+            "wsgi.input": io.BytesIO(), "wsgi.errors": sys.stderr,
+            "wsgi.url_scheme": "http", "wsgi.version": (1, 0),
+            "wsgi.multithread": True, "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
@@ -0,0 +1,86 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts.bench import seed, explain
+from posts.comments import comments_for
+from posts.models import Post, Comment
+from posts.paginator import CursorPaginator, after
+
+FEED_INDEXES = {
+    "index": "posts_post_feed_idx",
+    "index_cursor": "posts_post_feed_idx",
+    "group_posts": "posts_post_group_feed_idx",
+    "profile": "posts_post_author_feed_idx",
+    "comments": "posts_comment_page_idx",
+}
+
+
+class Command(BaseCommand):
+    help = ("Наполнить тестовую базу и проверить по EXPLAIN QUERY PLAN, "
+            "что запросы лент используют индексы")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=1000000)
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--groups", type=int, default=50)
+        parser.add_argument("--comments", type=int, default=100000)
+
+    def handle(self, *args, **options):
+        # Отдельная тестовая база, рабочая не затрагивается
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True)
+        try:
+            self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self, options):
+        started = time.perf_counter()
+        user_ids, group_ids = seed(
+            users=options["users"], groups=options["groups"],
+            posts=options["posts"], comments=options["comments"])
+        self.stdout.write("Наполнение: {:.1f} с".format(
+            time.perf_counter() - started))
+
+        middle = Post.objects.order_by("-pub_date", "-id")[
+            options["posts"] // 2]
+        post_id = (Comment.objects.values_list("post_id", flat=True)
+                   .first() or middle.pk)
+        queries = {
+            "index": Post.objects.for_feed()[:10],
+            "index_cursor": Post.objects.for_feed()
+            .filter(after(middle.pub_date, middle.pk))
+            .order_by("-pub_date", "-id")[:11],
+            "group_posts": Post.objects.filter(group_id=group_ids[0])
+            .for_feed()[:10],
+            "profile": Post.objects.filter(author_id=user_ids[0])
+            .for_feed()[:10],
+            "comments": comments_for(post_id)[:21],
+        }
+
+        failed = []
+        for name, queryset in queries.items():
+            plan = explain(queryset)
+            started = time.perf_counter()
+            list(queryset)
+            elapsed = (time.perf_counter() - started) * 1000
+            uses_index = FEED_INDEXES[name] in plan
+            if not uses_index:
+                failed.append(name)
+            self.stdout.write("{:<14} {:8.2f} мс  {}".format(
+                name, elapsed, "OK" if uses_index else "БЕЗ ИНДЕКСА"))
+            self.stdout.write("    " + plan.replace("\n", "\n    "))
+
+        paginator = CursorPaginator(Post.objects.for_feed(), 10)
+        page = paginator.get_page(None)
+        started = time.perf_counter()
+        for _ in range(100):
+            page = paginator.get_page(page.next_cursor)
+        self.stdout.write("100 страниц курсором: {:.2f} мс".format(
+            (time.perf_counter() - started) * 1000))
+
+        if failed:
+            raise CommandError(
+                "Запросы без индекса: " + ", ".join(failed))
@@ -0,0 +1,122 @@
+import os
+import random
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.test import override_settings
+
+from posts.bench import file_database, percentile, seed
+from posts.models import Post, Comment
+
+# Поведение штатного бэкенда: журнал отката, fsync на каждый коммит,
+# обычный BEGIN, соединение на запрос и 5 с busy timeout
+MODES = {
+    "default": {
+        "CONN_MAX_AGE": 0,
+        "OPTIONS": {
+            "timeout": 5,
+            "immediate": False,
+            "pragmas": {"journal_mode": "DELETE", "synchronous": "FULL",
+                        "mmap_size": 0, "cache_size": -2000,
+                        "temp_store": "DEFAULT"},
+        },
+        "retries": 0,
+    },
+    "tuned": {
+        "CONN_MAX_AGE": 60,
+        "OPTIONS": {"timeout": 20},
+        "retries": 3,
+    },
+}
+
+
+class Command(BaseCommand):
+    help = ("Чтение и запись в SQLite из нескольких потоков: штатные "
+            "настройки против WAL, прагм и постоянных соединений")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=5)
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--writers", type=int, default=2)
+        parser.add_argument("--posts", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            for name, mode in MODES.items():
+                path = os.path.join(directory, name + ".sqlite3")
+                with file_database(path, CONN_MAX_AGE=mode["CONN_MAX_AGE"],
+                                   OPTIONS=mode["OPTIONS"]), \
+                        override_settings(
+                            SQLITE_WRITE_RETRIES=mode["retries"]):
+                    result = self.run(options)
+                self.report(name, result, options["seconds"])
+
+    def run(self, options):
+        user_ids, _ = seed(users=50, groups=5, posts=options["posts"],
+                           comments=1000)
+        post_ids = list(Post.objects.values_list("id", flat=True))
+        connection.close()
+
+        result = {"reads": [], "writes": 0, "errors": 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options["seconds"]
+
+        def reader(seed_value):
+            rnd = random.Random(seed_value)
+            latencies = []
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                list(Post.objects.select_related("author", "group")[:10])
+                list(Comment.objects.filter(post_id=rnd.choice(post_ids))
+                     .select_related("author")[:20])
+                latencies.append(time.perf_counter() - started)
+                # Конец запроса: с CONN_MAX_AGE=0 соединение закрывается
+                connection.close_if_unusable_or_obsolete()
+            connection.close()
+            with lock:
+                result["reads"].extend(latencies)
+
+        def writer(seed_value):
+            rnd = random.Random(seed_value)
+            writes = errors = 0
+            while time.perf_counter() < deadline:
+                try:
+                    Comment(post_id=rnd.choice(post_ids),
+                            author_id=rnd.choice(user_ids),
+                            text="Комментарий под нагрузкой").save()
+                    writes += 1
+                except OperationalError:
+                    errors += 1
+                connection.close_if_unusable_or_obsolete()
+            connection.close()
+            with lock:
+                result["writes"] += writes
+                result["errors"] += errors
+
+        threads = [threading.Thread(target=reader, args=(i,))
+                   for i in range(options["readers"])]
+        threads += [threading.Thread(target=writer, args=(i,))
+                    for i in range(options["writers"])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return result
+
+    def report(self, name, result, seconds):
+        reads = sorted(result["reads"])
+        if not reads:
+            reads = [0.0]
+        self.stdout.write(
+            "{:8} чтение p50 {:7.2f} мс, p95 {:7.2f} мс, max {:7.2f} мс, "
+            "{:7.1f}/с; запись {:6.1f}/с, ошибок блокировки {}".format(
+                name,
+                percentile(reads, 0.5) * 1000,
+                percentile(reads, 0.95) * 1000,
+                reads[-1] * 1000,
+                len(result["reads"]) / seconds,
+                result["writes"] / seconds,
+                result["errors"]))
@@ -0,0 +1,75 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+
+from posts.bench import compare, measure_views, seed
+
+BASELINE = os.path.join(os.path.dirname(__file__), "..", "..",
+                        "bench_baseline.json")
+
+
+class Command(BaseCommand):
+    help = ("Нагрузочный замер страниц постов: p50/p95, число запросов, "
+            "пиковая память; сравнение с базовой линией")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=10000)
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--groups", type=int, default=10)
+        parser.add_argument("--comments", type=int, default=20000)
+        parser.add_argument("--requests", type=int, default=50,
+                            help="Запросов на сценарий")
+        parser.add_argument("--baseline", default=os.path.normpath(BASELINE))
+        parser.add_argument("--tolerance", type=float, default=0.5,
+                            help="Допуск по времени и памяти, доля")
+        parser.add_argument("--update-baseline", action="store_true",
+                            help="Записать результаты как базовую линию")
+
+    def handle(self, *args, **options):
+        volumes = {name: options[name]
+                   for name in ("posts", "users", "groups", "comments")}
+        # Отдельная тестовая база, рабочая не затрагивается
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True)
+        try:
+            user_ids, group_ids = seed(**volumes)
+            results = measure_views(user_ids, group_ids, options["requests"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write("{:<12} {:>9} {:>9} {:>8} {:>9}".format(
+            "", "p50, мс", "p95, мс", "запросы", "пик, КБ"))
+        for name, result in results.items():
+            self.stdout.write("{:<12} {p50_ms:>9.2f} {p95_ms:>9.2f} "
+                              "{queries:>8} {peak_kb:>9}".format(
+                                  name, **result))
+
+        path = options["baseline"]
+        if options["update_baseline"]:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"volumes": volumes, "results": results}, f,
+                          indent=2, ensure_ascii=False)
+                f.write("\n")
+            self.stdout.write(self.style.SUCCESS(f"Базовая линия: {path}"))
+            return
+
+        if not os.path.exists(path):
+            self.stdout.write("Базовой линии нет, сравнение пропущено")
+            return
+        with open(path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["volumes"] != volumes:
+            raise CommandError(
+                "Объёмы отличаются от базовой линии: {}".format(
+                    baseline["volumes"]))
+        regressions = compare(results, baseline["results"],
+                              options["tolerance"])
+        if regressions:
+            raise CommandError("Регрессии:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("Регрессий нет"))
@@ -0,0 +1,87 @@
+import os
+import random
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import override_settings
+
+from posts import writebehind
+from posts.bench import file_database, percentile, seed
+from posts.models import Post, Comment
+
+
+class Command(BaseCommand):
+    help = ("Поток комментариев от многих клиентов: коммит на каждый "
+            "против пачек фонового писателя (posts.writebehind)")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=5)
+        parser.add_argument("--clients", type=int, default=64)
+        parser.add_argument("--posts", type=int, default=200)
+        parser.add_argument("--synchronous", default=None,
+                            help="PRAGMA synchronous вместо настроек "
+                                 "проекта, например FULL")
+
+    def handle(self, *args, **options):
+        db_options = dict(connections.databases["default"]["OPTIONS"])
+        if options["synchronous"]:
+            db_options["pragmas"] = {
+                **db_options.get("pragmas", {}),
+                "synchronous": options["synchronous"]}
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ("direct", "batched"):
+                path = os.path.join(directory, name + ".sqlite3")
+                with file_database(path, OPTIONS=db_options), \
+                        override_settings(WRITE_BEHIND=name == "batched"):
+                    result = self.run(options)
+                self.report(name, result, options["seconds"])
+
+    def run(self, options):
+        user_ids, _ = seed(users=50, groups=5, posts=options["posts"])
+        post_ids = list(Post.objects.values_list("id", flat=True))
+        connection.close()
+
+        latencies = []
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options["seconds"]
+
+        def client(seed_value):
+            rnd = random.Random(seed_value)
+            own = []
+            while time.perf_counter() < deadline:
+                comment = Comment(post_id=rnd.choice(post_ids),
+                                  author_id=rnd.choice(user_ids),
+                                  text="Комментарий под нагрузкой")
+                started = time.perf_counter()
+                writebehind.save(comment)
+                own.append(time.perf_counter() - started)
+                connection.close_if_unusable_or_obsolete()
+            connection.close()
+            with lock:
+                latencies.extend(own)
+
+        threads = [threading.Thread(target=client, args=(i,))
+                   for i in range(options["clients"])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        writer = writebehind._writer
+        batch = writer.written / writer.batches if writer else 1.0
+        writebehind.stop_writer()
+        return {"latencies": latencies, "batch": batch,
+                "stored": Comment.objects.count()}
+
+    def report(self, name, result, seconds):
+        latencies = sorted(result["latencies"]) or [0.0]
+        self.stdout.write(
+            "{:8} {:7.1f} комментариев/с, p50 {:6.2f} мс, p95 {:6.2f} мс, "
+            "в пачке {:5.1f}, записано {}".format(
+                name, len(result["latencies"]) / seconds,
+                percentile(latencies, 0.5) * 1000,
+                percentile(latencies, 0.95) * 1000,
+                result["batch"], result["stored"]))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from posts.transfer import (FIELDS, FORMATS, RecordWriter, Throughput,
+                            export_records, guess_format, open_stream)
+
+
+class Command(BaseCommand):
+    help = "Экспорт постов или комментариев в NDJSON/CSV потоком"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help='Файл или "-" для stdout')
+        parser.add_argument("--format", choices=FORMATS)
+        parser.add_argument("--kind", choices=("posts", "comments"),
+                            default="posts")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"] or guess_format(path)
+        throughput = Throughput()
+        rows = 0
+        with open_stream(path, "w") as stream:
+            writer = RecordWriter(stream, file_format, FIELDS[options["kind"]])
+            for record in export_records(options["kind"],
+                                         options["batch_size"]):
+                writer.write(record)
+                rows += 1
+        # При выводе в stdout отчёт не смешивается с данными
+        report = self.stderr if path == "-" else self.stdout
+        report.write("Экспортировано: " + throughput.report(rows))
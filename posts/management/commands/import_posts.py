@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from posts.transfer import (FORMATS, Importer, Throughput, TransferError,
+                            guess_format, open_stream, read_records)
+
+
+class Command(BaseCommand):
+    help = ("Импорт постов или комментариев из NDJSON/CSV пачками "
+            "через bulk_create")
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help='Файл или "-" для stdin')
+        parser.add_argument("--format", choices=FORMATS)
+        parser.add_argument("--kind", choices=("posts", "comments"),
+                            default="posts")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--chunk", type=int, default=10,
+                            help="Пачек в одной транзакции")
+        parser.add_argument("--create-authors", action="store_true",
+                            help="Создавать неизвестных пользователей")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"] or guess_format(path)
+        importer = Importer(options["kind"],
+                            batch_size=options["batch_size"],
+                            chunk=options["chunk"],
+                            create_authors=options["create_authors"])
+        throughput = Throughput()
+
+        def progress(rows):
+            if options["verbosity"] > 1:
+                self.stdout.write(throughput.report(rows))
+
+        try:
+            with open_stream(path, "r") as stream:
+                rows = importer.run(read_records(stream, file_format),
+                                    progress)
+        except (TransferError, IntegrityError) as e:
+            raise CommandError("{}. Импортировано: {}".format(
+                e, throughput.report(importer.committed)))
+        self.stdout.write(self.style.SUCCESS(
+            "Импортировано: " + throughput.report(rows)))
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import (Count, IntegerField, Max, OuterRef, Subquery,
+                              Value)
+from django.db.models.functions import Coalesce, Concat, Length, Substr
+from django.utils import timezone
+
+from users.models import Profile
+from posts.comments import fill_paths
+from posts.groupstats import refresh_group_stats
+from posts.models import Post, Comment, Follow, User
+
+
+def count_subquery(queryset, field, outer="pk"):
+    """Подзапрос COUNT(*) по внешнему ключу field, 0 если строк нет"""
+    counts = (queryset.filter(**{field: OuterRef(outer)})
+              .order_by()
+              .values(field)
+              .annotate(total=Count("pk"))
+              .values("total"))
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = ("Пересчитать счётчики комментариев, ответов, записей, "
+            "подписок и сводки групп")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fill_paths()
+            last_comment = (Comment.objects.filter(post=OuterRef("pk"))
+                            .order_by().values("post")
+                            .annotate(last=Max("created")).values("last"))
+            posts = Post.objects.update(
+                comment_count=count_subquery(Comment.objects, "post"),
+                last_comment_at=Subquery(last_comment))
+            # Поддерево - диапазон по индексу, как в comments.subtree()
+            path = OuterRef("path")
+            end = Concat(Substr(path, 1, Length(path) - 1), Value("0"))
+            replies = (Comment.objects
+                       .filter(path__gt=path, path__lt=end)
+                       .order_by()
+                       .values("post")
+                       .annotate(total=Count("pk"))
+                       .values("total"))
+            Comment.objects.update(reply_count=Coalesce(
+                Subquery(replies, output_field=IntegerField()), 0))
+            missing = User.objects.filter(profile__isnull=True)
+            Profile.objects.bulk_create(
+                Profile(user=user) for user in missing.only("pk"))
+            profiles = Profile.objects.update(
+                post_count=count_subquery(Post.objects, "author", "user"),
+                follower_count=count_subquery(Follow.objects, "author", "user"),
+                following_count=count_subquery(Follow.objects, "user", "user"),
+                changed=timezone.now())
+            refresh_group_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Записей: {posts}, профилей: {profiles}"))
@@ -0,0 +1,72 @@
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import jobs
+from posts import tasks  # noqa: регистрирует задачи, в том числе периодические
+
+
+def serve(threads, poll, batch):
+    """Процесс исполнителей: потоки jobs.work до SIGTERM или SIGINT"""
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *args: stop.set())
+    pool = [threading.Thread(target=jobs.work, args=(stop, poll, batch),
+                             name=f"worker-{number}")
+            for number in range(threads)]
+    for thread in pool:
+        thread.start()
+    # join с таймаутом: сигналы обрабатываются в главном потоке
+    while any(thread.is_alive() for thread in pool):
+        for thread in pool:
+            thread.join(1)
+
+
+class Command(BaseCommand):
+    help = "Выполнять фоновые задачи из очереди Job (posts.jobs)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=1)
+        parser.add_argument("--threads", type=int, default=4,
+                            help="Исполнителей в каждом процессе")
+        parser.add_argument("--poll", type=float, default=1.0,
+                            help="Пауза при пустой очереди, с")
+        parser.add_argument("--batch", type=int, default=1,
+                            help="Задач за один захват")
+        parser.add_argument("--once", action="store_true",
+                            help="Выполнить готовые задачи и выйти")
+
+    def handle(self, *args, **options):
+        jobs.schedule_periodic()
+        requeued = jobs.requeue_stale()
+        if requeued:
+            self.stdout.write(f"Возвращено в очередь: {requeued}")
+        if options["once"]:
+            done = jobs.run_pending()
+            self.stdout.write(self.style.SUCCESS(f"Выполнено задач: {done}"))
+            return
+
+        worker_args = (options["threads"], options["poll"], options["batch"])
+        if options["processes"] == 1:
+            serve(*worker_args)
+            return
+
+        # Дочерние процессы открывают свои соединения с базой
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        processes = [context.Process(target=serve, args=worker_args)
+                     for number in range(options["processes"])]
+        for process in processes:
+            process.start()
+
+        def shutdown(*args):
+            for process in processes:
+                process.terminate()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+        for process in processes:
+            process.join()
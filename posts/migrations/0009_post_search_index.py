@@ -0,0 +1,60 @@
+# Generated by Django 2.2.6 on 2026-10-18 18:02
+
+from django.db import migrations
+
+# Текст для индекса: ё -> е, чтобы запросы с "е" находили оба написания
+NORMALIZED = "replace(replace({}.text, 'ё', 'е'), 'Ё', 'Е')"
+
+FORWARD = [
+    """
+    CREATE VIRTUAL TABLE posts_post_fts USING fts5(
+        text,
+        content='',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3 4'
+    )
+    """,
+    """
+    CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post BEGIN
+        INSERT INTO posts_post_fts (rowid, text)
+        VALUES (new.id, {new});
+    END
+    """.format(new=NORMALIZED.format("new")),
+    """
+    CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post BEGIN
+        INSERT INTO posts_post_fts (posts_post_fts, rowid, text)
+        VALUES ('delete', old.id, {old});
+    END
+    """.format(old=NORMALIZED.format("old")),
+    """
+    CREATE TRIGGER posts_post_fts_update AFTER UPDATE OF text ON posts_post
+    BEGIN
+        INSERT INTO posts_post_fts (posts_post_fts, rowid, text)
+        VALUES ('delete', old.id, {old});
+        INSERT INTO posts_post_fts (rowid, text)
+        VALUES (new.id, {new});
+    END
+    """.format(old=NORMALIZED.format("old"), new=NORMALIZED.format("new")),
+    """
+    INSERT INTO posts_post_fts (rowid, text)
+    SELECT id, {text} FROM posts_post
+    """.format(text=NORMALIZED.format("posts_post")),
+]
+
+BACKWARD = [
+    "DROP TRIGGER IF EXISTS posts_post_fts_update",
+    "DROP TRIGGER IF EXISTS posts_post_fts_delete",
+    "DROP TRIGGER IF EXISTS posts_post_fts_insert",
+    "DROP TABLE IF EXISTS posts_post_fts",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(FORWARD, BACKWARD),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 2.2.6 on 2026-10-18 19:10
+
+from django.db import migrations, models
+from django.db.models.functions import Cast, Concat, LPad
+import django.db.models.deletion
+
+
+def fill_paths(apps, schema_editor):
+    # Все прежние комментарии - корни веток: путь из одного своего id
+    Comment = apps.get_model('posts', 'Comment')
+    Comment.objects.update(path=Concat(
+        LPad(Cast('id', models.CharField()), 10, models.Value('0')),
+        models.Value('/')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_comment_page_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='posts_comment_page_idx',
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='posts.Comment'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'depth', '-created', '-id'], name='posts_comment_page_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['path', 'depth'], name='posts_comment_path_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 2.2.6 on 2026-10-18 20:05
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+import django.db.models.deletion
+
+
+def fill_stats(apps, schema_editor):
+    # Число записей ведут сигналы: стартовое значение - по текущим постам
+    Group = apps.get_model('posts', 'Group')
+    GroupStats = apps.get_model('posts', 'GroupStats')
+    groups = Group.objects.annotate(
+        total=Count('posts'), last=Max('posts__pub_date'),
+        changed=Max('posts__updated'))
+    GroupStats.objects.bulk_create(
+        GroupStats(group_id=group.pk, post_count=group.total,
+                   last_post_at=group.last, changed=group.changed)
+        for group in groups)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupStats',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='posts.Group')),
+                ('post_count', models.PositiveIntegerField(default=0)),
+                ('author_count', models.PositiveIntegerField(default=0)),
+                ('last_post_at', models.DateTimeField(blank=True, null=True)),
+                ('changed', models.DateTimeField(blank=True, null=True)),
+                ('refreshed', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
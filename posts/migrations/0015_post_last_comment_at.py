@@ -0,0 +1,40 @@
+# Generated by Django 2.2.6 on 2026-10-18 20:10
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+
+
+def fill_last_comment(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    last = (Comment.objects.filter(post=OuterRef('pk')).order_by()
+            .values('post').annotate(last=Max('created')).values('last'))
+    Post.objects.update(last_comment_at=Subquery(last))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_group_stats'),
+    ]
+
+    # AddField на SQLite пересоздаёт posts_post и теряет триггеры
+    # поискового индекса (0009): столбец добавляется ALTER TABLE
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    'ALTER TABLE "posts_post" ADD COLUMN '
+                    '"last_comment_at" datetime NULL',
+                    'ALTER TABLE "posts_post" DROP COLUMN "last_comment_at"'),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='post',
+                    name='last_comment_at',
+                    field=models.DateTimeField(blank=True, editable=False, help_text='Время последнего комментария, обновляется сигналами.', null=True),
+                ),
+            ],
+        ),
+        migrations.RunPython(fill_last_comment, migrations.RunPython.noop),
+    ]
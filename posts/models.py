@@ -1,9 +1,25 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 
+from yatube.sqlite.retry import retry_locked
+
 User = get_user_model()
 
 
+def without_counters(instance, counters, kwargs):
+    """update_fields для сохранения загруженного объекта без счётчиков.
+
+    Счётчики меняют сигналы через UPDATE с F(): значение из памяти
+    устарело бы, если между загрузкой и save() их увеличили.
+    """
+    if instance._state.adding or kwargs.get("force_insert") \
+            or kwargs.get("update_fields") is not None:
+        return kwargs
+    fields = [field.name for field in instance._meta.concrete_fields
+              if not field.primary_key and field.name not in counters]
+    return {**kwargs, "update_fields": fields}
+
+
 class Group(models.Model):
     title = models.CharField(
         verbose_name="Название группы:",
@@ -25,12 +41,20 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+
+    def for_feed(self):
+        """Лента: автор и группа одним запросом, число комментариев в записи"""
+        return self.select_related("author", "group")
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name="Текст поста",
         help_text="Поле для хранения произвольного текста"
     )
     pub_date = models.DateTimeField("date published", auto_now_add=True)
+    updated = models.DateTimeField("date updated", auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -48,15 +72,56 @@ class Post(models.Model):
     )
 
     image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    comment_count = models.PositiveIntegerField(
+        verbose_name="Комментариев:",
+        default=0,
+        editable=False,
+        help_text="Счётчик комментариев, обновляется сигналами."
+    )
+    last_comment_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        editable=False,
+        help_text="Время последнего комментария, обновляется сигналами."
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ["-pub_date"]
+        # Индексы под ленты: общая, автора, группы и курсорная пагинация
+        indexes = [
+            models.Index(fields=["author", "-pub_date"],
+                         name="posts_post_author_feed_idx"),
+            models.Index(fields=["group", "-pub_date"],
+                         name="posts_post_group_feed_idx"),
+            models.Index(fields=["-pub_date", "-id"],
+                         name="posts_post_feed_idx"),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @retry_locked
+    def save(self, *args, **kwargs):
+        # Счётчики обновляются в post_save, в той же транзакции
+        kwargs = without_counters(
+            self, ("comment_count", "last_comment_at"), kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
+    """Комментарий или ответ на него.
+
+    Ветка хранится материализованным путём: id всех предков и свой,
+    каждый дополнен нулями до PATH_DIGITS знаков и закрыт "/". Поддерево
+    ответа - диапазон path по индексу, в порядке обхода в глубину.
+    """
+    PATH_DIGITS = 10
+    # Глубже ответы становятся соседями родителя: путь не длиннее поля
+    MAX_DEPTH = 20
+
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
@@ -67,8 +132,166 @@ class Comment(models.Model):
         on_delete=models.CASCADE,
         related_name="comments"
     )
+    parent = models.ForeignKey(
+        "self",
+        on_delete=models.CASCADE,
+        related_name="replies",
+        blank=True,
+        null=True
+    )
+    path = models.CharField(max_length=255, blank=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    # Число всех ответов в поддереве, обновляется в сигналах
+    reply_count = models.PositiveIntegerField(default=0, editable=False)
     text = models.TextField()
     created = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ['-created']
\ No newline at end of file
+        ordering = ['-created']
+        indexes = [
+            # Страница комментариев верхнего уровня по ключу (created, id)
+            models.Index(fields=["post", "depth", "-created", "-id"],
+                         name="posts_comment_page_idx"),
+            models.Index(fields=["path", "depth"], name="posts_comment_path_idx"),
+        ]
+
+    @classmethod
+    def path_segment(cls, pk):
+        return str(pk).zfill(cls.PATH_DIGITS) + "/"
+
+    def ancestor_ids(self):
+        """id предков от корня ветки до родителя"""
+        if self.path:
+            segments = self.path.split("/")[:-2]
+        elif self.parent_id:
+            # Путь ещё не записан: предки - это путь родителя
+            segments = self.parent.path.split("/")[:-1]
+        else:
+            segments = []
+        return [int(segment) for segment in segments]
+
+    @retry_locked
+    def save(self, *args, **kwargs):
+        # Счётчики обновляются в post_save, в той же транзакции
+        kwargs = without_counters(self, ("reply_count",), kwargs)
+        with transaction.atomic():
+            if self.parent_id and self.parent.depth >= self.MAX_DEPTH:
+                self.parent = self.parent.parent
+            super().save(*args, **kwargs)
+            if not self.path:
+                # Последний сегмент пути - свой id, он известен после INSERT
+                parent_path = self.parent.path if self.parent_id else ""
+                self.path = parent_path + self.path_segment(self.pk)
+                self.depth = self.path.count("/") - 1
+                Comment.objects.filter(pk=self.pk).update(
+                    path=self.path, depth=self.depth)
+
+
+class Follow(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="follower",
+        verbose_name="Подписчик:"
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="following",
+        verbose_name="Автор:"
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "author"],
+                                    name="posts_follow_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} -> {self.author}"
+
+
+class TimelineEntry(models.Model):
+    """Строка материализованной ленты подписок (fan-out on write)"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="timeline"
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="timeline_entries"
+    )
+    # Копия Post.pub_date: лента читается по индексу без join
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "post"],
+                                    name="posts_timeline_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["user", "-pub_date", "-post"],
+                         name="posts_timeline_feed_idx"),
+        ]
+
+
+class GroupStats(models.Model):
+    """Сводка по группе для каталога и шапки группы (posts.groupstats).
+
+    post_count и changed ведут сигналы, остальное пересчитывается
+    периодически.
+    """
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats"
+    )
+    post_count = models.PositiveIntegerField(default=0)
+    # Разных авторов за последние GROUP_ACTIVE_DAYS дней
+    author_count = models.PositiveIntegerField(default=0)
+    last_post_at = models.DateTimeField(blank=True, null=True)
+    # Последнее добавление, правка или удаление записи группы
+    changed = models.DateTimeField(blank=True, null=True)
+    refreshed = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.group}: {self.post_count}"
+
+
+class Job(models.Model):
+    """Задача фоновой очереди (posts.jobs), выполняется run_workers"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    FAILED = "failed"
+    STATUSES = [
+        (QUEUED, "В очереди"),
+        (RUNNING, "Выполняется"),
+        (FAILED, "Ошибка"),
+    ]
+
+    # Путь к функции-задаче: posts.tasks.notify_comment
+    name = models.CharField(max_length=200)
+    # Аргументы вызова в JSON: {"args": [...], "kwargs": {...}}
+    payload = models.TextField(default="{}")
+    status = models.CharField(max_length=10, choices=STATUSES,
+                              default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField()
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Выборка готовых задач: status = queued, run_at <= now
+            models.Index(fields=["status", "run_at"],
+                         name="posts_job_ready_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
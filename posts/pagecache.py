@@ -0,0 +1,92 @@
+"""Кэш целых страниц для анонимных читателей.
+
+Ответ хранится по хосту, пути и строке запроса вместе с версиями своих
+тегов (author:<id>, group:<id>, post:<id>, feed). Сигналы моделей
+сбрасывают теги, и при чтении страница с устаревшей версией любого
+тега считается промахом. Авторизованные пользователи, POST, ответы с
+CSRF-токеном или cookie мимо кэша.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from .cache import ALL_PAGES, tag_versions
+
+PAGE_KEY = "posts:page:{}"
+STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+def tag(response, *tags):
+    """Пометить ответ тегами для кэша страниц"""
+    response.page_tags = tags
+    return response
+
+
+def page_key(request):
+    url = request.get_host() + request.get_full_path()
+    return PAGE_KEY.format(hashlib.md5(url.encode()).hexdigest())
+
+
+def cacheable(request):
+    return (request.method in ("GET", "HEAD")
+            and not request.user.is_authenticated)
+
+
+def from_cache(request, key):
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    versions, status, headers, content = entry
+    if tag_versions(versions) != versions:
+        return None
+    response = HttpResponse(content, status=status)
+    for name, value in headers.items():
+        response[name] = value
+    response["X-Page-Cache"] = "hit"
+    last_modified = parse_http_date_safe(headers.get("Last-Modified", ""))
+    return get_conditional_response(
+        request, etag=headers.get("ETag"), last_modified=last_modified,
+        response=response)
+
+
+def store(request, key, response, started):
+    tags = getattr(response, "page_tags", None)
+    if (tags is None or response.status_code != 200 or response.streaming
+            or response.cookies
+            or request.META.get("CSRF_COOKIE_USED")):
+        return
+    versions = tag_versions(tags + (ALL_PAGES,), started)
+    # Сброс во время рендеринга: страница уже могла устареть
+    if any(version > started for version in versions.values()):
+        return
+    headers = {name: response[name] for name in STORED_HEADERS
+               if response.has_header(name)}
+    cache.set(key, (versions, response.status_code, headers,
+                    response.content),
+              getattr(settings, "PAGE_CACHE_TIMEOUT", 600))
+
+
+def anonymous_page_cache(view):
+    """Декоратор вида: готовая страница для гостей без запуска вида"""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not cacheable(request):
+            return view(request, *args, **kwargs)
+        key = page_key(request)
+        response = from_cache(request, key)
+        if response is not None:
+            return response
+        started = time.time_ns()
+        response = view(request, *args, **kwargs)
+        store(request, key, response, started)
+        response["X-Page-Cache"] = "miss"
+        return response
+
+    return wrapper
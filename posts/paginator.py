@@ -0,0 +1,201 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+NEXT = "n"
+PREVIOUS = "p"
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_token(values):
+    """Непрозрачный токен из списка значений, пригодных для JSON"""
+    raw = json.dumps(values)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_token(token):
+    """Список значений из токена, InvalidCursor при любой ошибке"""
+    try:
+        padding = "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(token + padding).decode())
+    except (binascii.Error, TypeError, ValueError, UnicodeDecodeError):
+        raise InvalidCursor(token)
+    if not isinstance(values, list):
+        raise InvalidCursor(token)
+    return values
+
+
+def encode_cursor(post, direction):
+    """Непрозрачный токен курсора по ключу (pub_date, id)"""
+    return encode_token([post.pub_date.isoformat(), post.pk, direction])
+
+
+def decode_cursor(cursor):
+    """Разбор токена курсора, InvalidCursor при любой ошибке"""
+    try:
+        pub_date, pk, direction = decode_token(cursor)
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (TypeError, ValueError):
+        raise InvalidCursor(cursor)
+    if pub_date is None or direction not in (NEXT, PREVIOUS):
+        raise InvalidCursor(cursor)
+    return pub_date, pk, direction
+
+
+def after(pub_date, pk, field="id", date_field="pub_date"):
+    """Записи после (pub_date, pk) в порядке -date_field, -field.
+
+    Первое условие - диапазон по индексу, OR только уточняет границу.
+    """
+    return Q(**{date_field + "__lte": pub_date}) & (
+        Q(**{date_field + "__lt": pub_date}) | Q(**{field + "__lt": pk}))
+
+
+def before(pub_date, pk):
+    """Записи до (pub_date, pk) в порядке -pub_date, -id"""
+    return Q(pub_date__gte=pub_date) & (
+        Q(pub_date__gt=pub_date) | Q(id__gt=pk))
+
+
+class CursorPaginator:
+    """Пагинатор по ключу (pub_date, id) без COUNT(*) и OFFSET.
+
+    Стоимость любой страницы одинакова: выборка идёт по условию
+    относительно последней (первой) записи соседней страницы.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, per_page):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+
+    def get_page(self, cursor):
+        """Страница по токену, при ошибке в токене - первая страница"""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page(None)
+
+    def page(self, cursor):
+        if not cursor:
+            items = self._fetch(Q(), ("-pub_date", "-id"))
+            return CursorPage(items[:self.per_page], self,
+                              has_next=len(items) > self.per_page,
+                              has_previous=False)
+
+        pub_date, pk, direction = decode_cursor(cursor)
+        if direction == NEXT:
+            items = self._fetch(after(pub_date, pk), ("-pub_date", "-id"))
+            return CursorPage(items[:self.per_page], self,
+                              has_next=len(items) > self.per_page,
+                              has_previous=True)
+
+        items = self._fetch(before(pub_date, pk), ("pub_date", "id"))
+        if len(items) <= self.per_page:
+            # Дошли до начала ленты - отдаём полную первую страницу
+            return self.page(None)
+        return CursorPage(items[:self.per_page][::-1], self,
+                          has_next=True, has_previous=True)
+
+    def _fetch(self, condition, ordering):
+        # Одна лишняя запись показывает, есть ли страница дальше
+        queryset = self.object_list.filter(condition).order_by(*ordering)
+        return list(queryset[:self.per_page + 1])
+
+
+class CursorPage(Sequence):
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return "<Cursor page of %s items>" % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next and bool(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous and bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return encode_cursor(self.object_list[-1], NEXT)
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        return encode_cursor(self.object_list[0], PREVIOUS)
+
+
+class ForwardPage:
+    """Страница с курсором только вперёд: поиск, лента подписок"""
+    is_cursor = True
+
+    def __init__(self, object_list, next_cursor, has_previous):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def paginate(request, object_list, per_page=10, count=None):
+    """Пагинация ленты: ?cursor= - курсорный режим, иначе Paginator.
+
+    Ссылки назад/вперёд со страницы Paginator тоже курсорные: глубже
+    первой страницы нет ни COUNT(*), ни OFFSET. ?page= остаётся для
+    старых ссылок. count - заранее известное число записей.
+    """
+    if "cursor" in request.GET:
+        paginator = CursorPaginator(object_list, per_page)
+        page = paginator.get_page(request.GET.get("cursor"))
+        return paginator, page
+    paginator = Paginator(object_list, per_page)
+    if count is not None:
+        paginator.count = count
+    page = paginator.get_page(request.GET.get("page"))
+    page.is_cursor = True
+    page.next_cursor = page.previous_cursor = None
+    if page.has_next():
+        page.next_cursor = encode_cursor(page[-1], NEXT)
+    if page.has_previous():
+        page.previous_cursor = encode_cursor(page[0], PREVIOUS)
+    return paginator, page
@@ -0,0 +1,71 @@
+"""Полнотекстовый поиск по постам: FTS5-таблица posts_post_fts"""
+import re
+
+from django.db import connection
+
+from .models import Post
+from .paginator import ForwardPage, InvalidCursor, decode_token, encode_token
+
+WORD_RE = re.compile(r"\w+")
+
+# Окончания русских слов, от длинных к коротким. Запрос ищет основу
+# как префикс, поэтому "посты", "постов" и "постами" находят друг друга.
+ENDINGS = sorted((
+    "иями", "ями", "ами", "иях", "ях", "ах", "ией", "ей", "ой", "ий", "ый",
+    "ого", "его", "ому", "ему", "ыми", "ими", "ым", "им", "ом", "ем", "ам",
+    "ям", "ов", "ев", "ая", "яя", "ое", "ее", "ие", "ые", "ую", "юю", "ию",
+    "ия", "ья", "ье", "ью", "ии", "ться", "тся", "ешь", "ете", "ет", "ут",
+    "ют", "ит", "ат", "ят", "ала", "яла", "ила", "али", "или", "ал", "ил",
+    "ть", "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й",
+), key=len, reverse=True)
+MIN_STEM = 3
+
+
+def stem(word):
+    """Грубая основа слова: отрезается самое длинное окончание"""
+    word = word.lower().replace("ё", "е")
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def build_match(query):
+    """Выражение MATCH: все основы слов запроса как префиксы, через AND"""
+    terms = [stem(word) for word in WORD_RE.findall(query or "")]
+    return " ".join('"{}"*'.format(term) for term in terms if term)
+
+
+def search_posts(query, cursor=None, per_page=10):
+    """Страница результатов по релевантности (bm25), курсор по (rank, id)"""
+    match = build_match(query)
+    if not match:
+        return ForwardPage([], None, False)
+
+    sql = ("SELECT rowid, rank FROM posts_post_fts "
+           "WHERE posts_post_fts MATCH %s")
+    params = [match]
+    position = None
+    if cursor:
+        try:
+            rank, rowid = decode_token(cursor)
+            position = (float(rank), int(rowid))
+        except (InvalidCursor, TypeError, ValueError):
+            position = None
+    if position is not None:
+        sql += " AND (rank > %s OR (rank = %s AND rowid > %s))"
+        params += [position[0], position[0], position[1]]
+    sql += " ORDER BY rank, rowid LIMIT %s"
+    params.append(per_page + 1)
+
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql, params)
+        rows = db_cursor.fetchall()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_token([rows[-1][1], rows[-1][0]])
+    posts = Post.objects.for_feed().in_bulk([row[0] for row in rows])
+    object_list = [posts[row[0]] for row in rows if row[0] in posts]
+    return ForwardPage(object_list, next_cursor, position is not None)
@@ -0,0 +1,269 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (
+    post_save, post_delete, pre_delete, pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from users.models import Profile
+from .cache import ALL_PAGES, bump_feed_generation, invalidate_tags
+from .groupstats import post_changed
+from .models import Post, Group, Comment, Follow, User
+from . import tasks, timeline
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    now = timezone.now()
+    if not created:
+        # Правка меняет валидатор профиля (posts.conditional)
+        Profile.objects.filter(user_id=instance.author_id).update(changed=now)
+        return
+    updated = Profile.objects.filter(user_id=instance.author_id).update(
+        post_count=F("post_count") + 1, changed=now)
+    if not updated:
+        # Профиль заводится при первой записи автора
+        Profile.objects.get_or_create(
+            user_id=instance.author_id,
+            defaults={"post_count": Post.objects.filter(
+                author_id=instance.author_id).count(), "changed": now})
+
+
+@receiver(post_save, sender=Post)
+def post_fan_out(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    # При удалении пользователя профиль может быть уже удалён
+    Profile.objects.filter(user_id=instance.author_id).update(
+        post_count=F("post_count") - 1, changed=timezone.now())
+
+
+@receiver(post_save, sender=Post)
+def group_post_count(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old_group_id = getattr(instance, "_old_group_id", None)
+    if not created and old_group_id == instance.group_id:
+        if instance.group_id is not None:
+            post_changed(instance.group_id)
+        return
+    if old_group_id is not None:
+        post_changed(old_group_id, -1)
+    if instance.group_id is not None:
+        post_changed(instance.group_id, 1, instance.pub_date)
+
+
+@receiver(post_delete, sender=Post)
+def group_post_deleted(sender, instance, **kwargs):
+    if instance.group_id is not None:
+        post_changed(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if not created:
+        Post.objects.filter(pk=instance.post_id).update(
+            last_comment_at=instance.created)
+        return
+    Post.objects.filter(pk=instance.post_id).update(
+        comment_count=F("comment_count") + 1,
+        last_comment_at=instance.created)
+    Comment.objects.filter(pk__in=instance.ancestor_ids()).update(
+        reply_count=F("reply_count") + 1)
+    comments_changed(instance)
+    # Письмо ставится в транзакции комментария: с WRITE_BEHIND -
+    # в его пачке, без отдельного коммита
+    tasks.notify_comment.delay(instance.pk)
+
+
+def comments_changed(comment):
+    """Число комментариев на карточках профиля автора поста изменилось"""
+    Profile.objects.filter(user__posts=comment.post_id).update(
+        changed=timezone.now())
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id).update(
+        comment_count=F("comment_count") - 1)
+    comments_changed(instance)
+    # Вместе с веткой удаляются и её предки: их строк уже может не быть
+    Comment.objects.filter(pk__in=instance.ancestor_ids()).update(
+        reply_count=F("reply_count") - 1)
+
+
+def update_follow_counts(follow, delta):
+    """Счётчики подписок обоих профилей; недостающий профиль заводится"""
+    for user_id, field, lookup in (
+            (follow.user_id, "following_count", "user_id"),
+            (follow.author_id, "follower_count", "author_id")):
+        updated = Profile.objects.filter(user_id=user_id).update(
+            **{field: F(field) + delta})
+        if not updated:
+            Profile.objects.get_or_create(
+                user_id=user_id,
+                defaults={
+                    "post_count": Post.objects.filter(
+                        author_id=user_id).count(),
+                    field: Follow.objects.filter(
+                        **{lookup: user_id}).count(),
+                })
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        update_follow_counts(instance, 1)
+        timeline.backfill(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    update_follow_counts(instance, -1)
+    timeline.remove(instance)
+    # Автор опустился до лимита: его ленту снова раскладывают при записи,
+    # а посты, опубликованные без раскладки, нужно разложить сейчас
+    if timeline.follower_count(instance.author_id) == timeline.fanout_limit():
+        tasks.backfill_timeline.delay(instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def feed_changed(sender, **kwargs):
+    bump_feed_generation()
+
+
+def invalidate_pages(*tags):
+    """Сбросить теги кэша страниц сейчас и ещё раз после фиксации.
+
+    Второй сброс нужен для страниц, отрендеренных из базы до фиксации
+    и сохранённых с уже новой версией тега.
+    """
+    tags = [tag for tag in tags if tag is not None]
+    invalidate_tags(*tags)
+    transaction.on_commit(lambda: invalidate_tags(*tags))
+
+
+def post_tags(post, *groups):
+    groups = {group_id for group_id in groups if group_id is not None}
+    # Каталог групп показывает число записей
+    return ([f"post:{post.pk}", f"author:{post.author_id}"]
+            + [f"group:{group_id}" for group_id in groups]
+            + (["groups"] if groups else []))
+
+
+@receiver(pre_save, sender=Post)
+def post_group_before_save(sender, instance, raw=False, **kwargs):
+    # Пост, перенесённый в другую группу, пропадает со страницы старой
+    instance._old_group_id = None
+    if instance.pk and not raw:
+        instance._old_group_id = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list("group_id", flat=True).first())
+
+
+@receiver(post_save, sender=Post)
+def post_pages_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_pages(*post_tags(
+            instance, instance.group_id,
+            getattr(instance, "_old_group_id", None)))
+
+
+@receiver(post_delete, sender=Post)
+def post_pages_deleted(sender, instance, **kwargs):
+    invalidate_pages(*post_tags(instance, instance.group_id))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_pages_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if Comment.post.is_cached(instance):
+        author_id = instance.post.author_id
+    else:
+        author_id = (Post.objects.filter(pk=instance.post_id)
+                     .values_list("author_id", flat=True).first())
+    invalidate_pages(f"post:{instance.post_id}",
+                     author_id and f"author:{author_id}")
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_pages_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_pages(f"author:{instance.author_id}",
+                         f"author:{instance.user_id}")
+
+
+def all_pages_changed():
+    """Сбросить все страницы и ленту.
+
+    Название группы и имя автора есть в карточках на любой странице.
+    """
+    bump_feed_generation()
+    invalidate_pages(ALL_PAGES)
+
+
+def group_authors_changed(group_id):
+    """Название группы есть в карточках профилей её авторов"""
+    Profile.objects.filter(user__posts__group=group_id).update(
+        changed=timezone.now())
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    # Переименование меняет валидаторы группы и профилей авторов
+    post_changed(instance.pk)
+    group_authors_changed(instance.pk)
+
+
+@receiver(pre_delete, sender=Group)
+def group_before_delete(sender, instance, **kwargs):
+    # После удаления у записей group пуст - авторов уже не найти
+    group_authors_changed(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_pages_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        all_pages_changed()
+
+
+@receiver(pre_save, sender=User)
+def user_before_save(sender, instance, raw=False, update_fields=None,
+                     **kwargs):
+    # Вход обновляет только last_login: без лишнего запроса
+    instance._old_username = None
+    if instance.pk and not raw and (
+            update_fields is None or "username" in update_fields):
+        instance._old_username = (
+            User.objects.filter(pk=instance.pk)
+            .values_list("username", flat=True).first())
+
+
+@receiver(post_save, sender=User)
+def user_renamed(sender, instance, raw=False, **kwargs):
+    old = getattr(instance, "_old_username", None)
+    if not raw and old is not None and old != instance.username:
+        all_pages_changed()
+
+
+@receiver(post_delete, sender=User)
+def user_pages_deleted(sender, instance, **kwargs):
+    # Профиль без записей не сбросится удалением постов
+    invalidate_pages(f"author:{instance.pk}")
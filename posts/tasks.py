@@ -0,0 +1,44 @@
+"""Фоновые задачи приложения, ставятся в очередь из видов через delay()"""
+from django.conf import settings
+from django.core.mail import send_mail
+from django.urls import reverse
+
+from . import groupstats, timeline
+from .jobs import task
+from .models import Comment
+
+
+@task
+def notify_comment(comment_id):
+    """Письмо автору поста и автору комментария, на который ответили"""
+    comment = (Comment.objects
+               .select_related("author", "post__author", "parent__author")
+               .filter(pk=comment_id).first())
+    if comment is None:
+        return
+    recipients = {comment.post.author.email}
+    if comment.parent_id:
+        recipients.add(comment.parent.author.email)
+    recipients.discard(comment.author.email)
+    recipients.discard("")
+    if not recipients:
+        return
+    url = reverse("post", args=[comment.post.author.username,
+                                comment.post_id])
+    send_mail(
+        f"Новый комментарий от {comment.author.username}",
+        f"{comment.text}\n\n{url}#comment_{comment.pk}",
+        None,
+        sorted(recipients))
+
+
+@task
+def backfill_timeline(author_id):
+    """Посты автора, опубликованные без раскладки, - в ленты подписчиков"""
+    timeline.backfill_author(author_id)
+
+
+@task(every=getattr(settings, "GROUP_STATS_INTERVAL", 300))
+def refresh_group_stats():
+    """Периодический пересчёт сводок групп для каталога"""
+    groupstats.refresh_group_stats()
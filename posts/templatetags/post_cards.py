@@ -0,0 +1,72 @@
+import hashlib
+
+from django import template
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+# Ключи версионные, поэтому карточки можно хранить долго
+CARD_TIMEOUT = 60 * 60
+CARD_TEMPLATE = "includes/post_item.html"
+
+
+def card_key(post, can_edit):
+    """Ключ карточки: id, время изменения, счётчик комментариев, право правки.
+
+    Имя автора и группа в карточке меняются без правки поста, поэтому
+    в ключе и их хэш.
+    """
+    shown = [post.author.username]
+    if post.group_id:
+        shown += [post.group.slug, post.group.title]
+    return "post_card:{}:{}:{}:{}:{}".format(
+        post.pk,
+        post.updated.timestamp(),
+        post.comment_count,
+        int(can_edit),
+        hashlib.md5(repr(shown).encode()).hexdigest()[:12],
+    )
+
+
+@register.inclusion_tag(CARD_TEMPLATE)
+def post_item(post, can_edit=False):
+    """Одна карточка без кэша: {% post_item post can_edit %}"""
+    return {"post": post, "can_edit": can_edit}
+
+
+def card_template(context):
+    """Скомпилированный шаблон карточки, один на рендеринг страницы.
+
+    Как и у inclusion_tag, шаблон хранится в render_context: в цикле по
+    промахам нет ни поиска шаблона, ни make_context у render_to_string.
+    """
+    compiled = context.render_context.get(CARD_TEMPLATE)
+    if compiled is None:
+        compiled = context.template.engine.get_template(CARD_TEMPLATE)
+        context.render_context[CARD_TEMPLATE] = compiled
+    return compiled
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    """Карточки постов страницы: один get_many, рендер только промахов"""
+    user = context.get("user")
+    user_id = user.pk if user is not None and user.is_authenticated else None
+    keys = [(post, card_key(post, post.author_id == user_id))
+            for post in posts]
+    cards = cache.get_many([key for post, key in keys])
+
+    missing = {}
+    for post, key in keys:
+        if key not in cards:
+            if not missing:
+                compiled = card_template(context)
+            # new(): пустой контекст с тем же render_context и autoescape
+            missing[key] = compiled.render(context.new(
+                {"post": post, "can_edit": post.author_id == user_id}))
+    if missing:
+        cache.set_many(missing, CARD_TIMEOUT)
+        cards.update(missing)
+
+    return mark_safe("\n".join(cards[key] for post, key in keys))
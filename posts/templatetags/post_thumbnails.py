@@ -0,0 +1,18 @@
+from django import template
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.inclusion_tag("includes/post_picture.html")
+def post_picture(image, css_class="card-img"):
+    """<picture> с srcset производных, иначе заглушка и задача в пул"""
+    picture = thumbnails.derivatives(image)
+    if picture is None and image:
+        thumbnails.schedule(image.instance)
+    return {
+        "picture": picture,
+        "placeholder": thumbnails.PLACEHOLDER,
+        "css_class": css_class,
+    }
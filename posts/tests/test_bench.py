@@ -0,0 +1,34 @@
+from django.test import TestCase
+
+from ..bench import compare, measure_views, percentile, seed
+
+
+class BenchViewsTest(TestCase):
+
+    def test_percentile(self):
+        """Тест процентиль по ближайшему рангу"""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.95), 95)
+        self.assertEqual(percentile([7], 0.95), 7)
+
+    def test_measure_views(self):
+        """Тест замер всех сценариев на маленькой базе"""
+        user_ids, group_ids = seed(users=3, groups=2, posts=30, comments=10)
+        results = measure_views(user_ids, group_ids, requests=3,
+                                memory_requests=1)
+        self.assertEqual(set(results), {"index", "group_posts", "profile",
+                                        "post_view", "add_comment"})
+        for result in results.values():
+            self.assertGreater(result["queries"], 0)
+            self.assertLessEqual(result["p50_ms"], result["p95_ms"])
+
+    def test_compare(self):
+        """Тест запросы сравниваются точно, время - с допуском"""
+        baseline = {"index": {"p95_ms": 100, "queries": 4, "peak_kb": 1000}}
+        same = {"index": {"p95_ms": 140, "queries": 4, "peak_kb": 1200}}
+        self.assertEqual(compare(same, baseline), [])
+        worse = {"index": {"p95_ms": 200, "queries": 5, "peak_kb": 1000}}
+        regressions = compare(worse, baseline)
+        self.assertEqual(len(regressions), 2)
+        self.assertIn("запросов 5 > 4", regressions[0])
@@ -0,0 +1,213 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..comments import subtree, thread_page
+from ..models import Comment, Post, User
+
+
+@override_settings(COMMENTS_PER_PAGE=5)
+class CommentPagesTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="Alex")
+        self.post = Post.objects.create(text="Текст", author=self.user)
+        self.url = reverse("post", args=[self.user.username, self.post.pk])
+        self.more_url = reverse("post_comments",
+                                args=[self.user.username, self.post.pk])
+        self.guest_client = Client()
+        self.readers = [User.objects.create_user(username=f"reader{i}")
+                        for i in range(3)]
+
+    def create_comments(self, count):
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.readers[i % 3],
+                    text=f"Комментарий {i}")
+            for i in range(count))
+        # Одинаковое время: порядок и граница страниц держатся на id
+        Comment.objects.update(created=timezone.now())
+        return list(Comment.objects.order_by("-id")
+                    .values_list("text", flat=True))
+
+    def test_first_page(self):
+        """Тест на странице поста только первая страница комментариев"""
+        expected = self.create_comments(7)
+        response = self.guest_client.get(self.url)
+        comments = response.context["comments"]
+        self.assertEqual([item.text for item in comments], expected[:5])
+        self.assertIsNotNone(comments.next_cursor)
+        self.assertContains(response, "Ещё комментарии")
+        self.assertNotContains(response, expected[5])
+
+    def test_queries_do_not_depend_on_comments(self):
+        """Тест число запросов к базе не растёт с числом комментариев"""
+        self.create_comments(2)
+        with CaptureQueriesContext(connection) as few:
+            self.guest_client.get(self.url)
+        cache.clear()
+        self.create_comments(30)
+        with CaptureQueriesContext(connection) as many:
+            self.guest_client.get(self.url)
+        self.assertEqual(len(many), len(few))
+
+    def test_load_more_json(self):
+        """Тест по курсору приходят все комментарии ровно один раз"""
+        expected = self.create_comments(12)
+        cursor = self.guest_client.get(self.url).context[
+            "comments"].next_cursor
+        texts = expected[:5]
+        while cursor:
+            data = self.guest_client.get(
+                self.more_url, {"cursor": cursor, "format": "json"}).json()
+            texts += [item["text"] for item in data["comments"]]
+            self.assertIn("comment_{}".format(data["comments"][0]["id"]),
+                          data["html"])
+            cursor = data["next_cursor"]
+        self.assertEqual(texts, expected)
+
+    def test_load_more_html(self):
+        """Тест фрагмент содержит комментарии и ссылку на следующую страницу"""
+        expected = self.create_comments(12)
+        cursor = self.guest_client.get(self.url).context[
+            "comments"].next_cursor
+        response = self.guest_client.get(self.more_url, {"cursor": cursor})
+        self.assertContains(response, expected[5])
+        self.assertNotContains(response, expected[10])
+        self.assertContains(response, "js-more-comments")
+        self.assertNotContains(response, "<html")
+
+    def test_without_javascript(self):
+        """Тест ссылка ?comments= открывает следующую страницу на посте"""
+        expected = self.create_comments(7)
+        cursor = self.guest_client.get(self.url).context[
+            "comments"].next_cursor
+        response = self.guest_client.get(self.url, {"comments": cursor})
+        self.assertEqual([item.text for item in response.context["comments"]],
+                         expected[5:])
+
+    def test_invalid_cursor(self):
+        """Тест испорченный курсор: фрагмент - 400, пост - первая страница"""
+        self.create_comments(7)
+        self.assertEqual(self.guest_client.get(
+            self.more_url, {"cursor": "мусор"}).status_code, 400)
+        response = self.guest_client.get(self.url, {"comments": "мусор"})
+        self.assertEqual(len(response.context["comments"]), 5)
+
+
+@override_settings(COMMENTS_PER_PAGE=5, COMMENT_THREAD_DEPTH=2)
+class CommentThreadTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="Alex")
+        self.post = Post.objects.create(text="Текст", author=self.user)
+        self.root = self.reply(None, "Корень")
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def reply(self, parent, text):
+        return Comment.objects.create(post=self.post, author=self.user,
+                                      parent=parent, text=text)
+
+    def test_path(self):
+        """Тест путь ответа - путь родителя и свой id"""
+        child = self.reply(self.root, "Ответ")
+        grandchild = self.reply(child, "Ответ на ответ")
+        self.assertEqual(self.root.path, "%010d/" % self.root.pk)
+        self.assertEqual(grandchild.path,
+                         "%010d/%010d/%010d/" % (self.root.pk, child.pk,
+                                                 grandchild.pk))
+        self.assertEqual(grandchild.depth, 2)
+        self.assertEqual(grandchild.ancestor_ids(), [self.root.pk, child.pk])
+        self.assertEqual(list(subtree(self.root).order_by("path")),
+                         [child, grandchild])
+
+    def test_reply_count(self):
+        """Тест ответы и их удаление меняют счётчики всех предков"""
+        child = self.reply(self.root, "Ответ")
+        self.reply(child, "Ответ на ответ")
+        self.reply(self.root, "Второй ответ")
+        self.root.refresh_from_db()
+        child.refresh_from_db()
+        self.assertEqual((self.root.reply_count, child.reply_count), (3, 1))
+        child.delete()
+        self.root.refresh_from_db()
+        self.assertEqual(self.root.reply_count, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+
+    def test_thread_page(self):
+        """Тест ветка - один запрос, в глубину, до COMMENT_THREAD_DEPTH"""
+        first = self.reply(self.root, "1")
+        second = self.reply(first, "1.1")
+        too_deep = self.reply(second, "1.1.1")
+        third = self.reply(self.root, "2")
+        with self.assertNumQueries(1):
+            replies = list(thread_page(self.root))
+            [item.author.username for item in replies]
+        self.assertEqual(replies, [first, second, third])
+        self.assertNotIn(too_deep, replies)
+        self.assertTrue(replies[1].last_level)
+        self.assertIn("posts_comment_path_idx",
+                      subtree(self.root).filter(depth__lte=2).explain())
+
+    def test_thread_pages(self):
+        """Тест по курсору ветка проходится целиком без повторов"""
+        expected = [self.reply(self.root, str(i)) for i in range(12)]
+        page = thread_page(self.root)
+        replies = list(page)
+        while page.next_cursor:
+            page = thread_page(self.root, page.next_cursor)
+            replies += list(page)
+        self.assertEqual(replies, expected)
+
+    def test_add_reply(self):
+        """Тест add_comment с parent создаёт ответ в ветке"""
+        url = reverse("add_comment", args=[self.user.username, self.post.pk])
+        self.authorized_client.post(
+            url, {"text": "Ответ", "parent": self.root.pk})
+        reply = Comment.objects.get(text="Ответ")
+        self.assertEqual(reply.parent, self.root)
+        other = Post.objects.create(text="Другой", author=self.user)
+        response = self.authorized_client.post(
+            reverse("add_comment", args=[self.user.username, other.pk]),
+            {"text": "Чужой", "parent": self.root.pk})
+        self.assertEqual(response.status_code, 404)
+
+    def test_thread_endpoint(self):
+        """Тест на посте только корни, ответы - по ссылке на ветку"""
+        self.reply(self.root, "Первый ответ")
+        response = Client().get(
+            reverse("post", args=[self.user.username, self.post.pk]))
+        self.assertEqual(list(response.context["comments"]), [self.root])
+        self.assertContains(response, "Ответы (1)")
+        data = Client().get(
+            reverse("comment_thread",
+                    args=[self.user.username, self.post.pk, self.root.pk]),
+            {"format": "json"}).json()
+        self.assertEqual([item["text"] for item in data["comments"]],
+                         ["Первый ответ"])
+        self.assertEqual(data["comments"][0]["parent"], self.root.pk)
+
+    def test_rebuild_counters(self):
+        """Тест rebuild_counters восстанавливает пути и число ответов"""
+        child = self.reply(self.root, "Ответ")
+        self.reply(child, "Ответ на ответ")
+        Comment.objects.update(reply_count=0)
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.user, text="Импорт")])
+        call_command("rebuild_counters", stdout=StringIO())
+        self.root.refresh_from_db()
+        imported = Comment.objects.get(text="Импорт")
+        self.assertEqual(self.root.reply_count, 2)
+        self.assertEqual(imported.path, "%010d/" % imported.pk)
+        self.assertEqual(imported.reply_count, 0)
+        child.refresh_from_db()
+        self.assertEqual(child.reply_count, 1)
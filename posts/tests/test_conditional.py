@@ -0,0 +1,163 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+from django.utils.http import http_date
+
+from .. import thumbnails
+from ..conditional import group_state, post_state, profile_state
+from ..models import Comment, Follow, Group, Post, User
+from .test_forms import make_png
+
+
+class ConditionalGetTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="Alex")
+        self.group = Group.objects.create(title="Группа", slug="group",
+                                          description="Описание")
+        self.post = Post.objects.create(text="Текст", author=self.user,
+                                        group=self.group)
+        self.guest_client = Client()
+        self.urls = {
+            "post": reverse("post", args=[self.user.username, self.post.pk]),
+            "profile": reverse("profile", args=[self.user.username]),
+            "group": reverse("group_posts", args=[self.group.slug]),
+        }
+
+    def revalidate(self, url, client=None):
+        client = client or self.guest_client
+        etag = client.get(url)["ETag"]
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_not_modified(self):
+        """Тест повторный запрос с ETag - 304 не больше чем за запрос к базе"""
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                etag = self.guest_client.get(url)["ETag"]
+                with CaptureQueriesContext(connection) as captured:
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertLessEqual(len(captured), 1)
+
+    def test_changes_invalidate(self):
+        """Тест комментарий, правка и подписка меняют валидатор"""
+        url = self.urls["post"]
+        etag = self.guest_client.get(url)["ETag"]
+        Comment.objects.create(post=self.post, author=self.user, text="Ок")
+        self.assertEqual(self.guest_client.get(
+            url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        url = self.urls["profile"]
+        etag = self.guest_client.get(url)["ETag"]
+        reader = User.objects.create_user(username="reader")
+        Follow.objects.create(user=reader, author=self.user)
+        self.assertEqual(self.guest_client.get(
+            url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        url = self.urls["group"]
+        etag = self.guest_client.get(url)["ETag"]
+        Post.objects.create(text="Ещё", author=self.user, group=self.group)
+        self.assertEqual(self.guest_client.get(
+            url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_state_without_aggregates(self):
+        """Тест валидаторы читают сохранённые даты и счётчики"""
+        request = RequestFactory().get("/")
+        request.user = AnonymousUser()
+        states = [
+            (post_state, (self.user.username, self.post.pk)),
+            (profile_state, (self.user.username,)),
+            (group_state, (self.group.slug,)),
+        ]
+        for state, args in states:
+            with self.subTest(state=state.__name__):
+                with CaptureQueriesContext(connection) as captured:
+                    self.assertIsNotNone(state(request, *args))
+                sql = captured.captured_queries[0]["sql"].upper()
+                for aggregate in ("COUNT(", "MAX(", "SUM("):
+                    self.assertNotIn(aggregate, sql)
+
+    def test_etag_per_user(self):
+        """Тест страница автора и гостя - разные ETag"""
+        author_client = Client()
+        author_client.force_login(self.user)
+        url = self.urls["post"]
+        etag = self.guest_client.get(url)["ETag"]
+        self.assertEqual(author_client.get(
+            url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.revalidate(url, author_client).status_code, 304)
+        self.assertFalse(author_client.get(url).has_header("Last-Modified"))
+
+    def test_etag_follows_csrf_secret(self):
+        """Тест новый секрет CSRF (вход) - страница с формой заново"""
+        author_client = Client()
+        author_client.force_login(self.user)
+        url = self.urls["post"]
+        author_client.get(url)
+        etag = author_client.get(url)["ETag"]
+        secret = get_random_string(32)
+        author_client.cookies[settings.CSRF_COOKIE_NAME] = secret
+        self.assertEqual(author_client.get(
+            url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_last_modified(self):
+        """Тест If-Modified-Since для анонимов"""
+        url = self.urls["post"]
+        response = self.guest_client.get(url)
+        last_modified = response["Last-Modified"]
+        self.assertEqual(last_modified, http_date(
+            self.post.updated.timestamp()))
+        self.assertEqual(self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    def test_profile_follows_posts_and_comments(self):
+        """Тест правка записи и комментарий к ней меняют ETag профиля"""
+        url = self.urls["profile"]
+        etag = self.guest_client.get(url)["ETag"]
+        self.post.text = "Правка"
+        self.post.save()
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response["ETag"]
+        Comment.objects.create(post=self.post, author=self.user, text="Ок")
+        self.assertEqual(self.guest_client.get(
+            url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_group_rename_changes_validators(self):
+        """Тест переименование группы меняет ETag всех её страниц"""
+        etags = {name: self.guest_client.get(url)["ETag"]
+                 for name, url in self.urls.items()}
+        self.group.title = "Новое название"
+        self.group.save()
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                self.assertEqual(self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[name]).status_code, 200)
+
+    def test_generated_image_changes_validators(self):
+        """Тест готовая картинка вместо заглушки меняет ETag страниц"""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media_root):
+            self.post.image = SimpleUploadedFile(
+                "photo.png", make_png(40, 20), content_type="image/png")
+            self.post.save()
+            etags = {name: self.guest_client.get(url)["ETag"]
+                     for name, url in self.urls.items()}
+            thumbnails.generate(self.post.pk, self.post.image.name)
+            for name, url in self.urls.items():
+                with self.subTest(page=name):
+                    self.assertEqual(self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etags[name]).status_code, 200)
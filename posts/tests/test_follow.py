@@ -0,0 +1,98 @@
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from users.models import Profile
+from .. import jobs
+from ..models import Follow, Post, TimelineEntry, User
+from ..timeline import timeline_page
+
+
+class FollowTest(TestCase):
+
+    def setUp(self):
+        self.reader = User.objects.create_user(username="reader")
+        self.author = User.objects.create_user(username="author")
+        self.other = User.objects.create_user(username="other")
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_follow_unfollow(self):
+        """Тест подписка и отписка меняют счётчики профилей"""
+        self.client.get(reverse("profile_follow", args=["author"]))
+        self.client.get(reverse("profile_follow", args=["author"]))
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(self.author.profile.follower_count, 1)
+        self.assertEqual(
+            Profile.objects.get(user=self.reader).following_count, 1)
+
+        self.client.get(reverse("profile_unfollow", args=["author"]))
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(
+            Profile.objects.get(user=self.author).follower_count, 0)
+
+    def test_follow_self(self):
+        """Тест на себя подписаться нельзя"""
+        self.client.get(reverse("profile_follow", args=["reader"]))
+        self.assertFalse(Follow.objects.exists())
+
+    def test_follow_index_login_required(self):
+        """Тест лента подписок только для авторизованных"""
+        response = Client().get(reverse("follow_index"))
+        self.assertEqual(response.status_code, 302)
+
+    def test_fan_out_on_write(self):
+        """Тест новый пост появляется у подписчиков, но не у остальных"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text="Новый пост", author=self.author)
+        Post.objects.create(text="Чужой пост", author=self.other)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+
+        response = self.client.get(reverse("follow_index"))
+        self.assertContains(response, "Новый пост")
+        self.assertNotContains(response, "Чужой пост")
+        self.assertEqual(len(timeline_page(self.other)), 0)
+
+    def test_backfill_and_remove(self):
+        """Тест подписка добавляет старые посты, отписка убирает их"""
+        Post.objects.create(text="Старый пост", author=self.author)
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(len(timeline_page(self.reader)), 1)
+        follow.delete()
+        self.assertEqual(len(timeline_page(self.reader)), 0)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_popular_author_read_on_demand(self):
+        """Тест посты популярного автора читаются без раскладки"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.other)
+        for i in range(7):
+            Post.objects.create(text=f"Популярный {i}", author=self.author)
+            Post.objects.create(text=f"Обычный {i}", author=self.other)
+        self.assertFalse(TimelineEntry.objects.filter(
+            post__author=self.author).exists())
+        self.assertEqual(TimelineEntry.objects.filter(
+            user=self.reader, post__author=self.other).count(), 7)
+
+        seen = []
+        cursor = None
+        while True:
+            page = timeline_page(self.reader, cursor, per_page=5)
+            seen.extend(page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, list(Post.objects.all()))
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_popular_author_back_under_limit(self):
+        """Тест посты периода популярности остаются в ленте после отписок"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        follow = Follow.objects.create(user=self.other, author=self.author)
+        post = Post.objects.create(text="Популярный", author=self.author)
+        follow.delete()
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(list(timeline_page(self.reader)), [post])
@@ -1,6 +1,12 @@
-from django.test import Client, TestCase
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.test import Client, TestCase, override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from PIL import Image
 
 from ..models import Post, Group
 
@@ -70,3 +76,54 @@ class PostFormTest(TestCase):
         self.assertRedirects(
             response,
             reverse("post", args=[self.post.author, self.post.id]))
+
+
+def make_png(width, height):
+    buffer = BytesIO()
+    Image.new("RGB", (width, height), "white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class PostFormImageTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create_user(username="test-user")
+        cls.authorized_user = Client()
+        cls.authorized_user.force_login(cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def post_image(self, content):
+        return self.authorized_user.post(reverse("new_post"), data={
+            "text": "Пост с картинкой",
+            "image": SimpleUploadedFile("image.png", content,
+                                        content_type="image/png"),
+        })
+
+    def test_new_post_with_image(self):
+        """Тест картинка в пределах лимитов сохраняется"""
+        self.post_image(make_png(100, 50))
+        self.assertTrue(Post.objects.get(text="Пост с картинкой").image)
+
+    @override_settings(POST_IMAGE_MAX_BYTES=100)
+    def test_image_too_large(self):
+        """Тест файл больше POST_IMAGE_MAX_BYTES отклоняется"""
+        response = self.post_image(make_png(100, 50) + bytes(200))
+        self.assertFormError(response, "form", "image", "Файл больше 0 МБ.")
+        self.assertFalse(Post.objects.filter(text="Пост с картинкой").exists())
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1000000)
+    def test_image_too_many_pixels(self):
+        """Тест картинка больше POST_IMAGE_MAX_PIXELS отклоняется"""
+        response = self.post_image(make_png(2000, 1000))
+        self.assertFormError(
+            response, "form", "image", "Картинка больше 1 мегапикселей.")
@@ -0,0 +1,102 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..groupstats import refresh_group_stats
+from ..models import Group, GroupStats, Post, User
+
+
+class GroupStatsTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="Alex")
+        self.other = User.objects.create_user(username="reader")
+        self.group = Group.objects.create(title="Группа", slug="group",
+                                          description="Описание")
+        self.second = Group.objects.create(title="Вторая", slug="second")
+
+    def stats(self, group):
+        return GroupStats.objects.get(group=group)
+
+    def test_signals_keep_post_count(self):
+        """Тест число записей меняется при создании, переносе и удалении"""
+        post = Post.objects.create(text="Раз", author=self.user,
+                                   group=self.group)
+        Post.objects.create(text="Два", author=self.user, group=self.group)
+        self.assertEqual(self.stats(self.group).post_count, 2)
+        self.assertEqual(self.stats(self.group).last_post_at,
+                         Post.objects.latest("pub_date").pub_date)
+
+        post.group = self.second
+        post.save()
+        self.assertEqual(self.stats(self.group).post_count, 1)
+        self.assertEqual(self.stats(self.second).post_count, 1)
+
+        post.delete()
+        self.assertEqual(self.stats(self.second).post_count, 0)
+
+    def test_edit_changes_etag_source(self):
+        """Тест правка записи обновляет время изменения группы"""
+        post = Post.objects.create(text="Раз", author=self.user,
+                                   group=self.group)
+        before = self.stats(self.group).changed
+        post.text = "Правка"
+        post.save()
+        self.assertGreater(self.stats(self.group).changed, before)
+
+    def test_refresh(self):
+        """Тест пересчёт находит активных авторов и исправляет счётчики"""
+        Post.objects.create(text="Раз", author=self.user, group=self.group)
+        Post.objects.create(text="Два", author=self.other, group=self.group)
+        old = Post.objects.create(text="Старый", author=self.other,
+                                  group=self.second)
+        Post.objects.filter(pk=old.pk).update(
+            pub_date=timezone.now() - timedelta(days=60))
+        GroupStats.objects.filter(group=self.group).update(post_count=7)
+
+        self.assertEqual(refresh_group_stats(), 2)
+        stats = self.stats(self.group)
+        self.assertEqual((stats.post_count, stats.author_count), (2, 2))
+        stats = self.stats(self.second)
+        self.assertEqual((stats.post_count, stats.author_count), (1, 0))
+        self.assertIsNotNone(stats.refreshed)
+        self.assertEqual(refresh_group_stats(), 0)
+
+    def test_group_index(self):
+        """Тест каталог групп показывает сводки без запросов к постам"""
+        Post.objects.create(text="Раз", author=self.user, group=self.second)
+        refresh_group_stats()
+        with CaptureQueriesContext(connection) as queries:
+            response = Client().get(reverse("group_index"))
+        groups = list(response.context["page"])
+        self.assertEqual(groups, [self.second, self.group])
+        self.assertContains(response, "Записей: 1")
+        self.assertFalse([q for q in queries.captured_queries
+                          if '"posts_post"' in q["sql"]])
+
+    def test_group_page_without_count(self):
+        """Тест страница группы берёт число записей из сводки"""
+        for i in range(3):
+            Post.objects.create(text=f"Пост {i}", author=self.user,
+                                group=self.group)
+        with CaptureQueriesContext(connection) as queries:
+            response = Client().get(reverse("group_posts", args=["group"]))
+        self.assertContains(response, "Записей: 3")
+        self.assertFalse([q for q in queries.captured_queries
+                          if "COUNT(" in q["sql"].upper()
+                          and '"posts_post"' in q["sql"]])
+
+    def test_refresh_changes_etag(self):
+        """Тест пересчёт сводки меняет ETag страницы группы"""
+        Post.objects.create(text="Раз", author=self.user, group=self.group)
+        url = reverse("group_posts", args=["group"])
+        etag = Client().get(url)["ETag"]
+        refresh_group_stats()
+        self.assertEqual(Client().get(
+            url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
@@ -0,0 +1,115 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import jobs
+from ..models import Job, Post, User
+
+CALLS = []
+
+
+@jobs.task
+def remember(value, suffix=""):
+    CALLS.append(value + suffix)
+
+
+@jobs.task(max_attempts=2)
+def broken():
+    raise RuntimeError("сломалось")
+
+
+class JobQueueTest(TestCase):
+
+    def setUp(self):
+        CALLS.clear()
+
+    def test_delay_and_run(self):
+        """Тест delay ставит задачу в очередь, исполнитель выполняет и удаляет"""
+        job = remember.delay("a", suffix="b")
+        self.assertEqual(job.name, "posts.tests.test_jobs.remember")
+        self.assertEqual(CALLS, [])
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(CALLS, ["ab"])
+        self.assertFalse(Job.objects.exists())
+
+    def test_run_at(self):
+        """Тест отложенная задача не выполняется раньше времени"""
+        remember.delay("a", run_at=timezone.now() + timedelta(hours=1))
+        self.assertEqual(jobs.run_pending(), 0)
+
+    @override_settings(JOBS_RETRY_DELAY=10)
+    def test_retry_with_backoff(self):
+        """Тест упавшая задача откладывается, после max_attempts - failed"""
+        job = broken.delay()
+        started = timezone.now()
+        jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreaterEqual(job.run_at, started + timedelta(seconds=10))
+        self.assertIn("сломалось", job.last_error)
+
+        Job.objects.update(run_at=timezone.now())
+        jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertEqual(jobs.run_pending(), 0)
+
+    def test_retry_delay_grows(self):
+        """Тест пауза перед повтором растёт вдвое до предела"""
+        with self.settings(JOBS_RETRY_DELAY=10, JOBS_RETRY_MAX_DELAY=60):
+            delays = [jobs.retry_delay(n).total_seconds() for n in (1, 2, 5)]
+        self.assertTrue(10 <= delays[0] < 12.5)
+        self.assertTrue(20 <= delays[1] < 25)
+        self.assertTrue(60 <= delays[2] < 75)
+
+    def test_claim_once(self):
+        """Тест захваченная задача не достаётся второму исполнителю"""
+        remember.delay("a")
+        self.assertEqual(len(jobs.claim("first")), 1)
+        self.assertEqual(jobs.claim("second"), [])
+
+    @override_settings(JOBS_LOCK_TIMEOUT=60)
+    def test_requeue_stale(self):
+        """Тест задача умершего исполнителя возвращается в очередь"""
+        remember.delay("a")
+        jobs.claim("dead")
+        Job.objects.update(locked_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(jobs.requeue_stale(), 1)
+        jobs.run_pending()
+        self.assertEqual(CALLS, ["a"])
+
+    def test_run_workers_once(self):
+        """Тест run_workers --once выполняет готовые и периодические задачи"""
+        remember.delay("a")
+        out = StringIO()
+        call_command("run_workers", "--once", stdout=out)
+        self.assertIn("Выполнено задач: 2", out.getvalue())
+        self.assertEqual(CALLS, ["a"])
+        # Периодическая задача сама поставила следующий запуск
+        job = Job.objects.get()
+        self.assertEqual(job.name, "posts.tasks.refresh_group_stats")
+        self.assertGreater(job.run_at, timezone.now())
+
+
+class CommentNotificationTest(TestCase):
+
+    def test_comment_email(self):
+        """Тест письмо автору поста уходит из очереди, а не из запроса"""
+        author = User.objects.create_user(username="Alex",
+                                          email="alex@example.com")
+        reader = User.objects.create_user(username="reader")
+        post = Post.objects.create(text="Текст", author=author)
+        client = Client()
+        client.force_login(reader)
+        client.post(reverse("add_comment", args=[author.username, post.pk]),
+                    {"text": "Интересно"})
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["alex@example.com"])
+        self.assertIn("Интересно", mail.outbox[0].body)
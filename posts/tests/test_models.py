@@ -1,6 +1,10 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
-from ..models import Post, Group
+from ..models import Post, Group, Comment
 from django.contrib.auth import get_user_model
+from users.models import Profile
 
 
 class TestModelGroup(TestCase):
@@ -114,3 +118,52 @@ class TestModelPost(TestCase):
         value = TestModelGroup.group.__str__()
         expected = TestModelGroup.group.title
         self.assertEqual(value, expected, "__str__() не работает.")
+
+
+class TestCounters(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create_user(username="Alex")
+
+    def test_post_count(self):
+        """Тест счётчика записей автора при создании и удалении"""
+        posts = [Post.objects.create(text="Текст", author=self.user)
+                 for _ in range(3)]
+        self.assertEqual(Profile.objects.get(user=self.user).post_count, 3)
+        posts[0].delete()
+        self.assertEqual(Profile.objects.get(user=self.user).post_count, 2)
+
+    def test_comment_count(self):
+        """Тест счётчика комментариев при создании и удалении"""
+        post = Post.objects.create(text="Текст", author=self.user)
+        comments = [Comment.objects.create(post=post, author=self.user,
+                                           text="Текст")
+                    for _ in range(2)]
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 2)
+        comments[0].delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+
+    def test_stale_instance_save(self):
+        """Тест сохранение загруженного поста не затирает счётчик"""
+        post = Post.objects.create(text="Текст", author=self.user)
+        stale = Post.objects.get(pk=post.pk)
+        Comment.objects.create(post=post, author=self.user, text="Текст")
+        stale.text = "Правка"
+        stale.save()
+        post.refresh_from_db()
+        self.assertEqual((post.text, post.comment_count), ("Правка", 1))
+
+    def test_rebuild_counters(self):
+        """Тест команды rebuild_counters"""
+        post = Post.objects.create(text="Текст", author=self.user)
+        Comment.objects.create(post=post, author=self.user, text="Текст")
+        Post.objects.update(comment_count=10)
+        Profile.objects.all().delete()
+        call_command("rebuild_counters", stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(Profile.objects.get(user=self.user).post_count, 1)
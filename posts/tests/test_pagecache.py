@@ -0,0 +1,103 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class PageCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="Alex")
+        self.other = User.objects.create_user(username="leo")
+        self.group = Group.objects.create(title="Группа", slug="group",
+                                          description="Описание")
+        self.post = Post.objects.create(text="Текст", author=self.user,
+                                        group=self.group)
+        self.other_post = Post.objects.create(text="Другой",
+                                              author=self.other)
+        self.guest_client = Client()
+        self.urls = {
+            "post": reverse("post", args=["Alex", self.post.pk]),
+            "other_post": reverse("post", args=["leo", self.other_post.pk]),
+            "profile": reverse("profile", args=["Alex"]),
+            "other_profile": reverse("profile", args=["leo"]),
+            "group": reverse("group_posts", args=["group"]),
+            "index": reverse("index"),
+        }
+        for url in self.urls.values():
+            self.guest_client.get(url)
+
+    def cached(self, name):
+        return self.guest_client.get(self.urls[name])["X-Page-Cache"] == "hit"
+
+    def test_hit_without_queries(self):
+        """Тест повторный запрос гостя обслуживается без базы"""
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                with CaptureQueriesContext(connection) as captured:
+                    response = self.guest_client.get(url)
+                self.assertEqual(response["X-Page-Cache"], "hit")
+                self.assertEqual(len(captured), 0)
+
+    def test_not_modified_from_cache(self):
+        """Тест 304 по ETag сохранённой страницы"""
+        etag = self.guest_client.get(self.urls["post"])["ETag"]
+        response = self.guest_client.get(self.urls["post"],
+                                         HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_authenticated_bypass(self):
+        """Тест авторизованный пользователь кэш не использует"""
+        client = Client()
+        client.force_login(self.user)
+        client.get(self.urls["post"])
+        response = client.get(self.urls["post"])
+        self.assertFalse(response.has_header("X-Page-Cache"))
+        self.assertContains(response, "csrfmiddlewaretoken")
+
+    def test_comment_invalidates_post_and_author(self):
+        """Тест комментарий сбрасывает пост, автора и ленту, но не других"""
+        Comment.objects.create(post=self.post, author=self.other, text="Ок")
+        self.assertFalse(self.cached("post"))
+        self.assertFalse(self.cached("profile"))
+        self.assertFalse(self.cached("index"))
+        self.assertTrue(self.cached("other_post"))
+        self.assertTrue(self.cached("other_profile"))
+        self.assertTrue(self.cached("group"))
+
+    def test_post_moved_from_group(self):
+        """Тест пост, убранный из группы, пропадает со страницы группы"""
+        self.post.group = None
+        self.post.save()
+        response = self.guest_client.get(self.urls["group"])
+        self.assertEqual(response["X-Page-Cache"], "miss")
+        self.assertNotContains(response, "Текст")
+        self.assertTrue(self.cached("other_post"))
+
+    def test_follow_invalidates_both_profiles(self):
+        """Тест подписка меняет счётчики в обоих профилях"""
+        Follow.objects.create(user=self.other, author=self.user)
+        self.assertFalse(self.cached("profile"))
+        self.assertFalse(self.cached("other_profile"))
+        self.assertFalse(self.cached("post"))
+
+    def test_rename_group_and_author(self):
+        """Тест новое название группы и имя автора видны в карточках"""
+        self.group.title = "Новая группа"
+        self.group.save()
+        response = self.guest_client.get(self.urls["index"])
+        self.assertContains(response, "#Новая группа")
+
+        self.user.username = "Alexander"
+        self.user.save()
+        response = self.guest_client.get(self.urls["index"])
+        self.assertContains(response, "@Alexander")
+
+    def test_login_keeps_pages(self):
+        """Тест вход пользователя (last_login) страницы не сбрасывает"""
+        self.user.save(update_fields=["last_login"])
+        self.assertTrue(self.cached("index"))
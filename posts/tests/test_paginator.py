@@ -0,0 +1,98 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Post, Group, User
+from ..paginator import CursorPaginator, encode_cursor, NEXT
+
+
+class CursorPaginatorTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="Alex")
+        cls.group = Group.objects.create(
+            title="Название группы",
+            slug="test-slug",
+            description="тестовый текст"
+        )
+        for i in range(25):
+            Post.objects.create(
+                text="Тестовый текст" + f" {i}",
+                author=cls.user,
+                group=cls.group
+            )
+        cls.expected = list(
+            Post.objects.order_by("-pub_date", "-id").values_list(
+                "id", flat=True))
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_walk_forward_and_back(self):
+        """Тест курсоры проходят всю ленту вперёд и обратно"""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        page = paginator.get_page(None)
+        pages = [page]
+        while page.has_next():
+            page = paginator.get_page(page.next_cursor)
+            pages.append(page)
+        ids = [post.id for page in pages for post in page]
+        self.assertEqual(ids, self.expected)
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertFalse(pages[0].has_previous())
+
+        previous = paginator.get_page(pages[2].previous_cursor)
+        self.assertEqual([post.id for post in previous],
+                         [post.id for post in pages[1]])
+        first = paginator.get_page(previous.previous_cursor)
+        self.assertEqual([post.id for post in first], self.expected[:10])
+        self.assertFalse(first.has_previous())
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Тест некорректный курсор отдаёт первую страницу"""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        for cursor in ("мусор", "bm90IGpzb24", "WzEsIDIsIDNd"):
+            with self.subTest(cursor=cursor):
+                page = paginator.get_page(cursor)
+                self.assertEqual([post.id for post in page],
+                                 self.expected[:10])
+
+    def test_views_cursor_mode_without_count(self):
+        """Тест ленты в курсорном режиме не делают COUNT(*)"""
+        cursor = encode_cursor(Post.objects.get(id=self.expected[9]), NEXT)
+        pages = [
+            reverse("index"),
+            reverse("group_posts", kwargs={"slug": self.group.slug}),
+            reverse("profile", kwargs={"username": self.user.username}),
+        ]
+        for url in pages:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.guest_client.get(url + "?cursor=" + cursor)
+                page = response.context.get("page")
+                self.assertEqual([post.id for post in page],
+                                 self.expected[10:20])
+                self.assertTrue(page.has_previous())
+                self.assertContains(response, "?cursor=" + page.next_cursor)
+                self.assertFalse(any(
+                    "COUNT(" in query["sql"]
+                    for query in queries.captured_queries))
+
+    def test_first_page_links_to_cursor(self):
+        """Тест с первой страницы ссылка вперёд ведёт в курсорный режим"""
+        response = self.guest_client.get(reverse("index"))
+        page = response.context["page"]
+        self.assertNotContains(response, "?page=")
+        self.assertContains(response, "?cursor=" + page.next_cursor)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(
+                reverse("index"), {"cursor": page.next_cursor})
+        self.assertEqual([post.id for post in response.context["page"]],
+                         self.expected[10:20])
+        self.assertFalse(any("COUNT(*)" in query["sql"]
+                             for query in queries.captured_queries))
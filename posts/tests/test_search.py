@@ -0,0 +1,65 @@
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post, User
+from ..search import build_match, search_posts, stem
+
+
+class SearchTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="Alex")
+        cls.hedgehog = Post.objects.create(
+            text="Ёжик в тумане читал посты", author=cls.user)
+        cls.other = Post.objects.create(
+            text="Совсем другая запись", author=cls.user)
+        for i in range(12):
+            Post.objects.create(text=f"Пост номер {i} про туман",
+                                author=cls.user)
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_stem(self):
+        """Тест основа слова не зависит от окончания"""
+        self.assertEqual(stem("Постами"), stem("посты"))
+        self.assertEqual(stem("ёжик"), "ежик")
+        self.assertEqual(build_match('посты "; DROP'), '"пост"* "drop"*')
+
+    def test_search_russian_forms(self):
+        """Тест поиск находит другие формы слова и ё через е"""
+        page = search_posts("ежики")
+        self.assertEqual(list(page), [self.hedgehog])
+        page = search_posts("туманом")
+        self.assertIn(self.hedgehog, page.object_list)
+        self.assertNotIn(self.other, page.object_list)
+
+    def test_search_index_follows_updates(self):
+        """Тест индекс обновляется при правке и удалении поста"""
+        self.other.text = "Теперь про ежика"
+        self.other.save()
+        self.assertIn(self.other, search_posts("ежик").object_list)
+        self.assertEqual(list(search_posts("другая")), [])
+        self.other.delete()
+        self.assertNotIn(self.other, search_posts("ежик").object_list)
+
+    def test_search_cursor_pagination(self):
+        """Тест курсор проходит все результаты без повторов"""
+        page = search_posts("туман")
+        found = list(page.object_list)
+        while page.has_next():
+            page = search_posts("туман", page.next_cursor)
+            found.extend(page.object_list)
+        self.assertEqual(len(found), 13)
+        self.assertEqual(len(set(post.id for post in found)), 13)
+
+    def test_search_view(self):
+        """Тест страница поиска"""
+        response = self.guest_client.get(reverse("search"), {"q": "ежик"})
+        self.assertTemplateUsed(response, "search.html")
+        self.assertContains(response, "Ёжик в тумане")
+        response = self.guest_client.get(
+            reverse("search"), {"q": "туман"})
+        self.assertContains(response, "cursor=")
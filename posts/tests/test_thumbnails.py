@@ -0,0 +1,136 @@
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from PIL import Image
+
+from .. import thumbnails
+from ..models import Post, User
+from ..uploads import cap_resolution
+from .test_forms import make_png
+
+SMALL_GIF = (
+    b"\x47\x49\x46\x38\x39\x61\x02\x00"
+    b"\x01\x00\x80\x00\x00\x00\x00\x00"
+    b"\xFF\xFF\xFF\x21\xF9\x04\x00\x00"
+    b"\x00\x00\x00\x2C\x00\x00\x00\x00"
+    b"\x02\x00\x01\x00\x00\x02\x02\x0C"
+    b"\x0A\x00\x3B"
+)
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ThumbnailTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="Alex")
+        cls.post = Post.objects.create(
+            text="Пост с картинкой.",
+            author=cls.user,
+            image=SimpleUploadedFile("small.gif", SMALL_GIF,
+                                     content_type="image/gif")
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+        thumbnails.delete_derivatives(self.post.image.name)
+
+    def test_placeholder_until_generated(self):
+        """Тест до фоновой генерации выводится заглушка"""
+        url = reverse("post", args=[self.user.username, self.post.id])
+        response = self.guest_client.get(url)
+        self.assertContains(response, thumbnails.PLACEHOLDER)
+
+        thumbnails.generate(self.post.id, self.post.image.name)
+        picture = thumbnails.derivatives(self.post.image)
+        self.assertIsNotNone(picture)
+        response = self.guest_client.get(url)
+        self.assertContains(response, picture["srcset"])
+        self.assertContains(response, 'type="image/webp"')
+        self.assertNotContains(response, thumbnails.PLACEHOLDER)
+
+    def test_feed_card_refreshed_after_generation(self):
+        """Тест карточка в ленте обновляется после генерации"""
+        response = self.guest_client.get(reverse("index"))
+        self.assertContains(response, thumbnails.PLACEHOLDER)
+        thumbnails.generate(self.post.id, self.post.image.name)
+        response = self.guest_client.get(reverse("index"))
+        self.assertContains(
+            response, thumbnails.derivatives(self.post.image)["src"])
+
+    def test_derivative_sizes(self):
+        """Тест производные всех ширин лежат в каталоге оригинала"""
+        thumbnails.make_derivatives(self.post.image.name)
+        for image_format in thumbnails.available_formats():
+            for width in thumbnails.WIDTHS:
+                name = thumbnails.derivative_name(
+                    self.post.image.name, width, image_format)
+                with self.subTest(name=name):
+                    self.assertTrue(name.startswith("posts/"))
+                    with Image.open(default_storage.path(name)) as image:
+                        self.assertEqual(image.format, image_format)
+                        self.assertEqual(
+                            image.size,
+                            (width, round(width * thumbnails.ASPECT)))
+
+    def test_derivatives_do_not_overwrite_uploads(self):
+        """Тест производная не затирает чужую загрузку с похожим именем"""
+        stem = os.path.splitext(os.path.basename(self.post.image.name))[0]
+        other = Post.objects.create(
+            text="Похожее имя.", author=self.user,
+            image=SimpleUploadedFile(stem + "_960.jpg", SMALL_GIF,
+                                     content_type="image/jpeg"))
+        with open(other.image.path, "rb") as f:
+            original = f.read()
+        thumbnails.make_derivatives(self.post.image.name)
+        with open(other.image.path, "rb") as f:
+            self.assertEqual(f.read(), original)
+
+    def test_cap_resolution(self):
+        """Тест оригинал уменьшается до заданного размера"""
+        post = Post.objects.create(
+            text="Большая картинка.",
+            author=self.user,
+            image=SimpleUploadedFile("big.png", make_png(400, 200),
+                                     content_type="image/png")
+        )
+        self.assertTrue(cap_resolution(post.image.name, max_side=100))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+        self.assertFalse(cap_resolution(post.image.name, max_side=100))
+
+    def test_failed_generation_is_capped(self):
+        """Тест битая картинка перестаёт ставиться в очередь"""
+        name = default_storage.save(
+            "posts/broken.png",
+            SimpleUploadedFile("broken.png", b"not an image"))
+        self.addCleanup(thumbnails._failures.pop, name, None)
+        for _ in range(thumbnails.MAX_FAILURES):
+            thumbnails.generate(self.post.id, name)
+        self.assertEqual(thumbnails._failures[name], thumbnails.MAX_FAILURES)
+        self.assertFalse(thumbnails.submit(self.post.id, name))
+        self.assertNotIn(name, thumbnails._pending)
+
+    def test_atomic_save_leaves_no_temp_files(self):
+        """Тест запись производных не оставляет временных файлов"""
+        thumbnails.make_derivatives(self.post.image.name)
+        folder = os.path.dirname(default_storage.path(
+            thumbnails.derivative_name(self.post.image.name, 320, "JPEG")))
+        self.assertFalse(
+            [f for f in os.listdir(folder) if f.endswith(".tmp")])
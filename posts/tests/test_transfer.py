@@ -0,0 +1,151 @@
+import json
+import os
+import tempfile
+from datetime import datetime
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from users.models import Profile
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+
+
+class TransferTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="Alex")
+        self.reader = User.objects.create_user(username="reader")
+        self.group = Group.objects.create(title="Группа", slug="group",
+                                          description="Описание")
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.dir.name, name)
+
+    def write_ndjson(self, name, records):
+        with open(self.path(name), "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return self.path(name)
+
+    def test_import_ndjson(self):
+        """Тест импорт сохраняет даты, группы, счётчики и ленту подписок"""
+        Follow.objects.create(user=self.reader, author=self.user)
+        path = self.write_ndjson("posts.ndjson", [
+            {"text": f"Пост {i}", "author": "Alex", "group": "group",
+             "pub_date": f"2020-01-0{i + 1}T10:00:00"}
+            for i in range(5)
+        ])
+        out = StringIO()
+        call_command("import_posts", path, "--batch-size", "2",
+                     "--chunk", "1", stdout=out)
+        self.assertIn("строк/с", out.getvalue())
+
+        self.assertEqual(Post.objects.count(), 5)
+        first = Post.objects.last()
+        self.assertEqual(first.pub_date,
+                         datetime(2020, 1, 1, 10, tzinfo=timezone.utc))
+        self.assertEqual(first.group, self.group)
+        self.assertEqual(Profile.objects.get(user=self.user).post_count, 5)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 5)
+
+    def test_round_trip_csv(self):
+        """Тест экспорт и импорт CSV с комментариями и id"""
+        post = Post.objects.create(text="Текст, с запятой\nи строкой",
+                                   author=self.user)
+        Comment.objects.create(post=post, author=self.reader, text="Ответ")
+        call_command("export_posts", self.path("posts.csv"),
+                     stdout=StringIO())
+        call_command("export_posts", self.path("comments.csv"),
+                     "--kind", "comments", stdout=StringIO())
+        Post.objects.all().delete()
+
+        call_command("import_posts", self.path("posts.csv"),
+                     stdout=StringIO())
+        call_command("import_posts", self.path("comments.csv"),
+                     "--kind", "comments", stdout=StringIO())
+        imported = Post.objects.get()
+        self.assertEqual(imported.pk, post.pk)
+        self.assertEqual(imported.text, post.text)
+        self.assertEqual(imported.pub_date, post.pub_date)
+        self.assertEqual(imported.comment_count, 1)
+        self.assertEqual(imported.comments.get().author, self.reader)
+
+    def test_round_trip_replies(self):
+        """Тест ответы после экспорта и импорта остаются в своей ветке"""
+        post = Post.objects.create(text="Текст", author=self.user)
+        root = Comment.objects.create(post=post, author=self.user,
+                                      text="Корень")
+        reply = Comment.objects.create(post=post, author=self.reader,
+                                       text="Ответ", parent=root)
+        nested = Comment.objects.create(post=post, author=self.user,
+                                        text="Ответ на ответ", parent=reply)
+        call_command("export_posts", self.path("comments.ndjson"),
+                     "--kind", "comments", stdout=StringIO())
+        Comment.objects.all().delete()
+
+        call_command("import_posts", self.path("comments.ndjson"),
+                     "--kind", "comments", stdout=StringIO())
+        for comment in (root, reply, nested):
+            imported = Comment.objects.get(pk=comment.pk)
+            self.assertEqual((imported.parent_id, imported.path,
+                              imported.depth),
+                             (comment.parent_id, comment.path, comment.depth))
+        self.assertEqual(Comment.objects.get(pk=root.pk).reply_count, 2)
+
+    def test_reply_before_parent(self):
+        """Тест ответ с parent не меньше своего id - ошибка строки"""
+        post = Post.objects.create(text="Текст", author=self.user)
+        path = self.write_ndjson("comments.ndjson", [
+            {"id": 5, "post": post.pk, "parent": 7, "author": "Alex",
+             "text": "Ответ"},
+        ])
+        with self.assertRaisesMessage(CommandError, "строка 1"):
+            call_command("import_posts", path, "--kind", "comments",
+                         stdout=StringIO())
+
+    def test_parent_on_another_post(self):
+        """Тест parent из другого поста - ошибка, из той же пачки - ответ"""
+        post = Post.objects.create(text="Текст", author=self.user)
+        other = Post.objects.create(text="Другой", author=self.user)
+        root = Comment.objects.create(post=other, author=self.user,
+                                      text="Корень")
+        path = self.write_ndjson("comments.ndjson", [
+            {"id": root.pk + 1, "post": post.pk, "author": "Alex",
+             "text": "Корень"},
+            {"id": root.pk + 2, "post": post.pk, "parent": root.pk + 1,
+             "author": "Alex", "text": "Ответ"},
+            {"id": root.pk + 3, "post": post.pk, "parent": root.pk,
+             "author": "Alex", "text": "Чужой ответ"},
+        ])
+        with self.assertRaisesMessage(CommandError, "строка 3"):
+            call_command("import_posts", path, "--kind", "comments",
+                         stdout=StringIO())
+        self.assertFalse(Comment.objects.filter(post=post).exists())
+
+        path = self.write_ndjson("comments.ndjson", [
+            {"id": root.pk + 1, "post": other.pk, "parent": root.pk,
+             "author": "Alex", "text": "Ответ"},
+        ])
+        call_command("import_posts", path, "--kind", "comments",
+                     stdout=StringIO())
+        self.assertEqual(Comment.objects.get(pk=root.pk + 1).depth, 1)
+
+    def test_unknown_author(self):
+        """Тест неизвестный автор - ошибка или новый пользователь"""
+        path = self.write_ndjson("posts.ndjson", [
+            {"text": "Пост", "author": "Alex"},
+            {"text": "Пост", "author": "stranger"},
+        ])
+        with self.assertRaisesMessage(CommandError, "строка 2"):
+            call_command("import_posts", path, stdout=StringIO())
+        self.assertFalse(Post.objects.exists())
+
+        call_command("import_posts", path, "--create-authors",
+                     stdout=StringIO())
+        self.assertEqual(Post.objects.filter(
+            author__username="stranger").count(), 1)
@@ -1,3 +1,4 @@
+from django.core.cache import cache
 from django.test import TestCase, Client
 from ..models import Group, Post, User
 from django.contrib.flatpages.models import FlatPage
@@ -70,6 +71,10 @@ class StaticURLTests(TestCase):
             reverse("terms"): "flatpages/default.html"
         }
 
+    def setUp(self):
+        # Гостевые страницы иначе отдаются из кэша без рендеринга
+        cache.clear()
+
     def test_other_pages_guest_client_status_code_200(self):
         """Проверки страниц код 200"""
         for page, template in self.list_pages.items():
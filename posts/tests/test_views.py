@@ -1,10 +1,16 @@
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django import forms
 from django.contrib.flatpages.models import FlatPage
 from django.contrib.sites.models import Site
+from django.template import Context, Template
 
-from ..models import Post, Group, User
+from ..comments import comments_for
+from ..models import Post, Group, User, Comment
+from ..templatetags.post_cards import card_key
 
 
 class ViewPageContextTest(TestCase):
@@ -241,3 +247,160 @@ class PaginatorViewsTest(TestCase):
             "group_posts",
             kwargs={"slug": "test-slug"}) + "?page=2")
         self.assertEqual(len(response.context.get("page").object_list), 3)
+
+
+class FeedQueriesTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="Alex")
+        cls.group = Group.objects.create(
+            title="Название группы",
+            slug="test-slug",
+            description="тестовый текст"
+        )
+        cls.pages = [
+            reverse("index"),
+            reverse("group_posts", kwargs={"slug": cls.group.slug}),
+            reverse("profile", kwargs={"username": cls.user.username}),
+        ]
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def create_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(
+                text="Тестовый текст" + f" {i}",
+                author=self.user,
+                group=self.group
+            )
+            Comment.objects.create(post=post, author=self.user, text="Текст")
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(url)
+        return len(queries)
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        """Тест число запросов ленты не зависит от числа постов"""
+        self.create_posts(2)
+        small = {url: self.count_queries(url) for url in self.pages}
+        self.create_posts(10)
+        for url in self.pages:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), small[url])
+
+    def test_feed_queries_use_indexes(self):
+        """Тест запросы лент идут по составным индексам"""
+        self.create_posts(2)
+        plans = {
+            "posts_post_feed_idx": Post.objects.for_feed()[:10],
+            "posts_post_group_feed_idx":
+                self.group.posts.for_feed()[:10],
+            "posts_post_author_feed_idx":
+                self.user.posts.for_feed()[:10],
+            "posts_comment_page_idx":
+                comments_for(Post.objects.first().pk)[:21],
+        }
+        for index, queryset in plans.items():
+            with self.subTest(index=index):
+                self.assertIn(index, queryset.explain())
+
+    def test_feed_comment_count(self):
+        """Тест число комментариев выводится в ленте"""
+        self.create_posts(1)
+        response = self.guest_client.get(reverse("index"))
+        self.assertEqual(response.context.get("page")[0].comment_count, 1)
+        self.assertContains(response, "Комментариев: 1")
+
+
+class IndexCacheTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="Alex")
+        for i in range(13):
+            Post.objects.create(text=f"Пост номер {i}.", author=cls.user)
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def test_index_cache_per_page(self):
+        """Тест кэш index.html не отдаёт первую страницу вместо второй"""
+        self.guest_client.get(reverse("index"))
+        response = self.guest_client.get(reverse("index") + "?page=2")
+        self.assertContains(response, "Пост номер 0.")
+        self.assertNotContains(response, "Пост номер 12.")
+
+    def test_index_cache_invalidation(self):
+        """Тест новый пост и комментарий сразу видны на index.html"""
+        self.guest_client.get(reverse("index"))
+        post = Post.objects.create(text="Свежий пост.", author=self.user)
+        response = self.guest_client.get(reverse("index"))
+        self.assertContains(response, "Свежий пост.")
+        Comment.objects.create(post=post, author=self.user, text="Текст")
+        response = self.guest_client.get(reverse("index"))
+        self.assertContains(response, "Комментариев: 1")
+
+    def test_index_cached_between_changes(self):
+        """Тест без изменений index.html берётся из кэша"""
+        self.guest_client.get(reverse("index"))
+        Post.objects.filter(text="Пост номер 12.").update(text="Изменён.")
+        response = self.guest_client.get(reverse("index"))
+        self.assertContains(response, "Пост номер 12.")
+
+
+class PostCardCacheTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="Alex")
+        cls.post = Post.objects.create(text="Текст карточки.", author=cls.user)
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.user)
+        cache.clear()
+
+    def test_card_shared_between_feeds(self):
+        """Тест карточка из index.html переиспользуется в profile.html"""
+        self.guest_client.get(reverse("index"))
+        key = card_key(self.post, False)
+        cache.set(key, "<p>Карточка из кэша</p>")
+        response = self.guest_client.get(
+            reverse("profile", kwargs={"username": self.user.username}))
+        self.assertContains(response, "Карточка из кэша")
+
+    def test_card_version_changes_on_edit(self):
+        """Тест после правки поста карточка рендерится заново"""
+        self.guest_client.get(reverse("index"))
+        self.post.text = "Новый текст."
+        self.post.save()
+        response = self.guest_client.get(
+            reverse("profile", kwargs={"username": self.user.username}))
+        self.assertContains(response, "Новый текст.")
+
+    def test_card_edit_link_only_for_author(self):
+        """Тест ссылка на редактирование видна только автору"""
+        edit_url = reverse("post_edit", args=[self.user.username, self.post.id])
+        profile_url = reverse("profile", kwargs={"username": self.user.username})
+        self.assertNotContains(self.guest_client.get(profile_url), edit_url)
+        self.assertContains(self.author_client.get(profile_url), edit_url)
+
+    def test_post_item_matches_cached_card(self):
+        """Тест inclusion-тег и карточка из post_cards совпадают"""
+        self.post.refresh_from_db()
+        rendered = Template(
+            "{% load post_cards %}{% post_item post True %}"
+        ).render(Context({"post": self.post}))
+        self.author_client.get(
+            reverse("profile", kwargs={"username": self.user.username}))
+        self.assertEqual(rendered, cache.get(card_key(self.post, True)))
@@ -0,0 +1,127 @@
+import threading
+import time
+from concurrent.futures import TimeoutError
+
+from django.core.cache import cache
+from django.test import Client, TestCase, TransactionTestCase, \
+    override_settings
+from django.urls import reverse
+
+from .. import writebehind
+from ..cache import deferred_invalidation, invalidate_tags, tag_versions
+from ..models import Comment, Job, Post, User
+
+
+@override_settings(WRITE_BEHIND=True, WRITE_BEHIND_DELAY=0.2)
+class WriteBehindTest(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="Alex")
+        self.post = Post.objects.create(text="Текст", author=self.user)
+        self.addCleanup(writebehind.stop_writer)
+
+    def test_batch(self):
+        """Тест одновременные комментарии записываются одной пачкой"""
+        threads = [threading.Thread(target=writebehind.save, args=(
+            Comment(post=self.post, author=self.user, text=f"К {i}"),))
+            for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        writer = writebehind._writer
+        self.assertEqual(writer.written, 10)
+        self.assertLess(writer.batches, 10)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 10)
+        # Письма ставятся в очередь в той же пачке
+        self.assertEqual(Job.objects.filter(
+            name="posts.tasks.notify_comment").count(), 10)
+
+    def test_read_your_writes(self):
+        """Тест после ответа на POST автор видит свой комментарий"""
+        client = Client()
+        client.force_login(self.user)
+        client.post(reverse("add_comment",
+                            args=[self.user.username, self.post.pk]),
+                    {"text": "Свой комментарий"})
+        response = client.get(
+            reverse("post", args=[self.user.username, self.post.pk]))
+        self.assertContains(response, "Свой комментарий")
+        self.assertEqual(writebehind._writer.written, 1)
+
+    def test_failed_item(self):
+        """Тест ошибка одного объекта не отменяет остальные в пачке"""
+        results = {}
+
+        def save(name, comment):
+            try:
+                writebehind.save(comment)
+                results[name] = "ok"
+            except Exception as e:
+                results[name] = type(e).__name__
+
+        threads = [
+            threading.Thread(target=save, args=("good", Comment(
+                post=self.post, author=self.user, text="Хороший"))),
+            threading.Thread(target=save, args=("bad", Comment(
+                post=self.post, author=self.user, text=None))),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, {"good": "ok", "bad": "IntegrityError"})
+        self.assertTrue(Comment.objects.filter(text="Хороший").exists())
+
+    @override_settings(WRITE_BEHIND_DELAY=0.5, WRITE_BEHIND_TIMEOUT=0.05)
+    def test_timeout_cancels_queued_item(self):
+        """Тест по таймауту объект из очереди не записывается позже"""
+        with self.assertRaises(TimeoutError):
+            writebehind.save(Comment(post=self.post, author=self.user,
+                                     text="Опоздавший"))
+        writebehind.stop_writer()
+        self.assertFalse(Comment.objects.filter(text="Опоздавший").exists())
+
+    @override_settings(WRITE_BEHIND_TIMEOUT=0.05)
+    def test_timeout_waits_for_running_batch(self):
+        """Тест объект, взятый в пачку, дожидается её коммита"""
+        writer = writebehind.get_writer()
+        commit = writer.commit
+
+        def slow_commit(batch):
+            time.sleep(0.3)
+            return commit(batch)
+
+        writer.commit = slow_commit
+        writer.delay = 0
+        comment = writebehind.save(Comment(post=self.post, author=self.user,
+                                           text="Медленный"))
+        self.assertIsNotNone(comment.pk)
+        self.assertTrue(Comment.objects.filter(text="Медленный").exists())
+
+
+class DeferredWritesTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(WRITE_BEHIND=True)
+    def test_inside_transaction(self):
+        """Тест внутри транзакции запись идёт сразу, без писателя"""
+        user = User.objects.create_user(username="Alex")
+        post = writebehind.save(Post(text="Текст", author=user))
+        self.assertIsNotNone(post.pk)
+        self.assertIsNone(writebehind._writer)
+
+    def test_deferred(self):
+        """Тест сбросы тегов в блоке выполняются один раз на выходе"""
+        before = tag_versions(["post:1", "post:2"])
+        with deferred_invalidation():
+            invalidate_tags("post:1")
+            invalidate_tags("post:2")
+            self.assertEqual(tag_versions(["post:1", "post:2"]), before)
+        after = tag_versions(["post:1", "post:2"])
+        self.assertGreater(after["post:1"], before["post:1"])
+        self.assertEqual(after["post:1"], after["post:2"])
@@ -0,0 +1,191 @@
+"""Производные картинок постов: создаются в фоновом пуле, шаблоны читают"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .cache import bump_feed_generation, invalidate_tags
+from .uploads import cap_resolution, save_atomic
+
+logger = logging.getLogger(__name__)
+
+# Ширины производных и пропорции карточки 960x339
+WIDTHS = (320, 640, 960)
+ASPECT = 339 / 960
+
+# Формат -> (расширение, MIME, параметры сохранения); JPEG - запасной
+FALLBACK = "JPEG"
+FORMATS = {
+    "AVIF": ("avif", "image/avif", {"quality": 60}),
+    "WEBP": ("webp", "image/webp", {"quality": 80, "method": 4}),
+    "JPEG": ("jpg", "image/jpeg", {"quality": 85, "optimize": True,
+                                   "progressive": True}),
+}
+
+# Серый прямоугольник 960x339 вместо ещё не готовой картинки
+PLACEHOLDER = (
+    "data:image/svg+xml;charset=utf-8,"
+    "%3Csvg xmlns=%27http://www.w3.org/2000/svg%27"
+    " width=%27960%27 height=%27339%27%3E"
+    "%3Crect width=%27100%25%27 height=%27100%25%27 fill=%27%23e9ecef%27/%3E"
+    "%3C/svg%3E"
+)
+
+# Неудачных попыток на картинку, после них задача больше не ставится
+MAX_FAILURES = 3
+
+_executor = None
+_pending = set()
+# Имя картинки -> число неудачных генераций в этом процессе
+_failures = {}
+_lock = threading.Lock()
+
+
+def available_formats():
+    """Форматы из FORMATS, которые умеет сохранять установленный Pillow"""
+    Image.init()
+    return [name for name in FORMATS if name in Image.SAVE]
+
+
+def derivative_name(name, width, image_format):
+    """posts/photo.png -> posts/derivatives/photo.png/640.webp.
+
+    Свой каталог на оригинал: имя загрузки (upload_to и
+    get_available_name) с производной другой картинки не совпадёт.
+    """
+    folder, base = os.path.split(name)
+    return "{}/derivatives/{}/{}.{}".format(
+        folder, base, width, FORMATS[image_format][0])
+
+
+def srcset(name, image_format):
+    return ", ".join(
+        "{} {}w".format(
+            default_storage.url(derivative_name(name, width, image_format)),
+            width)
+        for width in WIDTHS)
+
+
+def derivatives(image):
+    """Набор производных для шаблона или None, если они ещё не готовы"""
+    if not image:
+        return None
+    name = image.name
+    largest = derivative_name(name, WIDTHS[-1], FALLBACK)
+    if not default_storage.exists(largest):
+        return None
+    sources = []
+    for image_format in available_formats():
+        if image_format == FALLBACK or not default_storage.exists(
+                derivative_name(name, WIDTHS[-1], image_format)):
+            continue
+        sources.append({
+            "type": FORMATS[image_format][1],
+            "srcset": srcset(name, image_format),
+        })
+    return {
+        "sources": sources,
+        "srcset": srcset(name, FALLBACK),
+        "src": default_storage.url(largest),
+    }
+
+
+def make_derivatives(name):
+    """Нарезать все ширины во всех форматах за одно декодирование"""
+    formats = available_formats()
+    with default_storage.open(name) as f, Image.open(f) as source:
+        source = ImageOps.exif_transpose(source)
+        if source.mode not in ("RGB", "RGBA"):
+            source = source.convert("RGBA")
+        for width in WIDTHS:
+            size = (width, round(width * ASPECT))
+            resized = ImageOps.fit(source, size, Image.LANCZOS)
+            for image_format in formats:
+                save_derivative(resized, name, width, image_format)
+
+
+def save_derivative(image, name, width, image_format):
+    """Атомарная запись: уникальный временный файл и os.replace"""
+    options = FORMATS[image_format][2]
+    if image_format == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    path = default_storage.path(derivative_name(name, width, image_format))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    save_atomic(image, path, image_format, **options)
+
+
+def delete_derivatives(name):
+    for image_format in FORMATS:
+        for width in WIDTHS:
+            default_storage.delete(derivative_name(name, width, image_format))
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "THUMBNAIL_WORKERS", 2),
+                thread_name_prefix="thumbnails")
+        return _executor
+
+
+def generate(post_id, name):
+    """Уменьшить оригинал, нарезать производные, сбросить карточки поста"""
+    from users.models import Profile
+    from .groupstats import post_changed
+    from .models import Post
+    try:
+        # Сначала оригинал уменьшается до POST_IMAGE_MAX_SIDE
+        cap_resolution(name)
+        make_derivatives(name)
+        # Новый updated меняет ключ карточки, поколение - кэш ленты
+        now = timezone.now()
+        Post.objects.filter(pk=post_id).update(updated=now)
+        bump_feed_generation()
+        post = Post.objects.filter(pk=post_id).values(
+            "author_id", "group_id").first()
+        if post is not None:
+            # Заглушку в карточке сменила картинка: валидаторы профиля
+            # и группы (posts.conditional) тоже меняются
+            Profile.objects.filter(user_id=post["author_id"]).update(
+                changed=now)
+            if post["group_id"] is not None:
+                post_changed(post["group_id"])
+            tags = [f"post:{post_id}", f"author:{post['author_id']}"]
+            if post["group_id"] is not None:
+                tags.append(f"group:{post['group_id']}")
+            invalidate_tags(*tags)
+    except Exception:
+        logger.exception("Не удалось создать производные %s", name)
+        with _lock:
+            _failures[name] = _failures.get(name, 0) + 1
+    finally:
+        with _lock:
+            _pending.discard(name)
+
+
+def submit(post_id, name):
+    """Отдать генерацию в пул; False, если она уже идёт или отключена"""
+    with _lock:
+        # Повторные запросы той же картинки не дублируют работу,
+        # битая картинка не генерируется на каждом рендере
+        if name in _pending or _failures.get(name, 0) >= MAX_FAILURES:
+            return False
+        _pending.add(name)
+    get_executor().submit(generate, post_id, name)
+    return True
+
+
+def schedule(post):
+    """Поставить создание производных в пул после фиксации транзакции"""
+    if not post.image:
+        return
+    post_id, name = post.pk, post.image.name
+    transaction.on_commit(lambda: submit(post_id, name))
@@ -0,0 +1,127 @@
+"""Лента подписок: fan-out on write с переходом на fan-out on read.
+
+Посты обычных авторов раскладываются в TimelineEntry каждого
+подписчика при публикации. У авторов, у которых подписчиков больше
+TIMELINE_FANOUT_LIMIT, посты читаются из posts_post при показе ленты.
+Обе выборки идут по индексам и ограничены размером страницы. Когда
+автор снова опускается до лимита, посты, опубликованные без раскладки,
+раскладываются задачей posts.tasks.backfill_timeline.
+"""
+from django.conf import settings
+
+from users.models import Profile
+from .models import Post, Follow, TimelineEntry
+from .paginator import ForwardPage, InvalidCursor, NEXT, after
+from .paginator import decode_cursor, encode_cursor
+
+# Сколько последних постов автора попадает в ленту при подписке
+BACKFILL = 100
+
+
+def fanout_limit():
+    return getattr(settings, "TIMELINE_FANOUT_LIMIT", 1000)
+
+
+def follower_count(author_id):
+    return (Profile.objects.filter(user_id=author_id)
+            .values_list("follower_count", flat=True).first() or 0)
+
+
+def fan_out(post):
+    """Разложить новый пост в ленты подписчиков автора"""
+    if follower_count(post.author_id) > fanout_limit():
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list("user_id", flat=True)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers.iterator()),
+        batch_size=500, ignore_conflicts=True)
+
+
+def fan_out_many(rows):
+    """Раскладка пачки постов (id, author_id, pub_date) после импорта"""
+    rows = list(rows)
+    if not rows:
+        return
+    limit = fanout_limit()
+    authors = {author_id for post_id, author_id, pub_date in rows}
+    popular = set(Profile.objects.filter(
+        user_id__in=authors, follower_count__gt=limit)
+        .values_list("user_id", flat=True))
+    followers = {}
+    for user_id, author_id in Follow.objects.filter(
+            author_id__in=authors - popular).values_list("user_id",
+                                                         "author_id"):
+        followers.setdefault(author_id, []).append(user_id)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, author_id, pub_date in rows
+         for user_id in followers.get(author_id, ())),
+        batch_size=500, ignore_conflicts=True)
+
+
+def backfill(follow):
+    """Добавить в ленту подписчика последние посты нового автора"""
+    if follower_count(follow.author_id) > fanout_limit():
+        return
+    posts = (Post.objects.filter(author_id=follow.author_id)
+             .order_by("-pub_date", "-id")
+             .values_list("id", "pub_date")[:BACKFILL])
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=follow.user_id, post_id=post_id,
+                       pub_date=pub_date)
+         for post_id, pub_date in posts),
+        ignore_conflicts=True)
+
+
+def backfill_author(author_id):
+    """Последние посты автора - в ленты всех его подписчиков"""
+    fan_out_many(Post.objects.filter(author_id=author_id)
+                 .order_by("-pub_date", "-id")
+                 .values_list("id", "author_id", "pub_date")[:BACKFILL])
+
+
+def remove(follow):
+    """Убрать посты автора из ленты отписавшегося"""
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id,
+        post__author_id=follow.author_id).delete()
+
+
+def timeline_page(user, cursor=None, per_page=10):
+    """Страница ленты подписок: слияние двух выборок по (pub_date, id)"""
+    position = None
+    if cursor:
+        try:
+            pub_date, pk, direction = decode_cursor(cursor)
+            position = (pub_date, pk)
+        except InvalidCursor:
+            position = None
+
+    entries = TimelineEntry.objects.filter(user=user)
+    if position:
+        entries = entries.filter(after(*position, field="post_id"))
+    keys = set(entries.order_by("-pub_date", "-post_id")
+               .values_list("pub_date", "post_id")[:per_page + 1])
+
+    popular = Profile.objects.filter(
+        user__following__user=user,
+        follower_count__gt=fanout_limit()).values_list("user_id", flat=True)
+    popular = list(popular)
+    if popular:
+        direct = Post.objects.filter(author_id__in=popular)
+        if position:
+            direct = direct.filter(after(*position))
+        keys.update(direct.order_by("-pub_date", "-id")
+                    .values_list("pub_date", "id")[:per_page + 1])
+
+    keys = sorted(keys, reverse=True)
+    posts = Post.objects.for_feed().in_bulk(
+        [pk for pub_date, pk in keys[:per_page]])
+    object_list = [posts[pk] for pub_date, pk in keys[:per_page]
+                   if pk in posts]
+    next_cursor = None
+    if len(keys) > per_page and object_list:
+        next_cursor = encode_cursor(object_list[-1], NEXT)
+    return ForwardPage(object_list, next_cursor, position is not None)
@@ -0,0 +1,352 @@
+"""Массовый импорт и экспорт постов и комментариев: NDJSON и CSV"""
+import csv
+import json
+import sys
+import time
+from contextlib import contextmanager
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .cache import ALL_PAGES, bump_feed_generation, invalidate_tags
+from .models import Post, Group, Comment, Follow, User
+from .timeline import fan_out_many
+
+FORMATS = ("ndjson", "csv")
+
+# Поля записи в файле; author и group - username и slug, не id.
+# parent - id комментария, на который это ответ; пути ветки строятся
+# после импорта (rebuild_counters)
+FIELDS = {
+    "posts": ("id", "text", "pub_date", "author", "group", "image"),
+    "comments": ("id", "post", "parent", "author", "text", "created"),
+}
+
+
+class TransferError(Exception):
+    """Ошибка в строке файла импорта"""
+
+    def __init__(self, line, message):
+        super().__init__(f"строка {line}: {message}")
+        self.line = line
+
+
+def guess_format(path, default="ndjson"):
+    if path.endswith(".csv"):
+        return "csv"
+    if path.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return default
+
+
+@contextmanager
+def open_stream(path, mode):
+    """Файл или stdin/stdout для "-" """
+    if path == "-":
+        yield sys.stdin if "r" in mode else sys.stdout
+        return
+    with open(path, mode, encoding="utf-8", newline="") as stream:
+        yield stream
+
+
+def read_records(stream, file_format):
+    """Пары (номер строки, словарь) по одной записи, без чтения файла целиком"""
+    if file_format == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line, text in enumerate(stream, 1):
+        if not text.strip():
+            continue
+        try:
+            record = json.loads(text)
+        except ValueError as e:
+            raise TransferError(line, f"некорректный JSON ({e})")
+        if not isinstance(record, dict):
+            raise TransferError(line, "ожидается объект JSON")
+        yield line, record
+
+
+class RecordWriter:
+    """Запись словарей в NDJSON или CSV с заголовком"""
+
+    def __init__(self, stream, file_format, fields):
+        self.stream = stream
+        self.csv = None
+        if file_format == "csv":
+            self.csv = csv.DictWriter(stream, fieldnames=fields)
+            self.csv.writeheader()
+
+    def write(self, record):
+        if self.csv is not None:
+            self.csv.writerow({key: "" if value is None else value
+                               for key, value in record.items()})
+        else:
+            self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class Lookup:
+    """Кэш username -> id и slug -> id, недостающие ключи - одним запросом"""
+
+    def __init__(self, model, field, create=None):
+        self.model = model
+        self.field = field
+        self.create = create
+        self.ids = {}
+
+    def load(self, keys):
+        missing = {key for key in keys if key and key not in self.ids}
+        if not missing:
+            return
+        found = self.model.objects.filter(
+            **{self.field + "__in": missing}).values_list(self.field, "id")
+        self.ids.update(found)
+        missing -= self.ids.keys()
+        if missing and self.create is not None:
+            self.model.objects.bulk_create(
+                (self.create(key) for key in missing), ignore_conflicts=True)
+            self.ids.update(self.model.objects.filter(
+                **{self.field + "__in": missing})
+                .values_list(self.field, "id"))
+
+    def get(self, key):
+        return self.ids.get(key)
+
+
+@contextmanager
+def keep_dates(model):
+    """Отключить auto_now/auto_now_add: даты берутся из файла"""
+    fields = [field for field in model._meta.concrete_fields
+              if getattr(field, "auto_now", False)
+              or getattr(field, "auto_now_add", False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def parse_date(line, value, now):
+    if not value:
+        return now
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise TransferError(line, f"некорректная дата {value!r}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.utc)
+    return parsed
+
+
+def parse_id(line, value, name="id"):
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise TransferError(line, f"некорректный {name} {value!r}")
+
+
+def _batches(records, batch_size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Importer:
+    """Импорт пачками через bulk_create.
+
+    Каждые chunk пачек фиксируются одной транзакцией: при ошибке
+    откатывается только текущая порция, уже импортированное остаётся.
+    Сигналы bulk_create не вызывает, поэтому счётчики, лента подписок и
+    поколение кэша ленты обновляются после импорта (finish).
+    """
+
+    def __init__(self, kind, batch_size=1000, chunk=10,
+                 create_authors=False):
+        self.kind = kind
+        self.batch_size = batch_size
+        self.chunk = chunk
+        self.now = timezone.now()
+        self.users = Lookup(
+            User, "username",
+            (lambda name: User(username=name)) if create_authors else None)
+        self.groups = Lookup(Group, "slug")
+        self.parent_posts = {}
+        self.rows = 0
+        self.committed = 0
+
+    def run(self, records, progress=None):
+        model = Post if self.kind == "posts" else Comment
+        batches = _batches(records, self.batch_size)
+        try:
+            with keep_dates(model):
+                while True:
+                    with transaction.atomic():
+                        done = 0
+                        for batch in batches:
+                            self.import_batch(batch)
+                            done += 1
+                            if done >= self.chunk:
+                                break
+                    self.committed = self.rows
+                    if progress is not None and done:
+                        progress(self.committed)
+                    if done < self.chunk:
+                        break
+        finally:
+            # Уже зафиксированные порции учитываются и при ошибке
+            self.finish()
+        return self.committed
+
+    def import_batch(self, batch):
+        self.users.load(record.get("author") for line, record in batch)
+        if self.kind == "posts":
+            self.groups.load(record.get("group") for line, record in batch)
+            objects = [self.make_post(line, record) for line, record in batch]
+            last_id = Post.objects.aggregate(last=Max("id"))["last"] or 0
+            Post.objects.bulk_create(objects)
+            self.fan_out(objects, last_id)
+        else:
+            self.load_parents(batch)
+            objects = [self.make_comment(line, record)
+                       for line, record in batch]
+            Comment.objects.bulk_create(objects)
+        self.rows += len(objects)
+
+    def author_id(self, line, record):
+        author_id = self.users.get(record.get("author"))
+        if author_id is None:
+            raise TransferError(
+                line, f"нет пользователя {record.get('author')!r}")
+        return author_id
+
+    def make_post(self, line, record):
+        group_id = None
+        if record.get("group"):
+            group_id = self.groups.get(record["group"])
+            if group_id is None:
+                raise TransferError(line, f"нет группы {record['group']!r}")
+        if not record.get("text"):
+            raise TransferError(line, "пустой text")
+        pub_date = parse_date(line, record.get("pub_date"), self.now)
+        return Post(id=parse_id(line, record.get("id")),
+                    text=record["text"],
+                    pub_date=pub_date,
+                    updated=pub_date,
+                    author_id=self.author_id(line, record),
+                    group_id=group_id,
+                    image=record.get("image") or "")
+
+    def load_parents(self, batch):
+        """id родителя -> id поста: из пачки и одним запросом из базы.
+
+        Прежние пачки уже записаны bulk_create, их строки в базе.
+        """
+        self.parent_posts = {}
+        parent_ids = set()
+        for line, record in batch:
+            comment_id = parse_id(line, record.get("id"))
+            if comment_id is not None:
+                self.parent_posts[comment_id] = parse_id(
+                    line, record.get("post"), "post")
+            parent_ids.add(parse_id(line, record.get("parent"), "parent"))
+        parent_ids -= self.parent_posts.keys() | {None}
+        if parent_ids:
+            self.parent_posts.update(Comment.objects.filter(
+                pk__in=parent_ids).values_list("id", "post_id"))
+
+    def make_comment(self, line, record):
+        post_id = parse_id(line, record.get("post"), "post")
+        if post_id is None:
+            raise TransferError(line, "не указан post")
+        if not record.get("text"):
+            raise TransferError(line, "пустой text")
+        comment_id = parse_id(line, record.get("id"))
+        parent_id = parse_id(line, record.get("parent"), "parent")
+        # Родитель раньше ответа: в файле не бывает циклов
+        if parent_id is not None and comment_id is not None \
+                and parent_id >= comment_id:
+            raise TransferError(line, "parent должен быть меньше id")
+        if parent_id is not None:
+            parent_post_id = self.parent_posts.get(parent_id)
+            if parent_post_id is None:
+                raise TransferError(line, f"нет комментария {parent_id}")
+            if parent_post_id != post_id:
+                raise TransferError(
+                    line, f"комментарий {parent_id} к другому посту")
+        return Comment(id=comment_id,
+                       post_id=post_id,
+                       parent_id=parent_id,
+                       author_id=self.author_id(line, record),
+                       text=record["text"],
+                       created=parse_date(line, record.get("created"),
+                                          self.now))
+
+    def fan_out(self, objects, last_id):
+        """Разложить пачку по лентам подписчиков.
+
+        На SQLite bulk_create не возвращает id, новые строки находятся
+        по id больше прежнего максимума и по явно заданным id.
+        """
+        authors = {post.author_id for post in objects}
+        if not Follow.objects.filter(author_id__in=authors).exists():
+            return
+        ids = {post.id for post in objects if post.id is not None}
+        posts = Post.objects.filter(id__gt=last_id).values_list(
+            "id", "author_id", "pub_date")
+        rows = set(posts)
+        if ids:
+            rows.update(Post.objects.filter(id__in=ids).values_list(
+                "id", "author_id", "pub_date"))
+        fan_out_many(rows)
+
+    def finish(self):
+        call_command("rebuild_counters", stdout=StringIO())
+        bump_feed_generation()
+        invalidate_tags(ALL_PAGES)
+
+
+def export_records(kind, batch_size=1000):
+    """Записи для файла экспорта в порядке id, чтение итератором"""
+    if kind == "posts":
+        rows = Post.objects.order_by("id").values_list(
+            "id", "text", "pub_date", "author__username", "group__slug",
+            "image")
+    else:
+        rows = Comment.objects.order_by("id").values_list(
+            "id", "post_id", "parent_id", "author__username", "text",
+            "created")
+    fields = FIELDS[kind]
+    for row in rows.iterator(chunk_size=batch_size):
+        record = dict(zip(fields, row))
+        for key in ("pub_date", "created"):
+            if record.get(key) is not None:
+                record[key] = record[key].isoformat()
+        if kind == "posts":
+            record["image"] = record["image"] or None
+        yield record
+
+
+class Throughput:
+    """Счётчик строк в секунду для отчёта команд"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+
+    def report(self, rows):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return "{} строк за {:.2f} с, {:.0f} строк/с".format(
+            rows, elapsed, rows / elapsed)
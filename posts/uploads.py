@@ -0,0 +1,116 @@
+"""Загрузка картинок: поток во временный файл, проверка без декодирования"""
+import os
+import tempfile
+
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """Файлы пишутся во временный файл частями, сверх лимита - отбрасываются.
+
+    Обрезанный файл помечается truncated, форма сообщает об ошибке.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.POST_IMAGE_MAX_BYTES:
+            return None
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(min(file_size, self.received))
+        uploaded.truncated = self.received > settings.POST_IMAGE_MAX_BYTES
+        uploaded.size = self.received
+        return uploaded
+
+
+class BoundedImageField(forms.ImageField):
+    """ImageField с лимитами размера файла и числа пикселей.
+
+    Размеры читаются из заголовка до полной проверки Pillow, поэтому
+    декомпрессионная бомба отклоняется, не будучи распакованной.
+    """
+    default_error_messages = {
+        "too_large": "Файл больше %(limit)s МБ.",
+        "too_many_pixels": "Картинка больше %(limit)s мегапикселей.",
+    }
+
+    def to_python(self, data):
+        if data in self.empty_values:
+            return super().to_python(data)
+
+        limit = settings.POST_IMAGE_MAX_BYTES
+        if getattr(data, "truncated", False) or data.size > limit:
+            raise ValidationError(
+                self.error_messages["too_large"], code="too_large",
+                params={"limit": limit // (1024 * 1024)})
+
+        if hasattr(data, "temporary_file_path"):
+            source = data.temporary_file_path()
+        else:
+            source = data
+        try:
+            with Image.open(source) as image:
+                width, height = image.size
+        except (Image.DecompressionBombError, OSError):
+            raise ValidationError(
+                self.error_messages["invalid_image"], code="invalid_image")
+        finally:
+            if hasattr(data, "seek"):
+                data.seek(0)
+
+        limit = settings.POST_IMAGE_MAX_PIXELS
+        if width * height > limit:
+            raise ValidationError(
+                self.error_messages["too_many_pixels"],
+                code="too_many_pixels",
+                params={"limit": limit // 1000000})
+        return super().to_python(data)
+
+
+def cap_resolution(name, max_side=None):
+    """Уменьшить сохранённую картинку до max_side по большей стороне.
+
+    Вызывается из фонового пула миниатюр. JPEG декодируется сразу в
+    уменьшенном масштабе (draft), файл заменяется атомарно.
+    """
+    max_side = max_side or settings.POST_IMAGE_MAX_SIDE
+    path = default_storage.path(name)
+    with Image.open(path) as image:
+        if max(image.size) <= max_side or getattr(image, "is_animated", False):
+            return False
+        image_format = image.format
+        image.draft(image.mode, (max_side, max_side))
+        image.thumbnail((max_side, max_side))
+        if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        save_atomic(image, path, image_format)
+    return True
+
+
+def save_atomic(image, path, image_format, **options):
+    """Запись картинки через уникальный временный файл и os.replace.
+
+    Имя временного файла своё у каждой записи: процессы, пишущие ту же
+    картинку одновременно, не портят файлы друг друга.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with open(fd, "wb") as f:
+            image.save(f, format=image_format, **options)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
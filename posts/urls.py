@@ -6,9 +6,21 @@ urlpatterns = [
     path("", views.index, name="index"),
     path("new/", views.new_post, name="new_post"),
     path("group/<slug:slug>/", views.group_posts, name="group_posts"),
+    path("groups/", views.group_index, name="group_index"),
+    path("search/", views.search, name="search"),
+    path("follow/", views.follow_index, name="follow_index"),
     path("<str:username>/", views.profile, name="profile"),
+    path("<str:username>/follow/", views.profile_follow,
+         name="profile_follow"),
+    path("<str:username>/unfollow/", views.profile_unfollow,
+         name="profile_unfollow"),
     # Просмотр записи
     path("<str:username>/<int:post_id>/", views.post_view, name="post"),
+    path("<str:username>/<int:post_id>/comments/", views.post_comments,
+         name="post_comments"),
+    path("<str:username>/<int:post_id>/comments/<int:comment_id>/",
+         views.comment_thread,
+         name="comment_thread"),
     path("<str:username>/<int:post_id>/edit/",
          views.post_edit,
          name="post_edit"),
@@ -1,39 +1,85 @@
 from django.shortcuts import render
 from django.shortcuts import get_object_or_404
 from django.shortcuts import redirect
+from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db.models import F
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.template.loader import render_to_string
 
+from .cache import get_feed_generation
+from .comments import comment_page, thread_page
+from .conditional import group_condition, post_condition, profile_condition
 from .forms import PostForm, FormComments
-from .models import Post, Group, User, Comment
+from .pagecache import anonymous_page_cache, tag
+from .models import Post, Group, User, Comment, Follow
+from .paginator import InvalidCursor, paginate
+from .search import search_posts
+from .timeline import timeline_page
+from . import thumbnails, writebehind
 
 
 
+@anonymous_page_cache
 def index(request):
     """Главная страницы"""
-    posts = Post.objects.select_related("group")
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
+    posts = Post.objects.for_feed()
+    paginator, page = paginate(request, posts)
     context = {
         "page": page,
-        "paginator": paginator
+        "paginator": paginator,
+        "feed_generation": get_feed_generation(),
+        "page_key": request.GET.get("cursor") or getattr(page, "number", 1),
     }
-    return render(request, "index.html", context)
+    return tag(render(request, "index.html", context), "feed")
 
 
+@anonymous_page_cache
+@group_condition
 def group_posts(request, slug):
-    """Страница автора"""
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
+    """Страница группы: шапка и число страниц - по сводке GroupStats"""
+    group = get_object_or_404(Group.objects.select_related("stats"),
+                              slug=slug)
+    stats = getattr(group, "stats", None)
+    posts = group.posts.for_feed()
+    paginator, page = paginate(request, posts,
+                               count=stats and stats.post_count)
     context = {
         "group": group,
+        "stats": stats,
         "page": page,
         "paginator": paginator
     }
-    return render(request, "group.html", context)
+    return tag(render(request, "group.html", context), f"group:{group.pk}")
+
+
+@anonymous_page_cache
+def group_index(request):
+    """Каталог групп: сводки из GroupStats, без агрегатов по постам"""
+    groups = (Group.objects.select_related("stats")
+              .order_by(F("stats__post_count").desc(nulls_last=True),
+                        "title"))
+    paginator = Paginator(groups, 20)
+    page = paginator.get_page(request.GET.get("page"))
+    return tag(render(request, "groups.html", {"page": page}), "groups")
+
+
+def search(request):
+    """Поиск по тексту постов"""
+    query = request.GET.get("q", "").strip()
+    page = search_posts(query, request.GET.get("cursor"))
+    context = {
+        "query": query,
+        "page": page,
+    }
+    return render(request, "search.html", context)
+
+
+@login_required
+def follow_index(request):
+    """Лента подписок"""
+    page = timeline_page(request.user, request.GET.get("cursor"))
+    return render(request, "follow.html", {"page": page})
 
 
 def new_post(request):
@@ -48,7 +94,8 @@ def new_post(request):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        writebehind.save(post)
+        thumbnails.schedule(post)
         return redirect("index")
     context = {
         "form": form,
@@ -57,35 +104,132 @@ def new_post(request):
     return render(request, 'index.html', context)
 
 
+@anonymous_page_cache
+@profile_condition
 def profile(request, username):
     # Профиль пользователя
-    author_posts = get_object_or_404(User, username=username)
-    posts = author_posts.posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
+    author_posts = get_object_or_404(
+        User.objects.select_related("profile"), username=username)
+    posts = author_posts.posts.for_feed()
+    paginator, page = paginate(request, posts)
+    following = (request.user.is_authenticated and Follow.objects.filter(
+        user=request.user, author=author_posts).exists())
     context = {
         "page": page,
         "author_posts": author_posts,
-        "paginator": paginator
+        "paginator": paginator,
+        "following": following
     }
-    return render(request, 'profile.html', context)
+    return tag(render(request, 'profile.html', context),
+               f"author:{author_posts.pk}")
 
 
+@login_required
+def profile_follow(request, username):
+    """Подписаться на автора"""
+    author = get_object_or_404(User, username=username)
+    if author != request.user:
+        Follow.objects.get_or_create(user=request.user, author=author)
+    return redirect("profile", username=username)
+
+
+@login_required
+def profile_unfollow(request, username):
+    """Отписаться от автора"""
+    follow = Follow.objects.filter(
+        user=request.user, author__username=username).first()
+    if follow is not None:
+        # delete() экземпляра, чтобы сработали сигналы счётчиков и ленты
+        follow.delete()
+    return redirect("profile", username=username)
+
+
+@anonymous_page_cache
+@post_condition
 def post_view(request, username, post_id):
     """Просмотр поста + комментарии"""
-    post = get_object_or_404(Post, pk=post_id, author__username=username)
+    post = get_object_or_404(
+        Post.objects.select_related("author__profile", "group"),
+        pk=post_id,
+        author__username=username)
     author_posts = post.author
-    comments = post.comments.all()
+    # ?comments= - страница комментариев без JavaScript
+    try:
+        comments = comment_page(post.pk, request.GET.get("comments"))
+    except InvalidCursor:
+        comments = comment_page(post.pk)
+    # ?reply= - форма отвечает на этот комментарий
+    reply_to = None
+    if request.GET.get("reply", "").isdigit():
+        reply_to = (Comment.objects.select_related("author")
+                    .filter(pk=request.GET["reply"], post=post).first())
     form = FormComments()
     context = {
         "author_posts": author_posts,
         "post": post,
         "form": form,
-        "comments": comments
+        "comments": comments,
+        "reply_to": reply_to,
     }
 
-    return render(request, "post.html", context)
+    return tag(render(request, "post.html", context),
+               f"post:{post.pk}", f"author:{post.author_id}")
+
+
+def comments_response(request, template, context, page, post):
+    """Страница комментариев: HTML-фрагмент, ?format=json - JSON"""
+    html = render_to_string(template, context, request)
+    if request.GET.get("format") == "json":
+        response = JsonResponse({
+            "comments": [
+                {"id": item.pk, "parent": item.parent_id,
+                 "depth": item.depth, "reply_count": item.reply_count,
+                 "author": item.author.username, "text": item.text,
+                 "created": item.created}
+                for item in page],
+            "next_cursor": page.next_cursor,
+            "html": html,
+        })
+    else:
+        response = HttpResponse(html)
+    return tag(response, f"post:{post.pk}", f"author:{post.author_id}")
+
+
+@anonymous_page_cache
+@post_condition
+def post_comments(request, username, post_id):
+    """Следующая страница комментариев верхнего уровня"""
+    post = get_object_or_404(
+        Post.objects.select_related("author"),
+        pk=post_id,
+        author__username=username)
+    try:
+        comments = comment_page(post.pk, request.GET.get("cursor"))
+    except InvalidCursor:
+        return HttpResponseBadRequest("Неверный курсор")
+    context = {"comments": comments, "post": post,
+               "author_posts": post.author}
+    return comments_response(request, "includes/comment_items.html",
+                             context, comments, post)
+
+
+@anonymous_page_cache
+@post_condition
+def comment_thread(request, username, post_id, comment_id):
+    """Ветка ответов на комментарий страницами, до COMMENT_THREAD_DEPTH"""
+    root = get_object_or_404(
+        Comment.objects.select_related("post__author"),
+        pk=comment_id,
+        post_id=post_id,
+        post__author__username=username)
+    try:
+        replies = thread_page(root, request.GET.get("cursor"))
+    except InvalidCursor:
+        return HttpResponseBadRequest("Неверный курсор")
+    context = {"replies": replies, "root": root, "post": root.post,
+               "author_posts": root.post.author}
+    return comments_response(request, "includes/comment_thread.html",
+                             context, replies, root.post)
 
 
 def post_edit(request, username, post_id):
@@ -108,6 +252,8 @@ def post_edit(request, username, post_id):
         post = form.save(commit=False)
         post.author = request.user
         form.save()
+        if "image" in form.changed_data:
+            thumbnails.schedule(post)
         return redirect('post', username, post_id)
     context = {
         "form": form,
@@ -130,12 +276,19 @@ def add_comment(request, username, post_id):
         }
         return render(request, "includes/comments.html", context)
 
+    # parent - id комментария, на который отвечают
+    parent = None
+    if request.POST.get("parent", "").isdigit():
+        parent = get_object_or_404(Comment, pk=request.POST["parent"],
+                                   post=post)
+
     form = FormComments(request.POST)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.post = post
         comment.author = author
-        comment.save()
+        comment.parent = parent
+        writebehind.save(comment)
         return redirect("post", username=username, post_id=post_id)
 
 
@@ -0,0 +1,161 @@
+"""Запись новых постов и комментариев пачками в одной транзакции.
+
+Форма проверяется в потоке запроса, готовый объект уходит в очередь
+фонового писателя. Писатель ждёт следующие объекты не дольше
+WRITE_BEHIND_DELAY и сохраняет до WRITE_BEHIND_BATCH штук одним
+коммитом: на SQLite каждый коммит - блокировка записи и fsync, а так их
+один на пачку. Сбросы кэша страниц и ленты тоже один раз на пачку.
+Запрос ждёт коммита своей пачки, поэтому после редиректа автор видит
+свою запись. Не дождавшись WRITE_BEHIND_TIMEOUT, запрос отменяет ещё
+не взятый в пачку объект; взятый - дожидается результата пачки, иначе
+повтор запроса клиентом создал бы дубль.
+
+Включается настройкой WRITE_BEHIND. Внутри транзакции запроса объект
+сохраняется сразу: писатель из своего соединения не увидел бы
+незафиксированных строк.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from .cache import deferred_invalidation
+
+logger = logging.getLogger(__name__)
+
+_writer = None
+_lock = threading.Lock()
+
+
+class BatchWriter:
+    """Поток, сохраняющий объекты из очереди пачками"""
+
+    def __init__(self, delay, batch_size):
+        self.delay = delay
+        self.batch_size = batch_size
+        # Для бенчмарка: зафиксировано пачек и объектов в них
+        self.batches = 0
+        self.written = 0
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(
+            target=self.run, name="write-behind", daemon=True)
+        self.thread.start()
+
+    def submit(self, instance):
+        """Поставить объект в очередь; Future завершится после коммита"""
+        future = Future()
+        self.queue.put((instance, future))
+        return future
+
+    def stop(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.delay
+            stopping = False
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self.write(batch)
+            if stopping:
+                break
+        connection.close()
+
+    def write(self, batch):
+        # Отменённые запросом объекты пропускаются, остальные уже не отменить
+        batch = [(instance, future) for instance, future in batch
+                 if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        close_old_connections()
+        try:
+            with deferred_invalidation():
+                errors = self.commit(batch)
+        except Exception as e:
+            logger.exception("Пачка из %s объектов не записана", len(batch))
+            for instance, future in batch:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.written += len(batch) - len(errors)
+        for index, (instance, future) in enumerate(batch):
+            if index in errors:
+                future.set_exception(errors[index])
+            else:
+                future.set_result(instance)
+
+    def commit(self, batch):
+        """Одна транзакция на пачку; ошибка объекта откатывает только его.
+
+        Повтора при блокировке нет: после отката у объектов остались бы
+        id несохранённых строк. Ожидание блокировки - busy timeout.
+        """
+        errors = {}
+        with transaction.atomic():
+            for index, (instance, future) in enumerate(batch):
+                try:
+                    with transaction.atomic():
+                        instance.save()
+                except Exception as e:
+                    errors[index] = e
+        return errors
+
+
+def enabled():
+    return getattr(settings, "WRITE_BEHIND", False)
+
+
+def get_writer():
+    global _writer
+    with _lock:
+        if _writer is None:
+            _writer = BatchWriter(
+                getattr(settings, "WRITE_BEHIND_DELAY", 0.05),
+                getattr(settings, "WRITE_BEHIND_BATCH", 100))
+        return _writer
+
+
+def stop_writer():
+    """Дописать очередь и остановить писатель (тесты, бенчмарк)"""
+    global _writer
+    with _lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.stop()
+
+
+def save(instance):
+    """Сохранить новый объект через писатель, если он включён.
+
+    Возвращается после коммита; ошибка сохранения пробрасывается.
+    """
+    if not enabled() or connection.in_atomic_block:
+        instance.save()
+        return instance
+    future = get_writer().submit(instance)
+    try:
+        return future.result(getattr(settings, "WRITE_BEHIND_TIMEOUT", 30))
+    except TimeoutError:
+        if future.cancel():
+            raise
+        # Писатель уже сохраняет объект: ответ - по итогу его пачки
+        return future.result()
@@ -1,4 +1,13 @@
+import pytest
+
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # База откатывается между тестами, кэш страниц - нет
+    from django.core.cache import cache
+    cache.clear()
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.6 on 2026-10-18 16:59
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def create_profiles(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+    Post = apps.get_model("posts", "Post")
+    Profile = apps.get_model("users", "Profile")
+    counts = (Post.objects.filter(author=OuterRef("pk"))
+              .order_by()
+              .values("author")
+              .annotate(total=Count("pk"))
+              .values("total"))
+    users = User.objects.annotate(total=Coalesce(
+        Subquery(counts, output_field=IntegerField()), 0))
+    Profile.objects.bulk_create(
+        Profile(user_id=user.pk, post_count=user.total) for user in users)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0006_post_comment_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Profile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_count', models.PositiveIntegerField(default=0, help_text='Счётчик записей автора, обновляется сигналами posts.', verbose_name='Записей:')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='profile', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь:')),
+            ],
+        ),
+        migrations.RunPython(create_profiles, migrations.RunPython.noop),
+    ]
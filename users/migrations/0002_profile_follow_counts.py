@@ -0,0 +1,23 @@
+# Generated by Django 2.2.6 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0, help_text='Счётчик подписчиков, обновляется сигналами posts.', verbose_name='Подписчиков:'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, help_text='Счётчик подписок, обновляется сигналами posts.', verbose_name='Подписан:'),
+        ),
+    ]
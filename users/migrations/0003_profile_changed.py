@@ -0,0 +1,18 @@
+# Generated by Django 2.2.6 on 2026-10-18 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_profile_follow_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='changed',
+            field=models.DateTimeField(blank=True, help_text='Последняя запись, правка или комментарий к записям автора, обновляется сигналами posts.', null=True, verbose_name='Изменён:'),
+        ),
+    ]
@@ -1,3 +1,38 @@
 from django.db import models
+from django.contrib.auth import get_user_model
 
-# Create your models here.
+User = get_user_model()
+
+
+class Profile(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name="profile",
+        verbose_name="Пользователь:"
+    )
+    post_count = models.PositiveIntegerField(
+        verbose_name="Записей:",
+        default=0,
+        help_text="Счётчик записей автора, обновляется сигналами posts."
+    )
+    follower_count = models.PositiveIntegerField(
+        verbose_name="Подписчиков:",
+        default=0,
+        help_text="Счётчик подписчиков, обновляется сигналами posts."
+    )
+    following_count = models.PositiveIntegerField(
+        verbose_name="Подписан:",
+        default=0,
+        help_text="Счётчик подписок, обновляется сигналами posts."
+    )
+    changed = models.DateTimeField(
+        verbose_name="Изменён:",
+        blank=True,
+        null=True,
+        help_text=("Последняя запись, правка или комментарий к записям "
+                   "автора, обновляется сигналами posts.")
+    )
+
+    def __str__(self):
+        return self.user.username
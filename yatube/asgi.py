@@ -1,16 +1,195 @@
 """
 ASGI config for yatube project.
 
-It exposes the ASGI callable as a module-level variable named ``application``.
+Django 2.2 не умеет ASGI и асинхронные виды, поэтому здесь мост:
+тело запроса читается и ответ отправляется в цикле событий, а сам
+Django (WSGIHandler) выполняется в пуле из ASGI_THREADS потоков. Поток
+занят только на время вида, медленные клиенты ждут в цикле событий и
+рабочих потоков не держат.
 
-For more information on this file, see
-https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
+Память на запрос ограничена: тело больше FILE_UPLOAD_MAX_MEMORY_SIZE
+уходит во временный файл, тело больше ASGI_MAX_BODY отклоняется с 413,
+потоковый ответ отдаётся по мере чтения итератора.
+
+Запуск: uvicorn yatube.asgi:application
 """
 
+import asyncio
 import os
-
-from django.core.asgi import get_asgi_application
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.core.handlers.wsgi import WSGIHandler  # noqa: E402
+
+# Ответ отдаётся клиенту кусками такого размера
+CHUNK_SIZE = 64 * 1024
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+class WSGIBridge:
+    """ASGI-приложение поверх WSGIHandler: HTTP, без веб-сокетов"""
+
+    def __init__(self, wsgi_application, threads):
+        self.wsgi_application = wsgi_application
+        self.max_body = getattr(settings, "ASGI_MAX_BODY", None)
+        self.memory_size = settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix="asgi")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.lifespan(receive, send)
+        if scope["type"] != "http":
+            raise ValueError("Поддерживается только HTTP")
+
+        with tempfile.SpooledTemporaryFile(self.memory_size) as body:
+            try:
+                size = await self.read_body(scope, receive, body)
+            except BodyTooLarge:
+                return await self.reject(send)
+            if size is None:
+                return
+            body.seek(0)
+            loop = asyncio.get_running_loop()
+            status, headers, result = await loop.run_in_executor(
+                self.executor, self.run_wsgi,
+                self.environ(scope, body, size))
+
+        await send({"type": "http.response.start", "status": status,
+                    "headers": headers})
+        if isinstance(result, bytes):
+            await self.send_body(send, result)
+        else:
+            # Потоковый ответ: следующий кусок читается в пуле
+            chunks = iter(result)
+            try:
+                while True:
+                    chunk = await loop.run_in_executor(
+                        self.executor, next, chunks, None)
+                    if chunk is None:
+                        break
+                    await self.send_body(send, chunk)
+            finally:
+                await loop.run_in_executor(self.executor, result.close)
+        await send({"type": "http.response.body", "body": b""})
+
+    async def read_body(self, scope, receive, body):
+        """Тело запроса в body; размер или None, если клиент ушёл"""
+        # Имена заголовков в ASGI - в нижнем регистре
+        length = dict(scope.get("headers", [])).get(b"content-length", b"")
+        if length.isdigit():
+            self.check_size(int(length))
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return None
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            # Без Content-Length лимит проверяется по ходу чтения
+            self.check_size(size)
+            body.write(chunk)
+            if not message.get("more_body"):
+                return size
+
+    def check_size(self, size):
+        if self.max_body is not None and size > self.max_body:
+            raise BodyTooLarge
+
+    async def reject(self, send):
+        await send({"type": "http.response.start", "status": 413,
+                    "headers": [(b"content-type",
+                                 b"text/plain; charset=utf-8")]})
+        await send({"type": "http.response.body",
+                    "body": "Слишком большой запрос".encode()})
+
+    async def send_body(self, send, content):
+        for start in range(0, len(content), CHUNK_SIZE):
+            await send({"type": "http.response.body",
+                        "body": content[start:start + CHUNK_SIZE],
+                        "more_body": True})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def environ(self, scope, body, size):
+        server = scope.get("server") or ("localhost", 80)
+        client = scope.get("client") or ("", 0)
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", ""),
+            "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+            "QUERY_STRING": scope["query_string"].decode("latin-1"),
+            "SERVER_NAME": server[0],
+            "SERVER_PORT": str(server[1]),
+            "REMOTE_ADDR": client[0],
+            "SERVER_PROTOCOL": "HTTP/" + scope.get("http_version", "1.1"),
+            "CONTENT_LENGTH": str(size),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": body,
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": True,
+            "wsgi.run_once": False,
+        }
+        for name, value in scope.get("headers", []):
+            name = name.decode("latin-1").upper().replace("-", "_")
+            value = value.decode("latin-1")
+            if name == "CONTENT_TYPE":
+                environ["CONTENT_TYPE"] = value
+            elif name != "CONTENT_LENGTH":
+                key = "HTTP_" + name
+                if key in environ:
+                    value = environ[key] + "," + value
+                environ[key] = value
+        return environ
+
+    def run_wsgi(self, environ):
+        """Выполнить запрос в потоке пула.
+
+        Обычный ответ Django уже в памяти и возвращается байтами,
+        потоковый - итератором: его закроет __call__ после отправки.
+        """
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started["status"] = int(status.split(" ", 1)[0])
+            started["headers"] = [
+                (name.lower().encode("latin-1"), value.encode("latin-1"))
+                for name, value in headers]
+
+        result = self.wsgi_application(environ, start_response)
+        if getattr(result, "streaming", False):
+            return started["status"], started["headers"], result
+        try:
+            content = b"".join(result)
+        finally:
+            # close() шлёт request_finished: соединение с базой закрывается
+            if hasattr(result, "close"):
+                result.close()
+        return started["status"], started["headers"], content
+
+
+def get_asgi_application():
+    django.setup(set_prefix=False)
+    return WSGIBridge(WSGIHandler(),
+                      getattr(settings, "ASGI_THREADS", 8))
+
+
 application = get_asgi_application()
@@ -0,0 +1,357 @@
+"""
+Кэш-бэкенд проекта yatube.
+
+Два уровня: LRU недавно использованных записей в памяти процесса и
+дисковое хранилище, разбитое на каталоги-шарды. Каждый шард хранит
+LRU-индекс своих файлов с размерами, поэтому лимит по байтам
+соблюдается удалением самого старого файла, без обхода каталога.
+Файлы других процессов индекс не видит: каждые RESCAN_EVERY записей
+в шард он строится заново по каталогу, и лимит общий для всех
+процессов, а не MAX_BYTES на каждый.
+
+Запись живёт в памяти не дольше LOCAL_TIMEOUT секунд: столько
+изменения из другого процесса могут оставаться невидимыми. Ключи с
+префиксами из SHARED_PREFIXES (версии и поколения для сброса кэша) в
+память не попадают и всегда читаются с диска: сброс в одном процессе
+сразу виден остальным.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+CACHE_SUFFIX = ".djcache"
+
+# Состояние общее для всех экземпляров бэкенда с одним LOCATION:
+# Django создаёт экземпляр кэша на каждый поток.
+_memory = {}
+_shards = {}
+_stats = {}
+_locks = {}
+_setup_lock = threading.Lock()
+
+# Счётчики текущего запроса в потоке (yatube.middleware), None - не ведутся
+_request = threading.local()
+
+
+def track_requests():
+    """Начать подсчёт попаданий и промахов кэша в текущем потоке"""
+    _request.stats = Counter()
+    return _request.stats
+
+
+def untrack_requests():
+    _request.stats = None
+
+
+class DiskShard:
+    """Каталог с файлами кэша, LRU-индексом и лимитом по байтам"""
+
+    def __init__(self, path, max_bytes, rescan_every=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rescan_every = rescan_every
+        self.lock = threading.Lock()
+        self.files = OrderedDict()
+        self.size = 0
+        self.loaded = False
+        self.writes = 0
+
+    def load(self):
+        """Построение индекса по времени изменения файлов"""
+        os.makedirs(self.path, exist_ok=True)
+        self.files = OrderedDict()
+        self.size = 0
+        self.writes = 0
+        entries = []
+        for entry in os.scandir(self.path):
+            if entry.name.endswith(CACHE_SUFFIX):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # Удалён другим процессом во время обхода
+                    continue
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        for mtime, name, size in sorted(entries):
+            self.files[name] = size
+            self.size += size
+        self.loaded = True
+
+    def track(self, name, size):
+        self.forget(name)
+        self.files[name] = size
+        self.size += size
+
+    def written(self, name, size):
+        """Учесть записанный файл; раз в rescan_every записей - обход"""
+        self.track(name, size)
+        self.writes += 1
+        if self.rescan_every and self.writes >= self.rescan_every:
+            self.load()
+
+    def forget(self, name):
+        self.size -= self.files.pop(name, 0)
+
+    def touch(self, name):
+        if name in self.files:
+            self.files.move_to_end(name)
+
+    def evict(self):
+        """Удалить самые старые файлы сверх лимита, вернуть их число"""
+        evicted = 0
+        while self.size > self.max_bytes and len(self.files) > 1:
+            name, size = self.files.popitem(last=False)
+            self.size -= size
+            self.remove(name)
+            evicted += 1
+        return evicted
+
+    def remove(self, name):
+        try:
+            os.remove(os.path.join(self.path, name))
+        except FileNotFoundError:
+            pass
+
+
+class TieredCache(BaseCache):
+    """LRU в памяти процесса поверх шардированного дискового кэша"""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._dir = os.path.abspath(location)
+        self._local_timeout = options.get("LOCAL_TIMEOUT", 5)
+        self._shared = tuple(options.get("SHARED_PREFIXES", ()))
+        shard_count = options.get("SHARDS", 16)
+        max_bytes = options.get("MAX_BYTES", 256 * 1024 * 1024)
+        rescan_every = options.get("RESCAN_EVERY", 100)
+
+        with _setup_lock:
+            if location not in _memory:
+                _memory[location] = OrderedDict()
+                _locks[location] = threading.RLock()
+                _stats[location] = Counter()
+                _shards[location] = [
+                    DiskShard(os.path.join(self._dir, "%02x" % number),
+                              max_bytes // shard_count, rescan_every)
+                    for number in range(shard_count)
+                ]
+        self._memory = _memory[location]
+        self._lock = _locks[location]
+        self._stats = _stats[location]
+        self._shards = _shards[location]
+
+    def stats(self):
+        """Счётчики попаданий, промахов и вытеснений для мониторинга"""
+        with self._lock:
+            stats = dict(self._stats)
+        for name in ("memory_hits", "disk_hits", "misses",
+                     "memory_evictions", "disk_evictions"):
+            stats.setdefault(name, 0)
+        stats["memory_entries"] = len(self._memory)
+        stats["disk_bytes"] = sum(shard.size for shard in self._shards)
+        return stats
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            if self._get_entry(key) is not None:
+                return False
+            self._store(key, self.get_backend_timeout(timeout),
+                        pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+            return True
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        entry = self._get_entry(key, count=True)
+        if entry is None:
+            return default
+        return pickle.loads(entry[1])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._store(key, self.get_backend_timeout(timeout),
+                    pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            entry = self._get_entry(key)
+            if entry is None:
+                return False
+            self._store(key, self.get_backend_timeout(timeout), entry[1])
+            return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            entry = self._get_entry(key)
+            if entry is None:
+                raise ValueError("Key '%s' not found" % key)
+            # Срок жизни ключа сохраняется, в отличие от BaseCache.incr
+            expiry, pickled = entry
+            value = pickle.loads(pickled) + delta
+            self._store(key, expiry,
+                        pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                        absolute=True)
+            return value
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            in_memory = self._memory.pop(key, None) is not None
+        shard, name = self._locate(key)
+        with shard.lock:
+            self._load(shard)
+            on_disk = name in shard.files
+            shard.forget(name)
+            shard.remove(name)
+        return in_memory or on_disk
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._get_entry(key) is not None
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        for shard in self._shards:
+            with shard.lock:
+                # Обход каталога: файлы других процессов тоже удаляются
+                shard.load()
+                for name in list(shard.files):
+                    shard.forget(name)
+                    shard.remove(name)
+
+    def _locate(self, key):
+        digest = hashlib.md5(key.encode()).hexdigest()
+        shard = self._shards[int(digest[:8], 16) % len(self._shards)]
+        return shard, digest + CACHE_SUFFIX
+
+    def _load(self, shard):
+        if not shard.loaded:
+            shard.load()
+
+    def _get_entry(self, key, count=False):
+        """Пара (expiry, pickled) из памяти или с диска, None если нет"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                local_expiry, expiry, pickled = entry
+                if local_expiry is None or local_expiry > now:
+                    self._memory.move_to_end(key)
+                    if count:
+                        self._count("memory_hits")
+                    return expiry, pickled
+                del self._memory[key]
+
+        entry = self._read(key, now)
+        with self._lock:
+            if entry is None:
+                if count:
+                    self._count("misses")
+                return None
+            if count:
+                self._count("disk_hits")
+            self._remember(key, *entry)
+        return entry
+
+    def _count(self, name):
+        self._stats[name] += 1
+        stats = getattr(_request, "stats", None)
+        if stats is not None:
+            stats[name] += 1
+
+    def _store(self, key, timeout, pickled, absolute=False):
+        """Записать значение в оба уровня; absolute - timeout уже срок"""
+        if absolute or timeout is None:
+            expiry = timeout
+        else:
+            expiry = time.time() + timeout
+        with self._lock:
+            self._remember(key, expiry, pickled)
+        self._write(key, expiry, pickled)
+
+    def _is_shared(self, key):
+        # Ключ без KEY_PREFIX и версии: формат make_key по умолчанию
+        return bool(self._shared) and \
+            key.split(":", 2)[-1].startswith(self._shared)
+
+    def _remember(self, key, expiry, pickled):
+        if self._is_shared(key):
+            return
+        local_expiry = expiry
+        if self._local_timeout is not None:
+            local_limit = time.time() + self._local_timeout
+            if local_expiry is None or local_expiry > local_limit:
+                local_expiry = local_limit
+        self._memory[key] = (local_expiry, expiry, pickled)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_entries:
+            self._memory.popitem(last=False)
+            self._stats["memory_evictions"] += 1
+
+    def _read(self, key, now):
+        shard, name = self._locate(key)
+        path = os.path.join(shard.path, name)
+        with shard.lock:
+            self._load(shard)
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                shard.forget(name)
+                return None
+            try:
+                expiry, pickled = pickle.loads(zlib.decompress(data))
+            except (zlib.error, pickle.UnpicklingError, EOFError, ValueError):
+                expiry = now
+            if expiry is not None and expiry <= now:
+                shard.forget(name)
+                shard.remove(name)
+                return None
+            if name in shard.files:
+                shard.touch(name)
+            else:
+                # Файл записан другим процессом
+                shard.track(name, len(data))
+        return expiry, pickled
+
+    def _write(self, key, expiry, pickled):
+        """Атомарная запись: временный файл и os.replace в том же шарде"""
+        shard, name = self._locate(key)
+        data = zlib.compress(pickle.dumps((expiry, pickled),
+                                          pickle.HIGHEST_PROTOCOL))
+        with shard.lock:
+            self._load(shard)
+            fd, tmp_path = tempfile.mkstemp(dir=shard.path, suffix=".tmp")
+            try:
+                with open(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, os.path.join(shard.path, name))
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except FileNotFoundError:
+                    pass
+                raise
+            shard.written(name, len(data))
+            evicted = shard.evict()
+        if evicted:
+            with self._lock:
+                self._stats["disk_evictions"] += evicted
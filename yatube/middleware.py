@@ -0,0 +1,206 @@
+"""
+Метрики запроса: SQL, рендеринг шаблонов, кэш.
+
+RequestMetricsMiddleware считает запросы к базе и их время через
+execute_wrapper, время рендеринга шаблонов верхнего уровня и
+попадания в кэш (yatube.cache.TieredCache). Итог уходит в заголовок
+Server-Timing и одной JSON-строкой в логгер yatube.requests. Медленные
+запросы с вероятностью SLOW_REQUEST_SAMPLE_RATE пишутся вместе со
+списком SQL в логгер yatube.requests.slow.
+
+С TEMPLATE_PROFILING время рендеринга раскладывается по шаблонам:
+extends, include и inclusion_tag учитываются отдельно, у каждого
+шаблона собственное время без вложенных.
+"""
+
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.template import base
+from django.template.backends.django import Template
+
+from .cache import track_requests, untrack_requests
+
+logger = logging.getLogger("yatube.requests")
+slow_logger = logging.getLogger("yatube.requests.slow")
+
+# Сколько SQL держать для лога медленного запроса
+MAX_SAMPLED_QUERIES = 100
+# Сколько самых дорогих шаблонов попадает в Server-Timing
+SERVER_TIMING_TEMPLATES = 3
+
+_current = threading.local()
+_patch_lock = threading.Lock()
+
+
+class RequestMetrics:
+    """Счётчики одного запроса"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.sql = []
+        self.render_time = 0.0
+        self.render_depth = 0
+        # Имя шаблона -> [вызовы, полное время, собственное время]
+        self.templates = {}
+        self.template_stack = []
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper: вызывается на каждый запрос к базе
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.sql_time += elapsed
+            if len(self.sql) < MAX_SAMPLED_QUERIES:
+                self.sql.append((sql, elapsed))
+
+
+def _timed_render(render):
+    def wrapper(self, *args, **kwargs):
+        metrics = getattr(_current, "metrics", None)
+        if metrics is None:
+            return render(self, *args, **kwargs)
+        # Вложенные render_to_string уже входят во внешний рендеринг
+        metrics.render_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            metrics.render_depth -= 1
+            if not metrics.render_depth:
+                metrics.render_time += time.perf_counter() - started
+    wrapper.timed = True
+    return wrapper
+
+
+def _profiled_render(render):
+    def wrapper(self, context):
+        metrics = getattr(_current, "metrics", None)
+        if metrics is None:
+            return render(self, context)
+        frame = [0.0]
+        metrics.template_stack.append(frame)
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.template_stack.pop()
+            if metrics.template_stack:
+                metrics.template_stack[-1][0] += elapsed
+            stats = metrics.templates.setdefault(
+                self.name or "<string>", [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] += elapsed - frame[0]
+    wrapper.profiled = True
+    return wrapper
+
+
+def install_render_timer():
+    with _patch_lock:
+        if not getattr(Template.render, "timed", False):
+            Template.render = _timed_render(Template.render)
+
+
+def install_template_profiler():
+    # _render вызывают и Template.render, и ExtendsNode для родителя
+    with _patch_lock:
+        if not getattr(base.Template._render, "profiled", False):
+            base.Template._render = _profiled_render(base.Template._render)
+
+
+class RequestMetricsMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, "SLOW_REQUEST_MS", 500)
+        self.sample_rate = getattr(settings, "SLOW_REQUEST_SAMPLE_RATE", 1.0)
+        self.profile_templates = getattr(settings, "TEMPLATE_PROFILING",
+                                         False)
+        install_render_timer()
+        if self.profile_templates:
+            install_template_profiler()
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        _current.metrics = metrics
+        cache_stats = track_requests()
+        try:
+            with self.wrap_connections(metrics):
+                response = self.get_response(request)
+        finally:
+            _current.metrics = None
+            untrack_requests()
+        total_ms = (time.perf_counter() - metrics.started) * 1000
+        record = self.record(request, response, metrics, cache_stats,
+                             total_ms)
+        response["Server-Timing"] = self.server_timing(record)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(record, ensure_ascii=False))
+        if total_ms >= self.slow_ms and random.random() < self.sample_rate:
+            record["sql"] = [{"sql": sql, "ms": round(elapsed * 1000, 2)}
+                             for sql, elapsed in metrics.sql]
+            slow_logger.warning(json.dumps(record, ensure_ascii=False))
+        return response
+
+    def wrap_connections(self, metrics):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(metrics))
+        return stack
+
+    def record(self, request, response, metrics, cache_stats, total_ms):
+        match = getattr(request, "resolver_match", None)
+        hits = cache_stats["memory_hits"] + cache_stats["disk_hits"]
+        lookups = hits + cache_stats["misses"]
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "view": match.view_name if match else None,
+            "status": response.status_code,
+            "total_ms": round(total_ms, 2),
+            "queries": metrics.queries,
+            "sql_ms": round(metrics.sql_time * 1000, 2),
+            "render_ms": round(metrics.render_time * 1000, 2),
+            "cache_hits": hits,
+            "cache_lookups": lookups,
+            "cache_hit_ratio": round(hits / lookups, 3) if lookups else None,
+        }
+        if self.profile_templates:
+            record["templates"] = [
+                {"name": name, "calls": calls,
+                 "total_ms": round(total * 1000, 2),
+                 "self_ms": round(own * 1000, 2)}
+                for name, (calls, total, own) in sorted(
+                    metrics.templates.items(),
+                    key=lambda item: item[1][2], reverse=True)
+            ]
+        return record
+
+    def server_timing(self, record):
+        parts = [
+            'sql;dur={};desc="{} queries"'.format(
+                record["sql_ms"], record["queries"]),
+            "render;dur={}".format(record["render_ms"]),
+        ]
+        for template in record.get("templates", [])[
+                :SERVER_TIMING_TEMPLATES]:
+            parts.append('tpl;dur={};desc="{} x{}"'.format(
+                template["self_ms"], template["name"], template["calls"]))
+        if record["cache_lookups"]:
+            parts.append('cache;desc="hit {}/{}"'.format(
+                record["cache_hits"], record["cache_lookups"]))
+        parts.append("total;dur={}".format(record["total_ms"]))
+        return ", ".join(parts)
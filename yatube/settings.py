@@ -23,7 +23,7 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SECRET_KEY = 'lfo_7+u*1ti60w*&xil8_e+lm9*1o6(+ko$wa^ou!s#fek3eoi'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get("DJANGO_DEBUG", "1") == "1"
 
 ALLOWED_HOSTS = [
     "localhost",
@@ -36,7 +36,7 @@ ALLOWED_HOSTS = [
 SITE_ID = 1
 
 INSTALLED_APPS = [
-    'posts',
+    'posts.apps.PostsConfig',
     'users',
     'django.contrib.sites',
     'django.contrib.flatpages',
@@ -50,6 +50,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yatube.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -61,12 +62,19 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # В продакшене шаблоны компилируются один раз на процесс
+            'loaders': TEMPLATE_LOADERS if DEBUG else [
+                ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -78,17 +86,28 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+# Потоки для видов за ASGI-мостом (yatube.asgi)
+ASGI_THREADS = 8
 
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# yatube.sqlite: WAL и прагмы при подключении, BEGIN IMMEDIATE
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'yatube.sqlite',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            # Ожидание блокировки записи, с
+            'timeout': 20,
+        },
     }
 }
+# Повторы записи постов и комментариев сверх timeout (yatube.sqlite.retry)
+SQLITE_WRITE_RETRIES = 3
+SQLITE_RETRY_DELAY = 0.05
 
 
 # Password validation
@@ -133,6 +152,76 @@ STATIC_ROOT = os.path.join(BASE_DIR, "static")
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Миниатюры создаются в фоновом пуле потоков (posts.thumbnails)
+THUMBNAIL_WORKERS = 2
+
+# Загрузка картинок потоком во временный файл (posts.uploads)
+FILE_UPLOAD_HANDLERS = ["posts.uploads.LimitedUploadHandler"]
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+# Поля формы в памяти (значение Django по умолчанию, 2,5 МБ)
+DATA_UPLOAD_MAX_MEMORY_SIZE = 2621440
+# Тело запроса через ASGI-мост: картинка и поля формы, больше - 413
+ASGI_MAX_BODY = POST_IMAGE_MAX_BYTES + DATA_UPLOAD_MAX_MEMORY_SIZE
+POST_IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+# Оригинал уменьшается в фоне до этого размера по большей стороне
+POST_IMAGE_MAX_SIDE = 2560
+
+# Лента подписок (posts.timeline): посты авторов, у которых подписчиков
+# больше лимита, не раскладываются по лентам, а читаются при показе
+TIMELINE_FANOUT_LIMIT = 1000
+
+# Комментарии на странице поста (posts.comments), остальные - по кнопке
+COMMENTS_PER_PAGE = 20
+# Уровней ответов за один запрос ветки, глубже - по ссылке "Продолжить"
+COMMENT_THREAD_DEPTH = 3
+
+# Новые посты и комментарии пишутся фоновым потоком пачками
+# (posts.writebehind): коммит на пачку, задержка не больше WRITE_BEHIND_DELAY
+WRITE_BEHIND = os.environ.get("WRITE_BEHIND") == "1"
+WRITE_BEHIND_DELAY = 0.05
+WRITE_BEHIND_BATCH = 100
+
+# Фоновые задачи (posts.jobs, manage.py run_workers): пауза перед
+# повтором растёт вдвое от JOBS_RETRY_DELAY, задача зависшего
+# исполнителя через JOBS_LOCK_TIMEOUT снова в очереди
+JOBS_EAGER = False
+JOBS_RETRY_DELAY = 10
+JOBS_RETRY_MAX_DELAY = 60 * 60
+JOBS_LOCK_TIMEOUT = 10 * 60
+
+# Сводки групп (posts.groupstats): активные авторы - за GROUP_ACTIVE_DAYS
+# дней, пересчёт задачей run_workers раз в GROUP_STATS_INTERVAL секунд
+GROUP_ACTIVE_DAYS = 30
+GROUP_STATS_INTERVAL = 5 * 60
+
+# Страницы для гостей целиком в кэше (posts.pagecache), сброс по тегам
+PAGE_CACHE_TIMEOUT = 10 * 60
+
+# Метрики запросов (yatube.middleware): медленные запросы пишутся
+# со списком SQL, доля записываемых - SLOW_REQUEST_SAMPLE_RATE
+SLOW_REQUEST_MS = 500
+SLOW_REQUEST_SAMPLE_RATE = 0.1
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        # Строка на каждый запрос только без DEBUG, медленные - всегда
+        "yatube.requests": {
+            "handlers": ["console"],
+            "level": "WARNING" if DEBUG else "INFO",
+            "propagate": False,
+        },
+    },
+}
+
+# Время рендеринга по каждому шаблону и include в логе запроса
+# и Server-Timing (yatube.middleware); включается на время профилирования
+TEMPLATE_PROFILING = os.environ.get("TEMPLATE_PROFILING") == "1"
+
 # Login
 
 LOGIN_URL = "/auth/login/"
@@ -143,9 +232,20 @@ EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
 #CACHES
+# yatube.cache.TieredCache: LRU в памяти процесса + шардированный диск
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'BACKEND': 'yatube.cache.TieredCache',
         'LOCATION': os.path.join(BASE_DIR, "caches_django"),
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 5,
+            'SHARDS': 16,
+            'MAX_BYTES': 256 * 1024 * 1024,
+            # Обход шарда по каталогу: учёт файлов других процессов
+            'RESCAN_EVERY': 100,
+            # Версии для сброса кэша страниц - только с диска, без памяти
+            'SHARED_PREFIXES': ("posts:feed_generation", "posts:page_tag:"),
+        },
     }
 }
@@ -0,0 +1,41 @@
+"""
+SQLite-бэкенд проекта: прагмы при подключении и BEGIN IMMEDIATE.
+
+WAL позволяет читать во время записи, synchronous=NORMAL в режиме WAL
+не теряет целостность, mmap и увеличенный кэш страниц снимают часть
+системных вызовов. Транзакции берут блокировку записи сразу: иначе
+читающая транзакция, решившая писать, получает "database is locked"
+без ожидания busy timeout.
+
+OPTIONS: timeout (busy timeout, с), pragmas (поверх PRAGMAS),
+immediate (False - обычный BEGIN).
+"""
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    # Отрицательное значение - размер в КиБ
+    "cache_size": -64 * 1024,
+    "temp_store": "MEMORY",
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = {**PRAGMAS, **params.pop("pragmas", {})}
+        self.immediate = params.pop("immediate", True)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute("PRAGMA {} = {}".format(name, value))
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute("BEGIN IMMEDIATE" if self.immediate
+                              else "BEGIN")
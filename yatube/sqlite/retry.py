@@ -0,0 +1,36 @@
+"""Повтор записи, если SQLite занята дольше busy timeout"""
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, connection
+
+
+def is_locked(error):
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+def retry_locked(func):
+    """Повторить функцию с транзакцией при "database is locked".
+
+    Повтор возможен только снаружи транзакции: во внешней атомарной
+    обёртке блокировка уже удерживается, и ошибка пробрасывается.
+    Пауза растёт вдвое, со случайной добавкой против синхронных повторов.
+    """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        attempts = getattr(settings, "SQLITE_WRITE_RETRIES", 3)
+        delay = getattr(settings, "SQLITE_RETRY_DELAY", 0.05)
+        for attempt in range(attempts + 1):
+            outer = connection.in_atomic_block
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as e:
+                if outer or attempt == attempts or not is_locked(e):
+                    raise
+            time.sleep(delay * 2 ** attempt * (1 + random.random()))
+
+    return wrapper
@@ -0,0 +1,308 @@
+import asyncio
+import json
+import os
+import pickle
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.http import StreamingHttpResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from django.core.handlers.wsgi import WSGIHandler
+
+from .asgi import WSGIBridge
+from .cache import TieredCache, track_requests, untrack_requests
+from .sqlite.retry import retry_locked
+
+
+class TieredCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location)
+
+    def make_cache(self, **options):
+        options.setdefault("SHARDS", 4)
+        return TieredCache(self.location, {"OPTIONS": options})
+
+    def test_get_set_delete(self):
+        """Тест базовых операций кэша"""
+        cache = self.make_cache()
+        cache.set("key", {"value": 1})
+        self.assertEqual(cache.get("key"), {"value": 1})
+        self.assertTrue(cache.has_key("key"))
+        self.assertFalse(cache.add("key", 2))
+        self.assertTrue(cache.delete("key"))
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(cache.get_many(["key"]), {})
+
+    def test_disk_tier_shared_between_processes(self):
+        """Тест значение читается с диска, если его нет в памяти"""
+        cache = self.make_cache(LOCAL_TIMEOUT=0)
+        cache.set("key", "value")
+        self.assertEqual(cache.get("key"), "value")
+        stats = cache.stats()
+        self.assertEqual(stats["disk_hits"], 1)
+        self.assertEqual(stats["memory_hits"], 0)
+        cache.get("missing")
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_shared_prefixes_bypass_memory(self):
+        """Тест версии сброса читаются с диска: запись другого процесса видна"""
+        cache = self.make_cache(SHARED_PREFIXES=("version:",))
+        cache.set("version:feed", 1)
+        cache.set("page", "html")
+        self.assertEqual(cache.stats()["memory_entries"], 1)
+        # Другой процесс меняет только файл на диске
+        cache._write(cache.make_key("version:feed"), None,
+                     pickle.dumps(2, pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(cache.get("version:feed"), 2)
+        self.assertEqual(cache.incr("version:feed"), 3)
+        self.assertEqual(cache.stats()["memory_entries"], 1)
+
+    def test_memory_tier_lru(self):
+        """Тест память ограничена MAX_ENTRIES, вытесняется старое"""
+        cache = self.make_cache(MAX_ENTRIES=2)
+        for key in ("a", "b", "c"):
+            cache.set(key, key)
+        stats = cache.stats()
+        self.assertEqual(stats["memory_entries"], 2)
+        self.assertEqual(stats["memory_evictions"], 1)
+        self.assertEqual(cache.get("a"), "a")
+        self.assertEqual(cache.stats()["disk_hits"], 1)
+
+    def test_disk_tier_bounded(self):
+        """Тест размер диска ограничен MAX_BYTES"""
+        cache = self.make_cache(SHARDS=1, MAX_BYTES=4096)
+        for number in range(50):
+            cache.set(f"key{number}", bytes(range(256)) * 2)
+        stats = cache.stats()
+        self.assertLessEqual(stats["disk_bytes"], 4096)
+        self.assertGreater(stats["disk_evictions"], 0)
+
+    def test_disk_tier_bounded_across_processes(self):
+        """Тест лимит диска общий для процессов с одним каталогом"""
+        # Другое значение LOCATION - своё состояние, как у другого процесса
+        caches = [self.make_cache(SHARDS=1, MAX_BYTES=4096, RESCAN_EVERY=4),
+                  TieredCache(self.location + os.sep, {"OPTIONS": {
+                      "SHARDS": 1, "MAX_BYTES": 4096, "RESCAN_EVERY": 4}})]
+        for number in range(100):
+            caches[number % 2].set(f"key{number}", os.urandom(200))
+        disk_bytes = sum(
+            entry.stat().st_size
+            for entry in os.scandir(os.path.join(self.location, "00")))
+        self.assertLessEqual(disk_bytes, 4096 * 1.5)
+
+    def test_incr_keeps_timeout(self):
+        """Тест incr не сбрасывает бессрочный ключ"""
+        cache = self.make_cache(LOCAL_TIMEOUT=0)
+        cache.set("counter", 1, None)
+        self.assertEqual(cache.incr("counter"), 2)
+        entry = cache._get_entry(cache.make_key("counter"))
+        self.assertIsNone(entry[0])
+        with self.assertRaises(ValueError):
+            cache.incr("missing")
+
+    def test_request_stats(self):
+        """Тест счётчики текущего запроса ведутся только по запросу"""
+        cache = self.make_cache()
+        cache.set("key", 1)
+        cache.get("key")
+        stats = track_requests()
+        cache.get("key")
+        cache.get("missing")
+        untrack_requests()
+        cache.get("missing")
+        self.assertEqual(stats["memory_hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+    def test_clear(self):
+        cache = self.make_cache()
+        cache.set("key", "value")
+        cache.clear()
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(cache.stats()["disk_bytes"], 0)
+
+
+class RequestMetricsTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        user = get_user_model().objects.create_user(username="Alex")
+        self.url = reverse("profile", args=[user.username])
+
+    def test_server_timing(self):
+        """Тест заголовок Server-Timing с SQL, рендерингом и итогом"""
+        response = self.client.get(self.url)
+        timing = response["Server-Timing"]
+        self.assertRegex(timing, r'sql;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn("render;dur=", timing)
+        self.assertIn("total;dur=", timing)
+
+    @override_settings(SLOW_REQUEST_MS=0, SLOW_REQUEST_SAMPLE_RATE=1.0)
+    def test_slow_request_sampled(self):
+        """Тест медленный запрос пишется в лог со списком SQL"""
+        with self.assertLogs("yatube.requests", "INFO") as logs:
+            self.client.get(self.url)
+        records = [json.loads(line.split(":", 2)[2]) for line in logs.output]
+        self.assertEqual(records[0]["view"], "profile")
+        self.assertGreater(records[0]["queries"], 0)
+        self.assertEqual(len(records[-1]["sql"]), records[-1]["queries"])
+
+    @override_settings(TEMPLATE_PROFILING=True)
+    def test_template_profiling(self):
+        """Тест профилирование раскладывает время по шаблонам"""
+        with self.assertLogs("yatube.requests", "INFO") as logs:
+            response = self.client.get(self.url)
+        record = json.loads(logs.output[0].split(":", 2)[2])
+        names = {template["name"]: template
+                 for template in record["templates"]}
+        self.assertEqual(names["profile.html"]["calls"], 1)
+        self.assertIn("base.html", names)
+        self.assertIn("includes/card.html", names)
+        self.assertLessEqual(names["base.html"]["self_ms"],
+                             names["profile.html"]["total_ms"])
+        self.assertIn("tpl;dur=", response["Server-Timing"])
+
+
+class WSGIBridgeTest(SimpleTestCase):
+
+    def call(self, scope, body=b""):
+        application = WSGIBridge(WSGIHandler(), 2)
+        self.addCleanup(application.executor.shutdown)
+        messages = [{"type": "http.request", "body": body[:5],
+                     "more_body": True},
+                    {"type": "http.request", "body": body[5:]}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(application(scope, receive, send))
+        return sent
+
+    def test_get(self):
+        """Тест ASGI-мост отдаёт ответ Django по частям"""
+        sent = self.call({
+            "type": "http", "method": "GET", "path": "/auth/login/",
+            "query_string": b"next=/new/",
+            "headers": [(b"host", b"testserver")],
+        })
+        self.assertEqual(sent[0]["type"], "http.response.start")
+        self.assertEqual(sent[0]["status"], 200)
+        self.assertIn((b"content-type", b"text/html; charset=utf-8"),
+                      sent[0]["headers"])
+        self.assertTrue(any(name == b"server-timing"
+                            for name, value in sent[0]["headers"]))
+        content = b"".join(message["body"] for message in sent[1:])
+        self.assertIn(b'value="/new/"', content)
+        self.assertFalse(sent[-1].get("more_body"))
+
+
+    @override_settings(ASGI_MAX_BODY=10)
+    def test_body_too_large(self):
+        """Тест тело больше ASGI_MAX_BODY отклоняется с 413"""
+        scope = {"type": "http", "method": "POST", "path": "/auth/login/",
+                 "query_string": b"", "headers": [(b"host", b"testserver")]}
+        sent = self.call(scope, b"x" * 20)
+        self.assertEqual(sent[0]["status"], 413)
+        scope["headers"].append((b"content-length", b"20"))
+        sent = self.call(scope, b"x" * 20)
+        self.assertEqual(sent[0]["status"], 413)
+
+    def test_streaming_response(self):
+        """Тест потоковый ответ отдаётся по кускам итератора"""
+        def application(environ, start_response):
+            start_response("200 OK", [("Content-Type", "text/plain")])
+            return StreamingHttpResponse(iter([b"first", b"second"]))
+
+        bridge = WSGIBridge(application, 2)
+        self.addCleanup(bridge.executor.shutdown)
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(bridge({"type": "http", "method": "GET", "path": "/",
+                            "query_string": b"", "headers": []},
+                           receive, send))
+        self.assertEqual([message.get("body") for message in sent[1:]],
+                         [b"first", b"second", b""])
+
+
+class SQLiteBackendTest(TestCase):
+
+    def test_pragmas(self):
+        """Тест прагмы применяются к каждому новому соединению"""
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            # 1 - NORMAL
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute("PRAGMA cache_size")
+            self.assertEqual(cursor.fetchone()[0], -64 * 1024)
+        self.assertTrue(connection.immediate)
+
+    def test_no_retry_inside_transaction(self):
+        """Тест внутри транзакции блокировка не повторяется"""
+        calls = []
+
+        @retry_locked
+        def write():
+            calls.append(1)
+            raise OperationalError("database is locked")
+
+        with self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(calls), 1)
+
+
+@override_settings(SQLITE_WRITE_RETRIES=2, SQLITE_RETRY_DELAY=0)
+class RetryLockedTest(SimpleTestCase):
+
+    def test_retries_locked(self):
+        """Тест запись повторяется, пока база занята"""
+        errors = [OperationalError("database is locked")] * 2
+
+        @retry_locked
+        def write():
+            if errors:
+                raise errors.pop()
+            return "ok"
+
+        self.assertEqual(write(), "ok")
+
+    def test_gives_up(self):
+        """Тест после SQLITE_WRITE_RETRIES повторов ошибка пробрасывается"""
+        calls = []
+
+        @retry_locked
+        def write():
+            calls.append(1)
+            raise OperationalError("database is locked")
+
+        with self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(calls), 3)
+
+    def test_other_errors(self):
+        """Тест прочие ошибки базы не повторяются"""
+        calls = []
+
+        @retry_locked
+        def write():
+            calls.append(1)
+            raise OperationalError("no such table: posts_post")
+
+        with self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(calls), 1)